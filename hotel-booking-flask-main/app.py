@@ -1,30 +1,540 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, g
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, Response, abort, stream_with_context, send_from_directory, has_request_context, before_render_template, template_rendered
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
 import sqlite3
 import os
+import atexit
+import base64
+import binascii
+import collections
+import csv
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import multiprocessing
+import queue
+import random
+import re
+import secrets
+import shutil
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+import click
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.datastructures import CallbackDict
+from werkzeug.utils import safe_join
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Change this to a random secret key in production
 
-# Database file located next to this file
-DB_PATH = os.path.join(os.path.dirname(__file__), 'hotel.db')
+# Database file located next to this file (HOTEL_DB_PATH points elsewhere, e.g. for benchmarks)
+DB_PATH = os.environ.get('HOTEL_DB_PATH') or os.path.join(os.path.dirname(__file__), 'hotel.db')
+
+
+### Instrumentation ###
+
+# Per-process timing of SQL statements, template rendering, password hashing
+# and whole requests. Pool connections are InstrumentedConnection objects, which
+# time each statement (execute plus the fetches that drain it) and count its
+# rows; request hooks fold those into per-endpoint histograms. Statements slower
+# than METRICS_SLOW_QUERY_MS are kept, with their EXPLAIN QUERY PLAN, in a small
+# ring buffer. Everything is exposed on /admin/metrics and, in Prometheus text
+# format, on /admin/metrics.prom. HOTEL_METRICS=0 turns it off.
+METRICS_ENABLED = os.environ.get('HOTEL_METRICS', '1') != '0'
+METRICS_SLOW_QUERY_MS = float(os.environ.get('HOTEL_SLOW_QUERY_MS', 100))
+METRICS_SLOW_LOG_SIZE = 100
+METRICS_MAX_STATEMENTS = 500
+# Upper bounds (seconds) of the request latency histogram buckets
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _quantile(counts, total, q):
+    # Approximate quantile from per-bucket counts, interpolating within a bucket
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for upper, count in zip(METRICS_BUCKETS + (float('inf'),), counts):
+        if count and seen + count >= rank:
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+        lower = upper
+    return lower
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.routes = {}
+            self.statements = {}
+            self.timers = {}
+            self.slow_queries = collections.deque(maxlen=METRICS_SLOW_LOG_SIZE)
+
+    def statement(self, sql, elapsed, rows):
+        # Returns the key the statement is filed under, for fetched()
+        key = ' '.join(sql.split())
+        with self._lock:
+            stat = self.statements.get(key)
+            if stat is None:
+                if len(self.statements) >= METRICS_MAX_STATEMENTS:
+                    key = '(other)'
+                stat = self.statements.setdefault(key, {'calls': 0, 'time': 0.0, 'max': 0.0, 'rows': 0})
+            stat['calls'] += 1
+            stat['time'] += elapsed
+            stat['max'] = max(stat['max'], elapsed)
+            stat['rows'] += max(rows, 0)
+        return key
+
+    def fetched(self, key, elapsed, rows):
+        # Time and rows from draining a cursor, added to its statement
+        with self._lock:
+            stat = self.statements.get(key)
+            if stat is not None:
+                stat['time'] += elapsed
+                stat['rows'] += rows
+
+    def timer(self, name, elapsed):
+        with self._lock:
+            t = self.timers.setdefault(name, {'count': 0, 'time': 0.0, 'max': 0.0})
+            t['count'] += 1
+            t['time'] += elapsed
+            t['max'] = max(t['max'], elapsed)
+
+    def request(self, endpoint, method, status, elapsed, db_time, queries, render_time):
+        key = (endpoint or '(unmatched)', method)
+        index = bisect_left(METRICS_BUCKETS, elapsed)
+        with self._lock:
+            r = self.routes.get(key)
+            if r is None:
+                r = self.routes[key] = {'count': 0, 'time': 0.0, 'max': 0.0, 'db_time': 0.0, 'queries': 0,
+                                        'render_time': 0.0, 'errors': 0, 'buckets': [0] * (len(METRICS_BUCKETS) + 1)}
+            r['count'] += 1
+            r['time'] += elapsed
+            r['max'] = max(r['max'], elapsed)
+            r['db_time'] += db_time
+            r['queries'] += queries
+            r['render_time'] += render_time
+            r['errors'] += status >= 500
+            r['buckets'][index] += 1
+
+    def slow_query(self, conn, sql, params, elapsed):
+        try:
+            plan = [row[-1] for row in sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params or ())]
+        except sqlite3.Error:
+            plan = []
+        entry = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(elapsed * 1000, 2),
+            'sql': ' '.join(sql.split()),
+            'params': repr(params)[:200] if params else '',
+            'endpoint': request.endpoint if has_request_context() else None,
+            'plan': plan,
+        }
+        with self._lock:
+            self.slow_queries.appendleft(entry)
+        app.logger.warning('Slow query (%.1f ms) %s', entry['ms'], entry['sql'][:200])
+
+    def snapshot(self):
+        with self._lock:
+            routes = []
+            for (endpoint, method), r in sorted(self.routes.items(), key=lambda item: -item[1]['time']):
+                count = r['count']
+                routes.append({
+                    'endpoint': endpoint, 'method': method, 'count': count, 'errors': r['errors'],
+                    'avg_ms': round(r['time'] / count * 1000, 2),
+                    'p50_ms': round(min(_quantile(r['buckets'], count, 0.5), r['max']) * 1000, 2),
+                    'p95_ms': round(min(_quantile(r['buckets'], count, 0.95), r['max']) * 1000, 2),
+                    'max_ms': round(r['max'] * 1000, 2),
+                    'db_ms': round(r['db_time'] / count * 1000, 2),
+                    'queries': round(r['queries'] / count, 1),
+                    'render_ms': round(r['render_time'] / count * 1000, 2),
+                    # Raw totals for the Prometheus counters
+                    'buckets': list(r['buckets']), 'time': r['time'], 'db_time': r['db_time'],
+                    'render_time': r['render_time'], 'queries_total': r['queries'],
+                })
+            statements = [
+                {'sql': sql, 'calls': s['calls'], 'total_ms': round(s['time'] * 1000, 2),
+                 'avg_ms': round(s['time'] / s['calls'] * 1000, 3), 'max_ms': round(s['max'] * 1000, 2),
+                 'rows': s['rows']}
+                for sql, s in sorted(self.statements.items(), key=lambda item: -item[1]['time'])
+            ]
+            timers = {name: {'count': t['count'], 'total_ms': round(t['time'] * 1000, 2),
+                             'avg_ms': round(t['time'] / t['count'] * 1000, 2), 'max_ms': round(t['max'] * 1000, 2)}
+                      for name, t in self.timers.items()}
+            return {'pid': os.getpid(), 'since': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                    'routes': routes, 'statements': statements, 'timers': timers,
+                    'slow_queries': list(self.slow_queries)}
+
+
+metrics = Metrics()
+
+
+def _request_tally():
+    # Per-request DB and template counters, when there is a request to charge them to
+    return g.get('_metrics') if has_request_context() else None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    _key = None
+
+    def _fetched(self, started, rows):
+        elapsed = time.perf_counter() - started
+        if self._key is not None:
+            metrics.fetched(self._key, elapsed, rows)
+        tally = _request_tally()
+        if tally is not None:
+            tally['db_time'] += elapsed
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def _timed(self, method, sql, params):
+        cur = self.cursor()
+        started = time.perf_counter()
+        getattr(cur, method)(sql, params)
+        elapsed = time.perf_counter() - started
+        # SELECTs report their rows as they are fetched; writes report rowcount
+        cur._key = metrics.statement(sql, elapsed, cur.rowcount)
+        tally = _request_tally()
+        if tally is not None:
+            tally['db_time'] += elapsed
+            tally['queries'] += 1
+        if elapsed * 1000 >= METRICS_SLOW_QUERY_MS and method == 'execute':
+            metrics.slow_query(self, sql, params, elapsed)
+        return cur
+
+    def execute(self, sql, params=()):
+        return self._timed('execute', sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed('executemany', sql, seq_of_params)
+
+
+@app.before_request
+def _metrics_start():
+    if METRICS_ENABLED:
+        g._metrics = {'started': time.perf_counter(), 'db_time': 0.0, 'queries': 0, 'render_time': 0.0}
+
+
+@app.teardown_request
+def _metrics_finish(exception=None):
+    tally = g.pop('_metrics', None)
+    if tally is None:
+        return
+    status = g.pop('_metrics_status', 500 if exception else 200)
+    metrics.request(request.endpoint, request.method, status, time.perf_counter() - tally['started'],
+                    tally['db_time'], tally['queries'], tally['render_time'])
+
+
+@app.after_request
+def _metrics_status(response):
+    if METRICS_ENABLED:
+        g._metrics_status = response.status_code
+    return response
+
+
+@before_render_template.connect_via(app)
+def _metrics_render_start(sender, template, context, **extra):
+    tally = _request_tally()
+    if tally is not None:
+        tally['render_started'] = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _metrics_render_end(sender, template, context, **extra):
+    tally = _request_tally()
+    if tally is not None and 'render_started' in tally:
+        tally['render_time'] += time.perf_counter() - tally.pop('render_started')
+
+
+### Connection pool ###
+
+# Connections are opened once per worker process and reused across requests.
+# WAL lets readers keep going while a booking transaction holds the write
+# lock; synchronous=NORMAL is durable across application crashes in WAL mode
+# and only risks the last commits on power loss.
+DB_POOL_SIZE = int(os.environ.get('HOTEL_DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('HOTEL_DB_POOL_TIMEOUT', 10))
+DB_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -20000),        # KiB, i.e. ~20 MB page cache per connection
+    ('mmap_size', 268435456),      # 256 MB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, pragmas=DB_PRAGMAS,
+                 factory=sqlite3.Connection):
+        self.path = path
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        # Called on first use and again in a forked child: connections must
+        # never be shared across processes.
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def checkout(self):
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset()
+            self.checkouts += 1
+            if not self._idle and self._open >= self.size:
+                self.waits += 1
+                started = time.perf_counter()
+                deadline = started + self.timeout
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self.wait_time += time.perf_counter() - started
+                        raise PoolTimeout('Timed out waiting for a database connection')
+                    self._cond.wait(remaining)
+                self.wait_time += time.perf_counter() - started
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+            self.created += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def checkin(self, conn):
+        # Never hand out a connection with a half-finished transaction
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                conn.close()
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time_ms': round(self.wait_time * 1000, 3),
+            }
+
+
+db_pool = ConnectionPool(DB_PATH, factory=InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection)
 
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
+        g.db = db_pool.checkout()
     return g.db
 
 
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        db_pool.checkin(db)
+
+
+### Password hashing ###
+
+# Hashing and verifying passwords is deliberately slow CPU work that holds the
+# GIL. With HOTEL_HASH_PROCESSES > 0 it runs in a small process pool instead,
+# so the request threads (or the ASGI server's executor) keep serving while a
+# login is checked. The pool is spawned lazily per process, never inherited
+# across fork. At most HASH_MAX_PENDING hashes run or wait per process; logins
+# beyond that are turned away (HashPoolBusy) instead of queueing behind each
+# other, so a login flood can't tie up every request thread.
+#
+# New hashes use PASSWORD_METHOD (werkzeug's method string, e.g.
+# 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'); a successful login with a hash
+# written under any other method or cost rehashes it in place.
+HASH_PROCESSES = int(os.environ.get('HOTEL_HASH_PROCESSES', 0))
+HASH_MAX_PENDING = int(os.environ.get('HOTEL_HASH_MAX_PENDING', max(2, 2 * HASH_PROCESSES)))
+HASH_WAIT = float(os.environ.get('HOTEL_HASH_WAIT', 0.5))
+PASSWORD_METHOD = os.environ.get('HOTEL_PASSWORD_METHOD', 'scrypt:32768:8:1')
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+class HashPool:
+    def __init__(self, processes=HASH_PROCESSES, max_pending=HASH_MAX_PENDING):
+        self.processes = processes
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._pid = None
+        self._executor = None
+
+    def _get(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def run(self, fn, *args, wait=None):
+        # wait=None blocks for a slot; otherwise give up after `wait` seconds
+        if not self._slots.acquire(timeout=wait):
+            raise HashPoolBusy('Too many password checks in progress')
+        try:
+            if self.processes <= 0:
+                return fn(*args)
+            return self._get().submit(fn, *args).result()
+        finally:
+            self._slots.release()
 
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
 
-def init_db():
-    db = get_db()
+
+hash_pool = HashPool()
+atexit.register(hash_pool.shutdown)
+
+
+def hash_password(password, wait=None):
+    started = time.perf_counter()
+    try:
+        return hash_pool.run(generate_password_hash, password, PASSWORD_METHOD, wait=wait)
+    finally:
+        metrics.timer('password_hash', time.perf_counter() - started)
+
+
+def verify_password(pw_hash, password, wait=None):
+    started = time.perf_counter()
+    try:
+        return hash_pool.run(check_password_hash, pw_hash, password, wait=wait)
+    finally:
+        metrics.timer('password_verify', time.perf_counter() - started)
+
+
+_password_method = None
+
+
+def password_method():
+    # PASSWORD_METHOD as werkzeug writes it into hashes ('scrypt' -> 'scrypt:32768:8:1')
+    global _password_method
+    if _password_method is None:
+        _password_method = generate_password_hash('', PASSWORD_METHOD).split('$', 1)[0]
+    return _password_method
+
+
+def needs_rehash(pw_hash):
+    return not pw_hash or pw_hash.split('$', 1)[0] != password_method()
+
+
+### Schema migrations ###
+
+# Each migration runs once, in its own transaction, and is recorded in
+# schema_migrations. Once a database is at the latest version, init_db() is a
+# single indexed lookup. Add new schema changes as new migrations at the end of
+# MIGRATIONS; never edit one that has already shipped.
+
+
+def _migration_baseline(db):
+    # Original schema, including the in-place upgrades older databases need
     db.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -219,7 +729,171 @@ def init_db():
         # If anything goes wrong during migration, continue without crashing setup
         pass
 
-    db.commit()
+
+def _migration_index_pack(db):
+    # Secondary indexes for the admin list orderings and foreign-key lookups
+    db.execute('CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings(created_at)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_invoices_booking ON invoices(booking_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_services_booking ON services(booking_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_hired_as_employee ON hired_as(employee_id)')
+    # Room-stay overlap indexes, room_units(type_id, ...) and availability triggers
+    init_availability_schema(db)
+
+
+def _migration_bookings_keyset(db):
+    # Keyset pagination orders by (created_at, booking_id); NULL keys would
+    # fall out of row-value comparisons, so give legacy rows an empty one.
+    db.execute("UPDATE bookings SET created_at = '' WHERE created_at IS NULL")
+    db.execute('CREATE INDEX IF NOT EXISTS idx_bookings_type_created ON bookings(room_id, created_at)')
+
+
+def _migration_admin_list_indexes(db):
+    # Sort orders offered by the admin list pages (see ListView)
+    db.execute('CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(name)')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_room_units_room_no ON room_units(IFNULL(room_no, ''))")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_room_units_floor ON room_units(IFNULL(floor, ''))")
+    db.execute('CREATE INDEX IF NOT EXISTS idx_services_name ON services(service_name)')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_invoices_issue_sort ON invoices(IFNULL(issue_date, ''))")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_hired_as_start_sort ON hired_as(IFNULL(start_date, ''))")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_guests_name_sort ON guests(IFNULL(name, ''))")
+    db.execute('CREATE INDEX IF NOT EXISTS idx_users_admin_type ON users(admin_type)')
+
+
+def _migration_night_audit(db):
+    # Outcome flags set by the night audit and a log of each run
+    db.execute('ALTER TABLE bookings ADD COLUMN no_show INTEGER DEFAULT 0')
+    db.execute('ALTER TABLE bookings ADD COLUMN overstay INTEGER DEFAULT 0')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_bookings_checkin ON bookings(checkin_date, checked_in, cancelled)')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS night_audits (
+            audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audit_date TEXT NOT NULL,
+            run_at TEXT NOT NULL,
+            no_shows INTEGER NOT NULL,
+            released INTEGER NOT NULL,
+            occupied INTEGER NOT NULL,
+            overstays INTEGER NOT NULL,
+            duration_ms REAL
+        )
+    ''')
+
+
+def _migration_analytics(db):
+    # Daily rollup tables and their triggers (see init_analytics_schema); queue
+    # every existing stay so the first report backfills history.
+    init_analytics_schema(db)
+    db.execute(QUEUE_ALL_ROLLUPS)
+
+
+def _migration_unit_nights(db):
+    # Per-unit night bitmaps (see init_unit_nights_schema), backfilled from current assignments
+    init_unit_nights_schema(db)
+    db.execute('''
+        INSERT INTO unit_nights_dirty (room_id, start_date, end_date)
+        SELECT bt.room_id, MIN(b.checkin_date), MAX(b.checkout_date)
+        FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+        GROUP BY bt.room_id
+    ''')
+
+
+def _migration_search(db):
+    # FTS5 index over guests and users (see init_search_schema)
+    init_search_schema(db)
+    rebuild_search_index(db)
+
+
+def _migration_booking_requests(db):
+    # Outcome of each booking submitted through the write-behind queue, by token
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS booking_requests (
+            token TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            booking_id INTEGER,
+            error TEXT,
+            room_id INTEGER,
+            checkin_date TEXT,
+            checkout_date TEXT,
+            submitted_at TEXT,
+            decided_at TEXT,
+            FOREIGN KEY(booking_id) REFERENCES bookings(booking_id)
+        )
+    ''')
+
+
+def _migration_booking_status_indexes(db):
+    # The sparse status filters on the bookings list, in list order, so a
+    # filtered page seeks straight to matching rows instead of walking the
+    # created_at index past every booking without the flag. Partial, so each
+    # holds only the flagged rows.
+    for flag in ('cancelled', 'no_show', 'overstay'):
+        db.execute(f'CREATE INDEX IF NOT EXISTS idx_bookings_{flag}_created ON bookings(created_at) WHERE {flag} = 1')
+        db.execute(f'CREATE INDEX IF NOT EXISTS idx_bookings_{flag}_type ON bookings(room_id, created_at) WHERE {flag} = 1')
+
+
+def _migration_rate_rollups(db):
+    # Adds the room rate trigger (see init_analytics_schema) and requeues every
+    # stay, since rollups built before it may still carry an old rate.
+    init_analytics_schema(db)
+    db.execute(QUEUE_ALL_ROLLUPS)
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', _migration_baseline),
+    (2, 'index pack', _migration_index_pack),
+    (3, 'bookings keyset pagination', _migration_bookings_keyset),
+    (4, 'admin list indexes', _migration_admin_list_indexes),
+    (5, 'night audit', _migration_night_audit),
+    (6, 'analytics rollups', _migration_analytics),
+    (7, 'unit night bitmaps', _migration_unit_nights),
+    (8, 'people search index', _migration_search),
+    (9, 'queued booking requests', _migration_booking_requests),
+    (10, 'booking status indexes', _migration_booking_status_indexes),
+    (11, 'rate change rollups', _migration_rate_rollups),
+]
+
+
+def schema_version(db):
+    try:
+        row = db.execute('SELECT MAX(version) AS version FROM schema_migrations').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row['version'] or 0
+
+
+def migrate(db):
+    from datetime import datetime
+    if schema_version(db) == MIGRATIONS[-1][0]:
+        return []
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-check under the write lock: another process may have got here first
+            if db.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                db.rollback()
+                continue
+            fn(db)
+            db.execute('INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                       (version, name, datetime.utcnow().isoformat()))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def init_db():
+    db = get_db()
+    migrate(db)
 
 
 def create_default_rooms():
@@ -233,6 +907,7 @@ def create_default_rooms():
         ]
         db.executemany('INSERT INTO rooms (name, description, price, image) VALUES (?, ?, ?, ?)', rooms)
         db.commit()
+        catalog.invalidate()
 
 
 def create_first_admin():
@@ -241,7 +916,7 @@ def create_first_admin():
     row = cur.fetchone()
     if row['cnt'] == 0:
         # Create default admin: username=admin password=admin
-        pw_hash = generate_password_hash('admin')
+        pw_hash = hash_password('admin')
         from datetime import datetime
         created_at = datetime.utcnow().isoformat()
         db.execute('INSERT INTO users (username, password, user_name, email, phone, is_admin, created_at, admin_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
@@ -250,29 +925,1088 @@ def create_first_admin():
 
 
 def create_booking(db, checkin_date, checkout_date, room_id, user_id=None, guest_id=None, reserved=1):
+    # Check availability, reserve a free room unit and write the booking in a
+    # single IMMEDIATE transaction so concurrent workers can't double-book.
+    checkin_date, checkout_date = parse_stay(checkin_date, checkout_date)
+    return run_immediate(db, lambda tx: _reserve_booking(tx, checkin_date, checkout_date, room_id,
+                                                         user_id, guest_id, reserved))
+
+
+def _reserve_booking(db, checkin_date, checkout_date, room_id, user_id, guest_id, reserved):
     from datetime import datetime
+    if not availability.has_capacity(db, room_id, checkin_date, checkout_date):
+        raise RoomUnavailable('No rooms of this type are free for the selected dates')
+    tracked = availability.capacity(db, room_id, checkin_date) is not None
+    units = availability.free_units(db, room_id, checkin_date, checkout_date) if tracked else []
+    if tracked and not units:
+        raise RoomUnavailable('No rooms of this type are free for the selected dates')
     created_at = datetime.utcnow().isoformat()
-    db.execute(
+    cur = db.execute(
         'INSERT INTO bookings (checkin_date, checkout_date, room_id, user_id, guest_id, reserved, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
         (checkin_date, checkout_date, room_id, user_id, guest_id, reserved, created_at)
     )
-    db.commit()
-    return db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
+    booking_id = cur.lastrowid
+    if units:
+        db.execute('INSERT INTO belong_to (booking_id, room_id) VALUES (?, ?)', (booking_id, units[0]))
+    return booking_id
 
 
-def mark_checked_in(db, booking_id):
-    db.execute('UPDATE bookings SET checked_in = 1 WHERE booking_id = ?', (booking_id,))
-    db.commit()
+def mark_checked_in(db, booking_id, commit=True):
+    # commit=False leaves the write in the caller's transaction (API batches)
+    cur = db.execute('UPDATE bookings SET checked_in = 1 WHERE booking_id = ?', (booking_id,))
+    if commit:
+        db.commit()
+    return cur.rowcount
 
 
-def mark_checked_out(db, booking_id):
-    db.execute('UPDATE bookings SET checked_out = 1 WHERE booking_id = ?', (booking_id,))
-    db.commit()
+def mark_checked_out(db, booking_id, commit=True):
+    cur = db.execute('UPDATE bookings SET checked_out = 1 WHERE booking_id = ?', (booking_id,))
+    if commit:
+        db.commit()
+    return cur.rowcount
 
 
-def cancel_booking(db, booking_id):
-    db.execute('UPDATE bookings SET cancelled = 1, reserved = 0 WHERE booking_id = ?', (booking_id,))
-    db.commit()
+def cancel_booking(db, booking_id, commit=True):
+    cur = db.execute('UPDATE bookings SET cancelled = 1, reserved = 0 WHERE booking_id = ?', (booking_id,))
+    if commit:
+        db.commit()
+    return cur.rowcount
+
+
+### Room availability ###
+
+# Stays are half-open [checkin_date, checkout_date) ranges of ISO dates, so two
+# stays clash when each one starts before the other ends. Dates are stored as
+# 'YYYY-MM-DD' text, which compares correctly as plain strings.
+
+
+class BookingError(Exception):
+    pass
+
+
+class RoomUnavailable(BookingError):
+    pass
+
+
+def parse_stay(checkin_date, checkout_date):
+    try:
+        start = date.fromisoformat(checkin_date)
+        end = date.fromisoformat(checkout_date)
+    except (TypeError, ValueError):
+        raise BookingError('Please provide valid check-in and check-out dates')
+    if end <= start:
+        raise BookingError('Check-out date must be after check-in date')
+    return start.isoformat(), end.isoformat()
+
+
+def init_availability_schema(db):
+    # Index the overlap predicate (room type + checkout first, so lookups for
+    # upcoming dates skip past stays) and keep a per-room-type version counter
+    # that triggers bump on every write that can change availability. Workers
+    # compare the counter with their in-process calendar to know when to reload.
+    db.execute('CREATE INDEX IF NOT EXISTS idx_bookings_room_stay ON bookings(room_id, checkout_date, checkin_date, cancelled)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_bookings_checkout ON bookings(checkout_date, cancelled)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_belong_to_room ON belong_to(room_id, booking_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_room_units_type ON room_units(type_id, maintenance)')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS availability_versions (
+            type_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    bump = '''
+        INSERT INTO availability_versions (type_id, version) SELECT {type_expr}, 1 WHERE {type_expr} IS NOT NULL
+        ON CONFLICT(type_id) DO UPDATE SET version = version + 1;
+    '''
+    booking_type = '(SELECT room_id FROM bookings WHERE booking_id = {row}.booking_id)'
+    unit_type = '(SELECT type_id FROM room_units WHERE room_id = {row}.room_id)'
+    triggers = {
+        'trg_avail_bookings_ins': ('AFTER INSERT ON bookings', ['NEW.room_id']),
+        'trg_avail_bookings_upd': ('AFTER UPDATE OF checkin_date, checkout_date, room_id, cancelled ON bookings',
+                                   ['OLD.room_id', 'NEW.room_id']),
+        'trg_avail_bookings_del': ('AFTER DELETE ON bookings', ['OLD.room_id']),
+        'trg_avail_belong_to_ins': ('AFTER INSERT ON belong_to',
+                                    [booking_type.format(row='NEW'), unit_type.format(row='NEW')]),
+        'trg_avail_belong_to_del': ('AFTER DELETE ON belong_to',
+                                    [booking_type.format(row='OLD'), unit_type.format(row='OLD')]),
+        'trg_avail_room_units_ins': ('AFTER INSERT ON room_units', ['NEW.type_id']),
+        'trg_avail_room_units_upd': ('AFTER UPDATE OF type_id, maintenance ON room_units', ['OLD.type_id', 'NEW.type_id']),
+        'trg_avail_room_units_del': ('AFTER DELETE ON room_units', ['OLD.type_id']),
+    }
+    for name, (event, type_exprs) in triggers.items():
+        body = ''.join(bump.format(type_expr=expr) for expr in type_exprs)
+        db.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+
+
+def _max_overlap(stays, checkin_date, checkout_date):
+    # Peak number of stays that are in-house on the same night within the range
+    events = []
+    for start, end in stays:
+        if start < checkout_date and end > checkin_date:
+            events.append((max(start, checkin_date), 1))
+            events.append((min(end, checkout_date), -1))
+    # Departures sort before arrivals on the same date, so back-to-back stays don't clash
+    events.sort(key=lambda e: (e[0], e[1]))
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+class _UnitStays:
+    # Stays of a single room unit sorted by check-in, with a running maximum of
+    # check-out dates so "does anything overlap [a, b)" is one bisect.
+    def __init__(self, stays):
+        stays = sorted(stays)
+        self.checkins = [s[0] for s in stays]
+        self.booking_ids = [s[2] for s in stays]
+        self.max_checkout = []
+        latest = ''
+        for s in stays:
+            latest = max(latest, s[1])
+            self.max_checkout.append(latest)
+        self.stays = stays
+
+    def is_free(self, checkin_date, checkout_date, ignore_booking_id=None):
+        idx = bisect_left(self.checkins, checkout_date)
+        if idx == 0 or self.max_checkout[idx - 1] <= checkin_date:
+            return True
+        if ignore_booking_id is None:
+            return False
+        # Rare path: the only clash may be the booking we're (re)assigning
+        return not any(start < checkout_date and end > checkin_date and booking_id != ignore_booking_id
+                       for start, end, booking_id in self.stays[:idx])
+
+
+class _TypeCalendar:
+    def __init__(self, version, horizon, unit_ids, demand, unit_stays):
+        self.version = version
+        self.horizon = horizon
+        self.unit_ids = unit_ids
+        self.demand = demand
+        self.units = {unit_id: _UnitStays(unit_stays.get(unit_id, [])) for unit_id in unit_ids}
+
+
+class AvailabilityIndex:
+    # Per-worker calendar of upcoming stays per room type. Only stays ending on
+    # or after the load horizon are kept, so its size depends on the forward
+    # book, not on how much history the bookings table holds. A calendar is
+    # reloaded whenever the type's row in availability_versions has moved,
+    # which makes reads inside a write transaction see the committed state.
+    # A calendar loaded inside a write transaction includes its uncommitted
+    # rows, and a rollback hands its version number back for the next commit
+    # to reuse, so run_immediate() calls discard_uncommitted() before rolling
+    # back.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calendars = {}
+        self.tx_loads = 0  # calendars stored while their connection was in a transaction
+
+    def _version(self, db, type_id):
+        row = db.execute('SELECT version FROM availability_versions WHERE type_id = ?', (type_id,)).fetchone()
+        return row['version'] if row else 0
+
+    def _load(self, db, type_id, version, horizon):
+        units = db.execute('SELECT room_id FROM room_units WHERE type_id = ? AND maintenance = 0',
+                           (type_id,)).fetchall()
+        unit_ids = [u['room_id'] for u in units]
+        demand = [(r['checkin_date'], r['checkout_date']) for r in db.execute(
+            'SELECT checkin_date, checkout_date FROM bookings WHERE room_id = ? AND checkout_date > ? AND cancelled = 0',
+            (type_id, horizon))]
+        unit_stays = {}
+        for r in db.execute('''
+            SELECT bt.room_id, b.checkin_date, b.checkout_date, b.booking_id
+            FROM bookings b
+            JOIN belong_to bt ON bt.booking_id = b.booking_id
+            JOIN room_units u ON u.room_id = bt.room_id
+            WHERE b.checkout_date > ? AND b.cancelled = 0 AND u.type_id = ?
+        ''', (horizon, type_id)):
+            unit_stays.setdefault(r['room_id'], []).append((r['checkin_date'], r['checkout_date'], r['booking_id']))
+        return _TypeCalendar(version, horizon, unit_ids, demand, unit_stays)
+
+    def calendar(self, db, type_id, checkin_date):
+        type_id = int(type_id)
+        version = self._version(db, type_id)
+        with self._lock:
+            cal = self._calendars.get(type_id)
+            if cal is not None and cal.version == version and cal.horizon <= checkin_date:
+                return cal
+        horizon = min(date.today().isoformat(), checkin_date)
+        cal = self._load(db, type_id, version, horizon)
+        with self._lock:
+            self._calendars[type_id] = cal
+            if db.in_transaction:
+                self.tx_loads += 1
+        return cal
+
+    def capacity(self, db, type_id, checkin_date):
+        # None means the type has no room units registered, so inventory isn't tracked
+        cal = self.calendar(db, type_id, checkin_date)
+        return len(cal.unit_ids) if cal.unit_ids else None
+
+    def has_capacity(self, db, type_id, checkin_date, checkout_date, quantity=1):
+        cal = self.calendar(db, type_id, checkin_date)
+        if not cal.unit_ids:
+            return True
+        return _max_overlap(cal.demand, checkin_date, checkout_date) + quantity <= len(cal.unit_ids)
+
+    def free_units(self, db, type_id, checkin_date, checkout_date):
+        cal = self.calendar(db, type_id, checkin_date)
+        return [unit_id for unit_id in cal.unit_ids if cal.units[unit_id].is_free(checkin_date, checkout_date)]
+
+    def unit_is_free(self, db, unit_id, checkin_date, checkout_date, ignore_booking_id=None):
+        unit = db.execute('SELECT type_id, maintenance FROM room_units WHERE room_id = ?', (unit_id,)).fetchone()
+        if not unit or unit['maintenance']:
+            return False
+        if unit['type_id'] is None:
+            clash = db.execute('''
+                SELECT 1 FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+                WHERE bt.room_id = ? AND b.cancelled = 0 AND b.checkout_date > ? AND b.checkin_date < ?
+                  AND b.booking_id IS NOT ?
+                LIMIT 1
+            ''', (unit_id, checkin_date, checkout_date, ignore_booking_id)).fetchone()
+            return clash is None
+        cal = self.calendar(db, unit['type_id'], checkin_date)
+        stays = cal.units.get(int(unit_id))
+        return stays is None or stays.is_free(checkin_date, checkout_date, ignore_booking_id)
+
+    def clear(self):
+        with self._lock:
+            self._calendars.clear()
+
+    def discard_uncommitted(self, tx_loads):
+        # Drop every calendar if any was stored inside a transaction since
+        # tx_loads was read; another thread's load may trigger this too, which
+        # only costs a reload
+        with self._lock:
+            if self.tx_loads != tx_loads:
+                self._calendars.clear()
+
+
+availability = AvailabilityIndex()
+
+
+def find_available_units(db, type_id, checkin_date, checkout_date):
+    checkin_date, checkout_date = parse_stay(checkin_date, checkout_date)
+    if not availability.has_capacity(db, type_id, checkin_date, checkout_date):
+        return []
+    return availability.free_units(db, type_id, checkin_date, checkout_date)
+
+
+### Booking transactions ###
+
+# Bounded retry for write transactions that lose the race for SQLite's write
+# lock. Backoff is "full jitter": a random sleep up to an exponentially growing
+# cap, so workers that collided once don't collide again in lockstep.
+TX_MAX_ATTEMPTS = 5
+TX_BACKOFF_BASE = 0.01
+TX_BACKOFF_CAP = 0.25
+
+
+class TransactionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.transactions = 0
+            self.committed = 0
+            self.rolled_back = 0
+            self.retries = 0
+            self.failures = 0
+            self.lock_wait_total = 0.0
+            self.lock_wait_max = 0.0
+
+    def record(self, lock_wait, attempts, outcome):
+        # outcome is 'committed', 'rolled_back' (fn raised) or 'failed' (gave up on the lock)
+        with self._lock:
+            self.transactions += 1
+            self.retries += attempts - 1
+            if outcome == 'committed':
+                self.committed += 1
+            elif outcome == 'rolled_back':
+                self.rolled_back += 1
+            else:
+                self.failures += 1
+            self.lock_wait_total += lock_wait
+            self.lock_wait_max = max(self.lock_wait_max, lock_wait)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'transactions': self.transactions,
+                'committed': self.committed,
+                'rolled_back': self.rolled_back,
+                'retries': self.retries,
+                'failures': self.failures,
+                'lock_wait_total_ms': round(self.lock_wait_total * 1000, 3),
+                'lock_wait_avg_ms': round(self.lock_wait_total * 1000 / self.transactions, 3) if self.transactions else 0.0,
+                'lock_wait_max_ms': round(self.lock_wait_max * 1000, 3),
+            }
+
+
+booking_tx_stats = TransactionStats()
+
+
+def _is_busy(exc):
+    msg = str(exc).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+def run_immediate(db, fn, stats=booking_tx_stats, max_attempts=TX_MAX_ATTEMPTS):
+    # Run fn(db) inside BEGIN IMMEDIATE ... COMMIT, retrying when the write lock
+    # is busy. fn must only touch the database so it is safe to re-run.
+    if db.in_transaction:
+        # The caller already owns a transaction (e.g. a batch); join it through
+        # a savepoint and leave locking and commit to the caller.
+        tx_loads = availability.tx_loads
+        db.execute('SAVEPOINT booking_tx')
+        try:
+            result = fn(db)
+        except Exception:
+            availability.discard_uncommitted(tx_loads)
+            db.execute('ROLLBACK TO booking_tx')
+            db.execute('RELEASE booking_tx')
+            raise
+        db.execute('RELEASE booking_tx')
+        return result
+
+    lock_wait = 0.0
+    attempt = 0
+    while True:
+        attempt += 1
+        started = time.perf_counter()
+        tx_loads = availability.tx_loads
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            lock_wait += time.perf_counter() - started
+            result = fn(db)
+            db.commit()
+        except sqlite3.OperationalError as e:
+            if db.in_transaction:
+                availability.discard_uncommitted(tx_loads)
+                db.rollback()
+            else:
+                lock_wait += time.perf_counter() - started
+            if not _is_busy(e) or attempt >= max_attempts:
+                stats.record(lock_wait, attempt, 'failed')
+                raise
+            pause = random.uniform(0, min(TX_BACKOFF_CAP, TX_BACKOFF_BASE * 2 ** attempt))
+            time.sleep(pause)
+            lock_wait += pause
+            continue
+        except Exception:
+            availability.discard_uncommitted(tx_loads)
+            db.rollback()
+            stats.record(lock_wait, attempt, 'rolled_back')
+            raise
+        stats.record(lock_wait, attempt, 'committed')
+        return result
+
+
+### Booking write-behind queue ###
+
+# Optional mode for traffic spikes: the public booking form validates the
+# request, hands it to a per-process queue and returns a token straight away.
+# One writer thread per process commits queued requests in groups, each group
+# under a single BEGIN IMMEDIATE (one fsync), with every request in its own
+# savepoint so a sold-out request doesn't undo the rest of the group. Outcomes
+# are written to booking_requests in the same transaction, so any worker can
+# answer a status poll. Tokens start with their submit time, so a worker that
+# finds no outcome yet can still tell a request that may be in another worker's
+# queue (pending, for BOOKING_PENDING_WINDOW seconds) from one that is gone.
+#
+# The writer thread starts in each worker on its first submit(), never in the
+# gunicorn master (preload_app): threads and open connections don't survive
+# fork. The master only replays the spool, synchronously, in create_app().
+#
+# HOTEL_BOOKING_WRITES selects the durability contract:
+#   direct  - (default) the booking is committed before the response is sent.
+#   durable - the request is fsynced to a local spool database before the
+#             response; spooled requests are replayed when the app restarts.
+#   queued  - the request is held in memory only; if the process dies before
+#             the writer commits it, the token reports 'unknown' once its
+#             pending window has passed.
+#
+# A request that fails for any reason other than a BookingError (a malformed
+# spooled payload, a constraint violation) is rejected on its own inside its
+# savepoint. When a whole group fails to commit, its requests are retried one
+# by one, and each is given up on after BOOKING_MAX_ATTEMPTS failed commits
+# (a durable request stays in the spool for the next restart and reports
+# 'delayed' once its pending window has passed).
+BOOKING_WRITE_MODE = os.environ.get('HOTEL_BOOKING_WRITES', 'direct')
+BOOKING_BATCH_SIZE = int(os.environ.get('HOTEL_BOOKING_BATCH_SIZE', 100))
+BOOKING_BATCH_WAIT = float(os.environ.get('HOTEL_BOOKING_BATCH_WAIT', 0.005))
+BOOKING_MAX_ATTEMPTS = int(os.environ.get('HOTEL_BOOKING_MAX_ATTEMPTS', 5))
+BOOKING_PENDING_WINDOW = int(os.environ.get('HOTEL_BOOKING_PENDING_WINDOW', 300))
+BOOKING_SPOOL_PATH = os.path.join(os.path.dirname(DB_PATH), 'booking_spool.db')
+
+
+class BookingQueue:
+    def __init__(self, pool, mode=BOOKING_WRITE_MODE, spool_path=BOOKING_SPOOL_PATH,
+                 batch_size=BOOKING_BATCH_SIZE, batch_wait=BOOKING_BATCH_WAIT, max_attempts=BOOKING_MAX_ATTEMPTS,
+                 pending_window=BOOKING_PENDING_WINDOW):
+        if mode not in ('direct', 'queued', 'durable'):
+            raise ValueError(f'Unknown booking write mode: {mode}')
+        self.pool = pool
+        self.mode = mode
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_attempts = max_attempts
+        self.pending_window = pending_window
+        self._lock = threading.Lock()
+        self._reset()
+
+    @property
+    def enabled(self):
+        return self.mode != 'direct'
+
+    def _reset(self):
+        # Threads don't survive fork: each process starts its own writer
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._attempts = {}
+        self._writer = None
+        self._spool_conn = None
+        self.submitted = 0
+        self.confirmed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.commit_time = 0.0
+
+    def _spool(self):
+        # Caller holds self._lock
+        if self._spool_conn is None:
+            conn = sqlite3.connect(self.spool_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = FULL')
+            conn.execute('PRAGMA busy_timeout = 5000')
+            conn.execute('CREATE TABLE IF NOT EXISTS spool (token TEXT PRIMARY KEY, payload TEXT NOT NULL)')
+            conn.commit()
+            self._spool_conn = conn
+        return self._spool_conn
+
+    def _ensure_writer(self):
+        # Caller holds self._lock
+        if self._pid != os.getpid():
+            self._reset()
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='booking-writer', daemon=True)
+            self._writer.start()
+
+    def replay(self):
+        # Commit the requests left in the spool by the previous run, in this
+        # thread, and close every connection used for it: create_app() calls
+        # this before gunicorn forks its workers. Requests that still fail stay
+        # spooled for the next start. Returns the number of requests replayed.
+        if self.mode != 'durable':
+            return 0
+        with self._lock:
+            spooled = self._spool().execute('SELECT token, payload FROM spool').fetchall()
+        replayed = 0
+        for i in range(0, len(spooled), self.batch_size):
+            batch = spooled[i:i + self.batch_size]
+            try:
+                self._commit(batch)
+                replayed += len(batch)
+            except Exception:
+                app.logger.exception('Could not replay %d spooled booking requests', len(batch))
+        with self._lock:
+            self._spool_conn.close()
+            self._spool_conn = None
+        self.pool.close_all()
+        return replayed
+
+    def submit(self, checkin_date, checkout_date, room_id, user_id=None, guest_id=None):
+        token = f'{int(time.time()):x}-{secrets.token_urlsafe(16)}'
+        payload = json.dumps({'checkin_date': checkin_date, 'checkout_date': checkout_date, 'room_id': room_id,
+                              'user_id': user_id, 'guest_id': guest_id,
+                              'submitted_at': datetime.utcnow().isoformat()})
+        with self._lock:
+            self._ensure_writer()
+            if self.mode == 'durable':
+                spool = self._spool()
+                spool.execute('INSERT INTO spool (token, payload) VALUES (?, ?)', (token, payload))
+                spool.commit()
+            self._pending.add(token)
+            self.submitted += 1
+        self._queue.put((token, payload))
+        return token
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception:
+                # Lock still busy after run_immediate's retries, or the disk is
+                # unhappy: keep the requests and try again shortly
+                app.logger.exception('Booking writer failed to commit %d requests', len(batch))
+                time.sleep(0.5)
+                self._retry(batch)
+
+    def _retry(self, batch):
+        # Retry a failed group one request at a time, so one request that can't
+        # be committed doesn't hold the rest back
+        for token, payload in batch:
+            if len(batch) > 1:
+                try:
+                    self._commit([(token, payload)])
+                    continue
+                except Exception:
+                    app.logger.exception('Booking writer failed to commit request %s', token)
+            with self._lock:
+                attempts = self._attempts[token] = self._attempts.get(token, 0) + 1
+                if attempts < self.max_attempts:
+                    self._queue.put((token, payload))
+                    continue
+                del self._attempts[token]
+                self._pending.discard(token)
+                self.abandoned += 1
+            app.logger.error('Booking request %s given up after %d failed commits%s', token, attempts,
+                             ' (left in the spool)' if self.mode == 'durable' else '')
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        conn = self.pool.checkout()
+        try:
+            outcomes = run_immediate(conn, lambda tx: [self._apply(tx, token, payload) for token, payload in batch])
+        finally:
+            self.pool.checkin(conn)
+        tokens = [token for token, _ in batch]
+        with self._lock:
+            if self.mode == 'durable':
+                spool = self._spool()
+                spool.executemany('DELETE FROM spool WHERE token = ?', [(t,) for t in tokens])
+                spool.commit()
+            self._pending.difference_update(tokens)
+            for token in tokens:
+                self._attempts.pop(token, None)
+            self.confirmed += outcomes.count('confirmed')
+            self.rejected += outcomes.count('rejected')
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.commit_time += time.perf_counter() - started
+
+    def _apply(self, tx, token, payload):
+        # Idempotent: a request replayed from the spool after its group
+        # committed is recognised by its token and skipped
+        row = tx.execute('SELECT status FROM booking_requests WHERE token = ?', (token,)).fetchone()
+        if row:
+            return row['status']
+        req, booking_id, error = {}, None, None
+        try:
+            req = json.loads(payload)
+            booking_id = run_immediate(tx, lambda t: _reserve_booking(
+                t, req['checkin_date'], req['checkout_date'], req['room_id'], req['user_id'], req['guest_id'], 1))
+            status = 'confirmed'
+        except BookingError as e:
+            status, error = 'rejected', str(e)
+        except sqlite3.OperationalError:
+            # Lock or disk trouble affects the whole group; let _run retry it
+            raise
+        except Exception:
+            app.logger.exception('Booking request %s could not be processed', token)
+            status, error = 'rejected', 'The booking request could not be processed.'
+            if not isinstance(req, dict):
+                req = {}
+        tx.execute('''
+            INSERT INTO booking_requests (token, status, booking_id, error, room_id, checkin_date, checkout_date,
+                                          submitted_at, decided_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (token, status, booking_id, error, req.get('room_id'), req.get('checkin_date'), req.get('checkout_date'),
+              req.get('submitted_at'), datetime.utcnow().isoformat()))
+        return status
+
+    def status(self, db, token):
+        row = db.execute('''
+            SELECT token, status, booking_id, error, room_id, checkin_date, checkout_date, submitted_at, decided_at
+            FROM booking_requests WHERE token = ?
+        ''', (token,)).fetchone()
+        if row:
+            return dict(row)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if token in self._pending:
+                return {'token': token, 'status': 'pending'}
+            spooled = None
+            if self.mode == 'durable':
+                spooled = self._spool().execute('SELECT 1 FROM spool WHERE token = ?', (token,)).fetchone()
+        # Not decided yet, and possibly queued in another worker: pending while
+        # the token is recent. A spooled request past that is waiting for the
+        # next restart.
+        head = token.partition('-')[0]
+        try:
+            age = time.time() - int(head, 16) if len(head) <= 10 else None
+        except ValueError:
+            age = None
+        if age is not None and -60 < age < self.pending_window:
+            return {'token': token, 'status': 'pending'}
+        return {'token': token, 'status': 'delayed' if spooled else 'unknown'}
+
+    def drain(self, timeout=5.0):
+        # Give the writer a chance to commit what's queued (e.g. at shutdown)
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self._lock:
+                if not self._pending or self._writer is None:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'queued': len(self._pending),
+                'submitted': self.submitted,
+                'confirmed': self.confirmed,
+                'rejected': self.rejected,
+                'abandoned': self.abandoned,
+                'batches': self.batches,
+                'largest_batch': self.largest_batch,
+                'avg_batch': round((self.confirmed + self.rejected) / self.batches, 2) if self.batches else 0,
+                'commit_time_ms': round(self.commit_time * 1000, 3),
+            }
+
+
+booking_queue = BookingQueue(db_pool)
+atexit.register(booking_queue.drain)
+
+
+### Pagination ###
+
+# Keyset (cursor) pagination: each page continues from the sort key of the
+# last row shown instead of using OFFSET, so every page is an index range
+# scan of at most per_page + 1 rows however deep into the history it is.
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    # Only plain scalars can be bound as SQL parameters
+    if not isinstance(values, list) or not all(v is None or isinstance(v, (str, int, float)) for v in values):
+        return None
+    return values
+
+
+def page_size(value, default=PAGE_SIZE_DEFAULT):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, PAGE_SIZE_MAX))
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None, per_page=PAGE_SIZE_DEFAULT):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def keyset_page(db, select, keys, where=(), params=(), after=None, before=None,
+                per_page=PAGE_SIZE_DEFAULT, descending=True):
+    # select: "SELECT ... FROM ... [JOIN ...]" without WHERE/ORDER BY.
+    # keys: [(sql_expr, row_name), ...] forming a unique sort key, e.g.
+    # [('b.created_at', 'created_at'), ('b.booking_id', 'booking_id')].
+    where = list(where)
+    params = list(params)
+    exprs = [expr for expr, _ in keys]
+    cursor = decode_cursor(before) or decode_cursor(after)
+    backwards = cursor is not None and decode_cursor(before) is not None
+    if cursor is not None and len(cursor) == len(keys):
+        forward_op = '<' if descending else '>'
+        op = {'<': '>', '>': '<'}[forward_op] if backwards else forward_op
+        if len(keys) == 1:
+            where.append(f'{exprs[0]} {op} ?')
+            params.append(cursor[0])
+        else:
+            # Spelled out rather than as one row value so SQLite can seek the
+            # index on the leading key (including expression indexes).
+            rest = f"({', '.join(exprs[1:])}) {op} ({', '.join('?' * (len(keys) - 1))})"
+            where.append(f'{exprs[0]} {op}= ? AND ({exprs[0]} {op} ? OR {rest})')
+            params.extend([cursor[0], cursor[0]] + cursor[1:])
+    else:
+        cursor = None
+        backwards = False
+    scan_desc = descending != backwards
+    order = ', '.join(f"{expr} {'DESC' if scan_desc else 'ASC'}" for expr in exprs)
+    sql = select
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {order} LIMIT ?'
+    rows = db.execute(sql, params + [per_page + 1]).fetchall()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def key_of(row):
+        return encode_cursor(row[name] for _, name in keys)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards or has_more:
+            next_cursor = key_of(rows[-1])
+        if (backwards and has_more) or (cursor is not None and not backwards):
+            prev_cursor = key_of(rows[0])
+    return Page(rows, next_cursor, prev_cursor, per_page)
+
+
+def approx_count(db, table):
+    # Rowids are handed out in increasing order, so the largest one is an
+    # O(log n) upper bound on the row count (exact unless rows were deleted).
+    row = db.execute(f'SELECT MAX(rowid) AS n FROM {table}').fetchone()
+    return row['n'] or 0
+
+
+class ListView:
+    # Declarative description of an admin list page.
+    #   select:  "SELECT ... FROM ..." without WHERE/ORDER BY
+    #   key:     [(sql_expr, row_name), ...] unique key, used as the tiebreaker
+    #   sorts:   {param: (sql_expr, row_name)} orderings backed by an index;
+    #            nullable columns are sorted as IFNULL(col, '') with a matching
+    #            expression index so keyset comparisons never see NULL
+    #   filters: {param: (label, sql with one ?)} equality-style filters
+    def __init__(self, table, select, key, sorts=None, default_sort=None, default_dir='asc', filters=None):
+        self.table = table
+        self.select = select
+        self.key = key
+        self.sorts = sorts or {}
+        self.default_sort = default_sort
+        self.default_dir = default_dir
+        self.filters = filters or {}
+
+    def page(self, db, args):
+        sort = args.get('sort')
+        if sort not in self.sorts:
+            sort = self.default_sort
+        direction = args.get('dir')
+        if direction not in ('asc', 'desc'):
+            direction = self.default_dir
+        keys = ([self.sorts[sort]] if sort else []) + self.key
+        where, params = [], []
+        active = {}
+        for param, (_, clause) in self.filters.items():
+            value = args.get(param)
+            if value:
+                where.append(clause)
+                params.append(value)
+                active[param] = value
+        per_page = page_size(args.get('per_page'))
+        page = keyset_page(db, self.select, keys, where, params, after=args.get('after'),
+                           before=args.get('before'), per_page=per_page, descending=direction == 'desc')
+        page.sort = sort
+        page.dir = direction
+        page.filters = active
+        page.filter_fields = [(param, label) for param, (label, _) in self.filters.items()]
+        page.sort_fields = list(self.sorts)
+        # Query-string state carried by pager and sort links
+        page.args = dict(active)
+        if sort != self.default_sort:
+            page.args['sort'] = sort
+        if direction != self.default_dir:
+            page.args['dir'] = direction
+        if args.get('per_page'):
+            page.args['per_page'] = per_page
+        # The estimate counts the whole table, so it is meaningless once filtered
+        page.total = None if active else approx_count(db, self.table)
+        return page
+
+
+### Admin sessions ###
+
+# Sessions live on the server; the cookie only carries a random session id.
+# HOTEL_SESSION_BACKEND picks the store: 'sqlite' (default) keeps them in
+# SESSION_PATH, shared by every worker on the host; 'memory' keeps them in the
+# process (single-process servers only); 'cookie' keeps Flask's signed-cookie
+# sessions. Sessions expire after SESSION_LIFETIME seconds without use, and
+# expired ones are swept every SESSION_SWEEP_INTERVAL.
+#
+# Each worker keeps recently used sessions in an LRU of SESSION_CACHE_SIZE,
+# together with the logged-in admin's principal (id, username, admin_type,
+# managing_floor), so admin_required and role checks cost no query. Cached
+# entries are re-read from the store after SESSION_CACHE_TTL seconds, which
+# bounds how long another worker's revocation takes to be seen here; in the
+# worker that edits, deletes or signs out a user it takes effect immediately.
+SESSION_BACKEND = os.environ.get('HOTEL_SESSION_BACKEND', 'sqlite')
+SESSION_PATH = os.environ.get('HOTEL_SESSION_PATH') or os.path.join(os.path.dirname(DB_PATH), 'sessions.db')
+SESSION_LIFETIME = int(os.environ.get('HOTEL_SESSION_LIFETIME', 12 * 3600))
+SESSION_CACHE_SIZE = int(os.environ.get('HOTEL_SESSION_CACHE_SIZE', 10000))
+SESSION_CACHE_TTL = float(os.environ.get('HOTEL_SESSION_CACHE_TTL', 5))
+SESSION_SWEEP_INTERVAL = 300
+_session_json = TaggedJSONSerializer()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SessionStore:
+    # In-process LRU of sid -> entry; with a path, backed by a SQLite table
+    def __init__(self, path=None, lifetime=SESSION_LIFETIME, cache_size=SESSION_CACHE_SIZE,
+                 cache_ttl=SESSION_CACHE_TTL):
+        self.path = path
+        self.lifetime = lifetime
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._conn = None
+        self._pid = None
+        self._next_sweep = 0.0
+
+    def _db(self):
+        # Caller holds self._lock
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    user_id INTEGER,
+                    data TEXT NOT NULL,
+                    principal TEXT,
+                    expires REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires)')
+            self._conn.commit()
+        return self._conn
+
+    def _cache(self, sid, entry):
+        # Caller holds self._lock
+        self._entries[sid] = entry
+        self._entries.move_to_end(sid)
+        while len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def get(self, sid):
+        # The entry dict {'data', 'principal', 'expires', 'user_id'} or None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None and (self.path is None or entry['checked'] > time.monotonic() - self.cache_ttl):
+                if entry['expires'] <= now:
+                    del self._entries[sid]
+                    return None
+                self._entries.move_to_end(sid)
+                return entry
+            if self.path is None:
+                return None
+            row = self._db().execute('SELECT user_id, data, principal, expires FROM sessions WHERE sid = ?',
+                                     (sid,)).fetchone()
+            if row is None or row[3] <= now:
+                self._entries.pop(sid, None)
+                return None
+            entry = {'user_id': row[0], 'data': _session_json.loads(row[1]),
+                     'principal': json.loads(row[2]) if row[2] else None,
+                     'expires': row[3], 'checked': time.monotonic()}
+            self._cache(sid, entry)
+            return entry
+
+    def save(self, sid, data, principal=None):
+        expires = time.time() + self.lifetime
+        user_id = data.get('admin_id')
+        entry = {'user_id': user_id, 'data': data, 'principal': principal, 'expires': expires,
+                 'checked': time.monotonic()}
+        with self._lock:
+            self._cache(sid, entry)
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('INSERT OR REPLACE INTO sessions (sid, user_id, data, principal, expires) '
+                             'VALUES (?, ?, ?, ?, ?)',
+                             (sid, user_id, _session_json.dumps(data), json.dumps(principal) if principal else None, expires))
+                conn.commit()
+        self.sweep()
+        return expires
+
+    def set_principal(self, sid, principal):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                entry['principal'] = principal
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('UPDATE sessions SET principal = ? WHERE sid = ?', (json.dumps(principal), sid))
+                conn.commit()
+
+    def touch(self, sid, entry):
+        # Slide the idle expiry, at most once per tenth of the lifetime
+        if entry['expires'] - time.time() > self.lifetime * 0.9:
+            return None
+        return self.save(sid, entry['data'], entry['principal'])
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+                conn.commit()
+
+    def revoke_user(self, user_id):
+        # Sign a user out everywhere
+        with self._lock:
+            for sid in [sid for sid, e in self._entries.items() if e['user_id'] == user_id]:
+                del self._entries[sid]
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+                conn.commit()
+
+    def forget_principal(self, user_id):
+        # The user's row changed: reload their principal on the next request
+        with self._lock:
+            for entry in self._entries.values():
+                if entry['user_id'] == user_id:
+                    entry['principal'] = None
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('UPDATE sessions SET principal = NULL WHERE user_id = ?', (user_id,))
+                conn.commit()
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + SESSION_SWEEP_INTERVAL
+            for sid in [sid for sid, e in self._entries.items() if e['expires'] <= now]:
+                del self._entries[sid]
+            if self.path is not None:
+                conn = self._db()
+                conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+                conn.commit()
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        entry = self.store.get(sid) if sid else None
+        if entry is None:
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        session = ServerSession(entry['data'], sid=sid)
+        session.entry = entry
+        return session
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        entry = getattr(session, 'entry', None)
+        if not session:
+            if entry is not None or session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified or entry is None:
+            expires = self.store.save(session.sid, dict(session), entry and entry['principal'])
+        else:
+            expires = self.store.touch(session.sid, entry)
+        response.vary.add('Cookie')
+        if expires is not None:
+            response.set_cookie(name, session.sid, expires=expires, httponly=self.get_cookie_httponly(app),
+                                domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+
+
+session_store = None
+if SESSION_BACKEND in ('sqlite', 'memory'):
+    session_store = SessionStore(SESSION_PATH if SESSION_BACKEND == 'sqlite' else None)
+    app.session_interface = ServerSessionInterface(session_store)
+elif SESSION_BACKEND != 'cookie':
+    raise ValueError(f'Unknown session backend: {SESSION_BACKEND}')
+
+
+def rotate_session():
+    # New session id for the same data (on login and logout, against fixation)
+    if session_store is None:
+        return
+    session_store.delete(session.sid)
+    session.sid = secrets.token_urlsafe(32)
+    session.entry = None
+    session.modified = True
+
+
+def current_admin():
+    # The logged-in admin's principal, or None. Cached in the session entry (and
+    # on g for the request), so only the first request after login or after the
+    # user was edited reads the users table.
+    if 'admin' in g:
+        return g.admin
+    admin_id = session.get('admin_id')
+    principal = None
+    if admin_id:
+        entry = getattr(session, 'entry', None)
+        principal = entry['principal'] if entry else None
+        if principal is None or principal['id'] != admin_id:
+            row = get_db().execute('SELECT id, username, admin_type, managing_floor FROM users '
+                                   'WHERE id = ? AND is_admin = 1', (admin_id,)).fetchone()
+            principal = dict(row) if row else None
+            if principal and entry is not None:
+                session_store.set_principal(session.sid, principal)
+            elif principal is None:
+                session.pop('admin_id', None)
+                session.pop('admin_username', None)
+    g.admin = principal
+    return principal
+
+
+def admin_required(fn):
+    def wrapper(*args, **kwargs):
+        if current_admin() is None:
+            flash('Admin login required', 'danger')
+            return redirect(url_for('admin_login'))
+        return fn(*args, **kwargs)
+    wrapper.__name__ = fn.__name__
+    return wrapper
 
 
 ### Employees helpers and admin routes ###
@@ -299,22 +2033,21 @@ def delete_employee(db, employee_id):
     db.commit()
 
 
-def admin_required(fn):
-    def wrapper(*args, **kwargs):
-        if not session.get('admin_id'):
-            flash('Admin login required', 'danger')
-            return redirect(url_for('admin_login'))
-        return fn(*args, **kwargs)
-    wrapper.__name__ = fn.__name__
-    return wrapper
+EMPLOYEES_LIST = ListView(
+    'employees',
+    'SELECT employee_id, name, phone, position, hire_date, salary FROM employees',
+    key=[('employee_id', 'employee_id')],
+    sorts={'name': ('name', 'name')},
+    filters={'position': ('Position', 'position = ?')},
+)
 
 
 @app.route('/admin/employees')
 @admin_required
 def admin_employees():
     db = get_db()
-    emps = db.execute('SELECT employee_id, name, phone, position, hire_date, salary FROM employees').fetchall()
-    return render_template('admin_employees.html', title='Employees', employees=emps)
+    emps = EMPLOYEES_LIST.page(db, request.args)
+    return render_template('admin_employees.html', title='Employees', employees=emps, page=emps)
 
 
 @app.route('/admin/employees/create', methods=['GET', 'POST'])
@@ -363,6 +2096,81 @@ def admin_employee_delete(employee_id):
     return redirect(url_for('admin_employees'))
 
 
+### Rooms catalog cache ###
+
+# The room-type catalog changes about once a month but is read on every
+# public page view, so each worker keeps it in memory. Entries expire after
+# CATALOG_TTL seconds (which bounds staleness when another worker changed the
+# catalog) and are dropped immediately when this worker writes rooms or
+# room_units. Loaders only open a connection on a miss.
+CATALOG_TTL = float(os.environ.get('HOTEL_CATALOG_TTL', 300))
+
+
+class CatalogCache:
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self.version
+        value = loader(get_db())
+        with self._lock:
+            # Don't cache a value loaded before a concurrent invalidation
+            if version == self.version:
+                self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def room_types(self):
+        return self._get('room_types', lambda db: [dict(r) for r in db.execute(
+            'SELECT id, name, description, price, image FROM rooms ORDER BY id')])
+
+    def room_type(self, type_id):
+        for room in self.room_types():
+            if room['id'] == type_id:
+                return room
+        return None
+
+    def unit_counts(self):
+        # type_id -> {'total': n, 'in_service': n}
+        return self._get('unit_counts', lambda db: {r['type_id']: {'total': r['total'], 'in_service': r['in_service']}
+                                                    for r in db.execute('''
+            SELECT type_id, COUNT(*) AS total, SUM(maintenance = 0) AS in_service
+            FROM room_units WHERE type_id IS NOT NULL GROUP BY type_id
+        ''')})
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'version': self.version,
+                'ttl': self.ttl,
+            }
+
+
+catalog = CatalogCache()
+
+
 ### Room units (individual rooms) helpers and admin routes ###
 
 
@@ -372,6 +2180,7 @@ def create_room_unit(db, type_id, room_no=None, floor=None, occupied=0, availabl
         (type_id, room_no, floor, occupied, available, maintenance)
     )
     db.commit()
+    catalog.invalidate()
     return db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
 
 
@@ -381,26 +2190,39 @@ def update_room_unit(db, room_id, type_id, room_no=None, floor=None, occupied=0,
         (type_id, room_no, floor, occupied, available, maintenance, room_id)
     )
     db.commit()
+    catalog.invalidate()
 
 
 def delete_room_unit(db, room_id):
     db.execute('DELETE FROM room_units WHERE room_id = ?', (room_id,))
     db.commit()
+    catalog.invalidate()
+
+
+ROOM_UNITS_LIST = ListView(
+    'room_units',
+    """SELECT r.room_id, r.type_id, r.room_no, r.occupied, r.available, r.maintenance, r.floor, rm.name as type_name,
+              IFNULL(r.room_no, '') AS room_no_key, IFNULL(r.floor, '') AS floor_key
+       FROM room_units r LEFT JOIN rooms rm ON rm.id = r.type_id""",
+    key=[('r.room_id', 'room_id')],
+    sorts={'room_no': ("IFNULL(r.room_no, '')", 'room_no_key'), 'floor': ("IFNULL(r.floor, '')", 'floor_key')},
+    filters={'type_id': ('Type ID', 'r.type_id = ?'), 'floor': ('Floor', 'r.floor = ?')},
+)
 
 
 @app.route('/admin/room_units')
 @admin_required
 def admin_room_units():
     db = get_db()
-    units = db.execute('SELECT r.room_id, r.type_id, r.room_no, r.occupied, r.available, r.maintenance, r.floor, rm.name as type_name FROM room_units r LEFT JOIN rooms rm ON rm.id = r.type_id').fetchall()
-    return render_template('admin_room_units.html', title='Rooms', units=units)
+    units = ROOM_UNITS_LIST.page(db, request.args)
+    return render_template('admin_room_units.html', title='Rooms', units=units, page=units)
 
 
 @app.route('/admin/room_units/create', methods=['GET', 'POST'])
 @admin_required
 def admin_room_unit_create():
     db = get_db()
-    types = db.execute('SELECT id, name FROM rooms').fetchall()
+    types = catalog.room_types()
     if request.method == 'POST':
         type_id = request.form.get('type_id') or None
         room_no = request.form.get('room_no')
@@ -423,7 +2245,7 @@ def admin_room_unit_edit(room_id):
     if not unit:
         flash('Room not found', 'danger')
         return redirect(url_for('admin_room_units'))
-    types = db.execute('SELECT id, name FROM rooms').fetchall()
+    types = catalog.room_types()
     if request.method == 'POST':
         type_id = request.form.get('type_id') or None
         room_no = request.form.get('room_no')
@@ -471,12 +2293,21 @@ def delete_service(db, service_id):
     db.commit()
 
 
+SERVICES_LIST = ListView(
+    'services',
+    'SELECT s.service_id, s.service_name, s.description, s.unit_price, s.booking_id FROM services s',
+    key=[('s.service_id', 'service_id')],
+    sorts={'service_name': ('s.service_name', 'service_name')},
+    filters={'booking_id': ('Booking ID', 's.booking_id = ?')},
+)
+
+
 @app.route('/admin/services')
 @admin_required
 def admin_services():
     db = get_db()
-    services = db.execute('SELECT s.service_id, s.service_name, s.description, s.unit_price, s.booking_id FROM services s').fetchall()
-    return render_template('admin_services.html', title='Services', services=services)
+    services = SERVICES_LIST.page(db, request.args)
+    return render_template('admin_services.html', title='Services', services=services, page=services)
 
 
 @app.route('/admin/services/create', methods=['GET', 'POST'])
@@ -526,13 +2357,23 @@ def admin_service_delete(service_id):
 ### Invoices helpers and admin routes ###
 
 
-def create_invoice(db, room_charge=None, total_amount=None, tax=None, service_charge=None, issue_date=None, booking_id=None):
-    db.execute(
+def create_invoice(db, room_charge=None, total_amount=None, tax=None, service_charge=None, issue_date=None, booking_id=None,
+                   commit=True):
+    cur = db.execute(
         'INSERT INTO invoices (room_charge, total_amount, tax, service_charge, issue_date, booking_id) VALUES (?, ?, ?, ?, ?, ?)',
         (room_charge, total_amount, tax, service_charge, issue_date, booking_id)
     )
-    db.commit()
-    return db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
+    if commit:
+        db.commit()
+    return cur.lastrowid
+
+
+def invoice_for_booking(db, booking_id, exclude=None):
+    # Number of the booking's invoice, if it has one (other than `exclude`);
+    # a booking is billed at most once
+    row = db.execute('SELECT invoice_no FROM invoices WHERE booking_id = ? AND invoice_no IS NOT ? LIMIT 1',
+                     (booking_id, exclude)).fetchone()
+    return row['invoice_no'] if row else None
 
 
 def update_invoice(db, invoice_no, room_charge=None, total_amount=None, tax=None, service_charge=None, issue_date=None, booking_id=None):
@@ -548,12 +2389,109 @@ def delete_invoice(db, invoice_no):
     db.commit()
 
 
+### Billing ###
+
+# Invoices computed from the bookings themselves: room charge is nights x the
+# room type's nightly price x the number of units assigned (at least one),
+# service charge is the sum of the booking's services, and tax follows the
+# policy below. A whole day's checkouts are billed by one INSERT ... SELECT.
+INVOICE_TAX_RATE = float(os.environ.get('HOTEL_TAX_RATE', 0.10))
+INVOICE_TAX_SERVICES = os.environ.get('HOTEL_TAX_SERVICES', '1') != '0'
+
+_INVOICE_CHARGES = '''
+    SELECT b.booking_id, room_charge, service_charge,
+           ROUND((room_charge + CASE WHEN :tax_services THEN service_charge ELSE 0 END) * :tax_rate, 2) AS tax
+    FROM (
+        SELECT b.booking_id,
+               ROUND(MAX(julianday(b.checkout_date) - julianday(b.checkin_date), 0) * r.price
+                     * MAX((SELECT COUNT(*) FROM belong_to bt WHERE bt.booking_id = b.booking_id), 1), 2) AS room_charge,
+               ROUND((SELECT IFNULL(SUM(s.unit_price), 0) FROM services s WHERE s.booking_id = b.booking_id), 2) AS service_charge
+        FROM bookings b
+        JOIN rooms r ON r.id = b.room_id
+        WHERE b.cancelled = 0 AND {where}
+    ) b
+'''
+
+
+def compute_invoice(db, booking_id):
+    row = db.execute(_INVOICE_CHARGES.format(where='b.booking_id = :booking_id'),
+                     {'booking_id': booking_id, 'tax_rate': INVOICE_TAX_RATE,
+                      'tax_services': INVOICE_TAX_SERVICES}).fetchone()
+    if not row:
+        return None
+    charges = dict(row)
+    charges['total_amount'] = round(charges['room_charge'] + charges['service_charge'] + charges['tax'], 2)
+    return charges
+
+
+def generate_invoices(db, booking_id=None, checkout_date=None, issue_date=None):
+    # Bill one booking or every booking checking out on checkout_date, skipping
+    # bookings that already have an invoice. Returns the number of invoices written.
+    if (booking_id is None) == (checkout_date is None):
+        raise ValueError('Pass either booking_id or checkout_date')
+    params = {'tax_rate': INVOICE_TAX_RATE, 'tax_services': INVOICE_TAX_SERVICES,
+              'issue_date': issue_date or date.today().isoformat()}
+    if booking_id is not None:
+        where = 'b.booking_id = :booking_id'
+        params['booking_id'] = booking_id
+    else:
+        where = 'b.checkout_date = :checkout_date'
+        params['checkout_date'] = checkout_date
+    where += ' AND NOT EXISTS (SELECT 1 FROM invoices i WHERE i.booking_id = b.booking_id)'
+    sql = f'''
+        INSERT INTO invoices (room_charge, service_charge, tax, total_amount, issue_date, booking_id)
+        SELECT room_charge, service_charge, tax, ROUND(room_charge + service_charge + tax, 2), :issue_date, booking_id
+        FROM ({_INVOICE_CHARGES.format(where=where)})
+    '''
+    return run_immediate(db, lambda tx: tx.execute(sql, params).rowcount)
+
+
+@app.route('/admin/invoices/generate', methods=['POST'])
+@admin_required
+def admin_invoices_generate():
+    checkout_date = request.form.get('checkout_date') or date.today().isoformat()
+    try:
+        checkout_date = date.fromisoformat(checkout_date).isoformat()
+    except ValueError:
+        flash('Invalid checkout date', 'danger')
+        return redirect(url_for('admin_invoices'))
+    db = get_db()
+    started = time.perf_counter()
+    count = generate_invoices(db, checkout_date=checkout_date)
+    elapsed = (time.perf_counter() - started) * 1000
+    flash(f'Generated {count} invoices for checkouts on {checkout_date} ({elapsed:.0f} ms)', 'success')
+    return redirect(url_for('admin_invoices'))
+
+
+@app.cli.command('bill-checkouts')
+@click.option('--date', 'checkout_date', default=None, help='Checkout date to bill (YYYY-MM-DD, default today)')
+def bill_checkouts_command(checkout_date):
+    """Write invoices for every booking checking out on the given date."""
+    checkout_date = date.fromisoformat(checkout_date).isoformat() if checkout_date else date.today().isoformat()
+    started = time.perf_counter()
+    count = generate_invoices(get_db(), checkout_date=checkout_date)
+    click.echo(f'{count} invoices written for {checkout_date} in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+
+INVOICES_LIST = ListView(
+    'invoices',
+    """SELECT invoice_no, room_charge, total_amount, tax, service_charge, issue_date, booking_id,
+              IFNULL(issue_date, '') AS issue_date_key
+       FROM invoices""",
+    key=[('invoice_no', 'invoice_no')],
+    sorts={'issue_date': ("IFNULL(issue_date, '')", 'issue_date_key')},
+    default_sort='issue_date',
+    default_dir='desc',
+    filters={'booking_id': ('Booking ID', 'booking_id = ?')},
+)
+
+
 @app.route('/admin/invoices')
 @admin_required
 def admin_invoices():
     db = get_db()
-    invs = db.execute('SELECT invoice_no, room_charge, total_amount, tax, service_charge, issue_date, booking_id FROM invoices ORDER BY issue_date DESC').fetchall()
-    return render_template('admin_invoices.html', title='Invoices', invoices=invs)
+    invs = INVOICES_LIST.page(db, request.args)
+    return render_template('admin_invoices.html', title='Invoices', invoices=invs, page=invs)
 
 
 @app.route('/admin/invoices/create', methods=['GET', 'POST'])
@@ -567,6 +2505,19 @@ def admin_invoice_create():
         issue_date = request.form.get('issue_date') or None
         booking_id = request.form.get('booking_id') or None
         db = get_db()
+        existing = invoice_for_booking(db, booking_id) if booking_id else None
+        if existing:
+            flash(f'Booking {booking_id} already has invoice {existing}', 'danger')
+            return redirect(url_for('admin_invoice_create'))
+        if booking_id and not any((room_charge, total_amount, tax, service_charge)):
+            # No amounts typed in: bill the booking from its stay and services
+            charges = compute_invoice(db, booking_id)
+            if not charges:
+                flash('Booking not found or cancelled', 'danger')
+                return redirect(url_for('admin_invoice_create'))
+            room_charge, service_charge, tax, total_amount = (charges['room_charge'], charges['service_charge'],
+                                                              charges['tax'], charges['total_amount'])
+            issue_date = issue_date or date.today().isoformat()
         create_invoice(db, room_charge, total_amount, tax, service_charge, issue_date, booking_id)
         flash('Invoice created', 'success')
         return redirect(url_for('admin_invoices'))
@@ -589,6 +2540,10 @@ def admin_invoice_edit(invoice_no):
         service_charge = request.form.get('service_charge') or None
         issue_date = request.form.get('issue_date') or None
         booking_id = request.form.get('booking_id') or None
+        existing = invoice_for_booking(db, booking_id, exclude=invoice_no) if booking_id else None
+        if existing:
+            flash(f'Booking {booking_id} already has invoice {existing}', 'danger')
+            return redirect(url_for('admin_invoice_edit', invoice_no=invoice_no))
         update_invoice(db, invoice_no, room_charge, total_amount, tax, service_charge, issue_date, booking_id)
         flash('Invoice updated', 'success')
         return redirect(url_for('admin_invoices'))
@@ -621,17 +2576,24 @@ def get_user_phones(db, user_id):
     return db.execute('SELECT phone FROM user_phones WHERE user_id = ?', (user_id,)).fetchall()
 
 
+USER_PHONES_LIST = ListView(
+    'user_phones',
+    '''
+        SELECT up.user_id, up.phone, u.username
+        FROM user_phones up
+        LEFT JOIN users u ON u.id = up.user_id
+    ''',
+    key=[('up.user_id', 'user_id'), ('up.phone', 'phone')],
+    filters={'user_id': ('User ID', 'up.user_id = ?')},
+)
+
+
 @app.route('/admin/user_phones')
 @admin_required
 def admin_user_phones():
     db = get_db()
-    phones = db.execute('''
-        SELECT up.user_id, up.phone, u.username
-        FROM user_phones up
-        LEFT JOIN users u ON u.id = up.user_id
-        ORDER BY up.user_id
-    ''').fetchall()
-    return render_template('admin_user_phones.html', title='User Phones', phones=phones)
+    phones = USER_PHONES_LIST.page(db, request.args)
+    return render_template('admin_user_phones.html', title='User Phones', phones=phones, page=phones)
 
 
 @app.route('/admin/user_phones/create', methods=['GET', 'POST'])
@@ -690,17 +2652,28 @@ def delete_hired_as(db, hired_as_id):
     db.commit()
 
 
+HIRED_AS_LIST = ListView(
+    'hired_as',
+    '''
+        SELECT h.hired_as_id, h.employee_id, h.role, h.start_date, h.end_date, e.name as employee_name,
+               IFNULL(h.start_date, '') AS start_date_key
+        FROM hired_as h
+        LEFT JOIN employees e ON e.employee_id = h.employee_id
+    ''',
+    key=[('h.hired_as_id', 'hired_as_id')],
+    sorts={'start_date': ("IFNULL(h.start_date, '')", 'start_date_key')},
+    default_sort='start_date',
+    default_dir='desc',
+    filters={'employee_id': ('Employee ID', 'h.employee_id = ?'), 'role': ('Role', 'h.role = ?')},
+)
+
+
 @app.route('/admin/hired_as')
 @admin_required
 def admin_hired_as():
     db = get_db()
-    rows = db.execute('''
-        SELECT h.hired_as_id, h.employee_id, h.role, h.start_date, h.end_date, e.name as employee_name
-        FROM hired_as h
-        LEFT JOIN employees e ON e.employee_id = h.employee_id
-        ORDER BY h.start_date DESC
-    ''').fetchall()
-    return render_template('admin_hired_as.html', title='Hired As', records=rows)
+    rows = HIRED_AS_LIST.page(db, request.args)
+    return render_template('admin_hired_as.html', title='Hired As', records=rows, page=rows)
 
 
 @app.route('/admin/hired_as/create', methods=['GET', 'POST'])
@@ -752,9 +2725,16 @@ def admin_hired_as_delete(hired_as_id):
 ### Belong-to helpers and admin routes ###
 
 
-def add_belong_to(db, booking_id, room_id):
+def add_belong_to(db, booking_id, room_id, commit=True):
+    booking = db.execute('SELECT checkin_date, checkout_date, cancelled FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
+    if not booking:
+        raise BookingError('Booking not found')
+    if not booking['cancelled'] and not availability.unit_is_free(
+            db, room_id, booking['checkin_date'], booking['checkout_date'], ignore_booking_id=int(booking_id)):
+        raise RoomUnavailable('Room is already assigned to another booking for these dates')
     db.execute('INSERT OR IGNORE INTO belong_to (booking_id, room_id) VALUES (?, ?)', (booking_id, room_id))
-    db.commit()
+    if commit:
+        db.commit()
 
 
 def delete_belong_to(db, booking_id, room_id):
@@ -766,18 +2746,26 @@ def get_rooms_for_booking(db, booking_id):
     return db.execute('SELECT r.room_id, r.room_no, rm.name as room_type FROM belong_to b JOIN room_units r ON r.room_id = b.room_id LEFT JOIN rooms rm ON rm.id = r.type_id WHERE b.booking_id = ?', (booking_id,)).fetchall()
 
 
-@app.route('/admin/belong_to')
-@admin_required
-def admin_belong_to():
-    db = get_db()
-    rows = db.execute('''
+BELONG_TO_LIST = ListView(
+    'belong_to',
+    '''
         SELECT b.booking_id, b.room_id, r.room_no, rm.name as room_type
         FROM belong_to b
         LEFT JOIN room_units r ON r.room_id = b.room_id
         LEFT JOIN rooms rm ON rm.id = r.type_id
-        ORDER BY b.booking_id DESC
-    ''').fetchall()
-    return render_template('admin_belong_to.html', title='Belong To', rows=rows)
+    ''',
+    key=[('b.booking_id', 'booking_id'), ('b.room_id', 'room_id')],
+    default_dir='desc',
+    filters={'booking_id': ('Booking ID', 'b.booking_id = ?'), 'room_id': ('Room ID', 'b.room_id = ?')},
+)
+
+
+@app.route('/admin/belong_to')
+@admin_required
+def admin_belong_to():
+    db = get_db()
+    rows = BELONG_TO_LIST.page(db, request.args)
+    return render_template('admin_belong_to.html', title='Belong To', rows=rows, page=rows)
 
 
 @app.route('/admin/belong_to/create', methods=['GET', 'POST'])
@@ -792,7 +2780,11 @@ def admin_belong_to_create():
         if not booking_id or not room_id:
             flash('Booking and room are required', 'danger')
             return redirect(url_for('admin_belong_to_create'))
-        add_belong_to(db, booking_id, room_id)
+        try:
+            add_belong_to(db, booking_id, room_id)
+        except BookingError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin_belong_to_create'))
         flash('Assigned room to booking', 'success')
         return redirect(url_for('admin_belong_to'))
     return render_template('edit_belong_to.html', title='Assign Room to Booking', bookings=bookings, units=units)
@@ -837,12 +2829,22 @@ def delete_guest(db, guest_id):
     db.commit()
 
 
+GUESTS_LIST = ListView(
+    'guests',
+    "SELECT guest_id, invoice_no, name, address, email, NID, phone, IFNULL(name, '') AS name_key FROM guests",
+    key=[('guest_id', 'guest_id')],
+    sorts={'name': ("IFNULL(name, '')", 'name_key')},
+    default_dir='desc',
+    filters={'invoice_no': ('Invoice #', 'invoice_no = ?')},
+)
+
+
 @app.route('/admin/guests')
 @admin_required
 def admin_guests():
     db = get_db()
-    guests = db.execute('SELECT guest_id, invoice_no, name, address, email, NID, phone FROM guests ORDER BY guest_id DESC').fetchall()
-    return render_template('admin_guests.html', title='Guests', guests=guests)
+    guests = GUESTS_LIST.page(db, request.args)
+    return render_template('admin_guests.html', title='Guests', guests=guests, page=guests)
 
 
 @app.route('/admin/guests/create', methods=['GET', 'POST'])
@@ -895,20 +2897,976 @@ def admin_guest_delete(guest_id):
     return redirect(url_for('admin_guests'))
 
 
+### Analytics ###
+
+# Daily rollups keyed by (stat_date, type_id): rooms sold and room revenue for
+# each night, plus arrivals. Triggers on bookings, belong_to and invoices queue
+# the (type_id, date range) each write touches, and a room rate change queues
+# every stay of that type (uninvoiced nights are valued at the current rate);
+# refresh_rollups() recomputes
+# just those nights from the base tables, so reports read a few hundred small
+# rows instead of aggregating every booking. Revenue comes from the booking's
+# invoiced room charge when there is one, otherwise from the nightly rate.
+# Each rebuild covers at most ROLLUP_CHUNK_DAYS nights of one type in its own
+# short write transaction, so a full-history backfill never holds the lock long.
+
+ROLLUP_CHUNK_DAYS = 31
+
+# Every booked stay, one range per room type, for backfills and full rebuilds
+QUEUE_ALL_ROLLUPS = '''
+    INSERT INTO analytics_dirty (type_id, start_date, end_date)
+    SELECT room_id, MIN(checkin_date), MAX(checkout_date) FROM bookings WHERE room_id IS NOT NULL GROUP BY room_id
+'''
+
+
+def init_analytics_schema(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS daily_room_stats (
+            stat_date TEXT NOT NULL,
+            type_id INTEGER NOT NULL,
+            rooms_sold INTEGER NOT NULL DEFAULT 0,
+            room_revenue REAL NOT NULL DEFAULT 0,
+            arrivals INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stat_date, type_id)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_dirty (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL
+        )
+    ''')
+    enqueue = '''
+        INSERT INTO analytics_dirty (type_id, start_date, end_date)
+        SELECT room_id, checkin_date, checkout_date FROM bookings WHERE booking_id = {row}.booking_id;
+    '''
+    stay = '''
+        INSERT INTO analytics_dirty (type_id, start_date, end_date)
+        SELECT {row}.room_id, {row}.checkin_date, {row}.checkout_date WHERE {row}.room_id IS NOT NULL;
+    '''
+    triggers = {
+        'trg_analytics_bookings_ins': ('AFTER INSERT ON bookings', [stay.format(row='NEW')]),
+        'trg_analytics_bookings_upd': ('AFTER UPDATE OF checkin_date, checkout_date, room_id, cancelled ON bookings',
+                                       [stay.format(row='OLD'), stay.format(row='NEW')]),
+        'trg_analytics_bookings_del': ('AFTER DELETE ON bookings', [stay.format(row='OLD')]),
+        'trg_analytics_belong_to_ins': ('AFTER INSERT ON belong_to', [enqueue.format(row='NEW')]),
+        'trg_analytics_belong_to_del': ('AFTER DELETE ON belong_to', [enqueue.format(row='OLD')]),
+        'trg_analytics_invoices_ins': ('AFTER INSERT ON invoices', [enqueue.format(row='NEW')]),
+        'trg_analytics_invoices_upd': ('AFTER UPDATE OF room_charge, booking_id ON invoices',
+                                       [enqueue.format(row='OLD'), enqueue.format(row='NEW')]),
+        'trg_analytics_invoices_del': ('AFTER DELETE ON invoices', [enqueue.format(row='OLD')]),
+        'trg_analytics_rooms_price': ('AFTER UPDATE OF price ON rooms WHEN OLD.price IS NOT NEW.price', ['''
+            INSERT INTO analytics_dirty (type_id, start_date, end_date)
+            SELECT NEW.id, MIN(checkin_date), MAX(checkout_date) FROM bookings WHERE room_id = NEW.id HAVING COUNT(*) > 0;
+        ''']),
+    }
+    for name, (event, statements) in triggers.items():
+        db.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {"".join(statements)} END')
+
+
+_ROLLUP_RANGE = '''
+    WITH RECURSIVE stays AS (
+        SELECT b.checkin_date, b.checkout_date, units,
+               IFNULL((SELECT SUM(i.room_charge) FROM invoices i WHERE i.booking_id = b.booking_id)
+                      / MAX(julianday(b.checkout_date) - julianday(b.checkin_date), 1),
+                      r.price * units) AS nightly
+        FROM (SELECT b.*, MAX((SELECT COUNT(*) FROM belong_to bt WHERE bt.booking_id = b.booking_id), 1) AS units
+              FROM bookings b
+              WHERE b.room_id = :type_id AND b.cancelled = 0 AND b.checkout_date > :start AND b.checkin_date < :end) b
+        JOIN rooms r ON r.id = b.room_id
+    ),
+    -- one row per stay per night, clipped to the range being rebuilt
+    nights(d, last, arrival, units, nightly) AS (
+        SELECT MAX(checkin_date, :start), MIN(checkout_date, :end), checkin_date, units, nightly FROM stays
+        UNION ALL
+        SELECT date(d, '+1 day'), last, arrival, units, nightly FROM nights WHERE date(d, '+1 day') < last
+    )
+    INSERT INTO daily_room_stats (stat_date, type_id, rooms_sold, room_revenue, arrivals)
+    SELECT d, :type_id, SUM(units), ROUND(SUM(nightly), 2), SUM(arrival = d)
+    FROM nights GROUP BY d
+'''
+
+
+def _merge_ranges(rows):
+    # type_id -> list of disjoint [start, end) ranges covering every queued row
+    merged = {}
+    for type_id, start, end in sorted(rows):
+        ranges = merged.setdefault(type_id, [])
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return merged
+
+
+def _date_chunks(start, end, days):
+    # Consecutive [start, end) pieces of at most `days` nights
+    day, last = date.fromisoformat(start), date.fromisoformat(end)
+    while day < last:
+        stop = min(day + timedelta(days=days), last)
+        yield day.isoformat(), stop.isoformat()
+        day = stop
+
+
+def _rebuild_rollup(tx, params):
+    tx.execute('DELETE FROM daily_room_stats WHERE type_id = :type_id AND stat_date >= :start AND stat_date < :end',
+               params)
+    tx.execute(_ROLLUP_RANGE, params)
+
+
+def refresh_rollups(db):
+    # Drain the dirty queue; returns the number of chunks rebuilt. Queue rows are
+    # removed only after every chunk is done; writes landing meanwhile queue new
+    # rows with higher ids, which the next refresh picks up.
+    rows = db.execute('SELECT id, type_id, start_date, end_date FROM analytics_dirty ORDER BY id').fetchall()
+    if not rows:
+        return 0
+    merged = _merge_ranges((r['type_id'], r['start_date'], r['end_date'])
+                           for r in rows if r['start_date'] < r['end_date'])
+    chunks = 0
+    for type_id, ranges in merged.items():
+        for start, end in ranges:
+            for chunk_start, chunk_end in _date_chunks(start, end, ROLLUP_CHUNK_DAYS):
+                params = {'type_id': type_id, 'start': chunk_start, 'end': chunk_end}
+                run_immediate(db, lambda tx: _rebuild_rollup(tx, params))
+                chunks += 1
+    last_id = rows[-1]['id']
+    run_immediate(db, lambda tx: tx.execute('DELETE FROM analytics_dirty WHERE id <= ?', (last_id,)))
+    return chunks
+
+
+def _ratio(numerator, denominator, digits=2):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def analytics_report(db, date_from, date_to, type_id=None):
+    # Occupancy, ADR and RevPAR per room type and per day over [date_from, date_to].
+    # Room inventory is today's in-service unit count for each type.
+    refresh_rollups(db)
+    where, params = ['stat_date >= ?', 'stat_date <= ?'], [date_from, date_to]
+    if type_id is not None:
+        where.append('type_id = ?')
+        params.append(type_id)
+    where = ' AND '.join(where)
+    nights = (date.fromisoformat(date_to) - date.fromisoformat(date_from)).days + 1
+    counts = catalog.unit_counts()
+    types = [t for t in catalog.room_types() if type_id is None or t['id'] == type_id]
+    inventory = {t['id']: counts.get(t['id'], {}).get('in_service', 0) for t in types}
+    total_units = sum(inventory.values())
+
+    by_type = {r['type_id']: r for r in db.execute(f'''
+        SELECT type_id, SUM(rooms_sold) AS rooms_sold, SUM(room_revenue) AS room_revenue, SUM(arrivals) AS arrivals
+        FROM daily_room_stats WHERE {where} GROUP BY type_id
+    ''', params)}
+    summary = []
+    for t in types:
+        row = by_type.get(t['id'])
+        sold, revenue = (row['rooms_sold'], row['room_revenue']) if row else (0, 0.0)
+        available = inventory[t['id']] * nights
+        summary.append({'type_id': t['id'], 'name': t['name'], 'units': inventory[t['id']],
+                        'rooms_sold': sold, 'room_revenue': round(revenue, 2),
+                        'arrivals': row['arrivals'] if row else 0,
+                        'occupancy': _ratio(sold, available, 4), 'adr': _ratio(revenue, sold),
+                        'revpar': _ratio(revenue, available)})
+
+    daily = []
+    for r in db.execute(f'''
+        SELECT stat_date, SUM(rooms_sold) AS rooms_sold, SUM(room_revenue) AS room_revenue, SUM(arrivals) AS arrivals
+        FROM daily_room_stats WHERE {where} GROUP BY stat_date ORDER BY stat_date
+    ''', params):
+        daily.append({'date': r['stat_date'], 'rooms_sold': r['rooms_sold'],
+                      'room_revenue': round(r['room_revenue'], 2), 'arrivals': r['arrivals'],
+                      'occupancy': _ratio(r['rooms_sold'], total_units, 4), 'adr': _ratio(r['room_revenue'], r['rooms_sold']),
+                      'revpar': _ratio(r['room_revenue'], total_units)})
+
+    sold = sum(s['rooms_sold'] for s in summary)
+    revenue = sum(s['room_revenue'] for s in summary)
+    totals = {'units': total_units, 'rooms_sold': sold, 'room_revenue': round(revenue, 2),
+              'occupancy': _ratio(sold, total_units * nights, 4), 'adr': _ratio(revenue, sold),
+              'revpar': _ratio(revenue, total_units * nights)}
+    return {'from': date_from, 'to': date_to, 'nights': nights, 'totals': totals, 'by_type': summary, 'daily': daily}
+
+
+def _analytics_args():
+    today = date.today()
+    date_from = _date_arg('from') or today.replace(day=1)
+    date_to = _date_arg('to') or today
+    if date_to < date_from:
+        abort(400, 'to must not be before from')
+    return date_from.isoformat(), date_to.isoformat(), request.args.get('type_id', type=int)
+
+
+@app.route('/admin/analytics')
+@admin_required
+def admin_analytics():
+    date_from, date_to, type_id = _analytics_args()
+    report = analytics_report(get_db(), date_from, date_to, type_id)
+    return render_template('admin_analytics.html', title='Analytics', report=report,
+                           types=catalog.room_types(), type_id=type_id)
+
+
+@app.route('/admin/analytics.json')
+@admin_required
+def admin_analytics_json():
+    date_from, date_to, type_id = _analytics_args()
+    return jsonify(analytics_report(get_db(), date_from, date_to, type_id))
+
+
+@app.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Queue every booking's stay and rebuild the daily rollups."""
+    db = get_db()
+    run_immediate(db, lambda tx: tx.execute(QUEUE_ALL_ROLLUPS))
+    started = time.perf_counter()
+    pieces = refresh_rollups(db)
+    click.echo(f'Rebuilt {pieces} chunks in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+
+### Occupancy calendar ###
+
+# One bit per night per room unit, packed into a bytearray per (unit, year) and
+# stored as a blob in unit_nights: bit n is the night starting n days after
+# 1 January. Triggers on belong_to and bookings queue the unit and stay range a
+# write touches; refresh_unit_nights() rebuilds those unit-years from the base
+# tables. A checked-out stay stops holding nights from the day it is rebuilt
+# after checkout, so early departures free the rest of the stay.
+
+def init_unit_nights_schema(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS unit_nights (
+            room_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            bits BLOB NOT NULL,
+            PRIMARY KEY (room_id, year)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS unit_nights_dirty (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL
+        )
+    ''')
+    assignment = '''
+        INSERT INTO unit_nights_dirty (room_id, start_date, end_date)
+        SELECT {row}.room_id, checkin_date, checkout_date FROM bookings WHERE booking_id = {row}.booking_id;
+    '''
+    stay = '''
+        INSERT INTO unit_nights_dirty (room_id, start_date, end_date)
+        SELECT room_id, {row}.checkin_date, {row}.checkout_date FROM belong_to WHERE booking_id = {row}.booking_id;
+    '''
+    triggers = {
+        'trg_unit_nights_belong_to_ins': ('AFTER INSERT ON belong_to', [assignment.format(row='NEW')]),
+        'trg_unit_nights_belong_to_del': ('AFTER DELETE ON belong_to', [assignment.format(row='OLD')]),
+        'trg_unit_nights_bookings_upd': ('AFTER UPDATE OF checkin_date, checkout_date, cancelled, checked_out ON bookings',
+                                         [stay.format(row='OLD'), stay.format(row='NEW')]),
+        'trg_unit_nights_bookings_del': ('AFTER DELETE ON bookings', [stay.format(row='OLD')]),
+    }
+    for name, (event, statements) in triggers.items():
+        db.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {"".join(statements)} END')
+
+
+def _night_index(day):
+    return day.timetuple().tm_yday - 1
+
+
+def _year_bits(year, stays):
+    # Pack the nights of [checkin, checkout) stays that fall in `year`
+    bits = bytearray(46)  # 366 nights
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    for checkin_date, checkout_date in stays:
+        start = max(date.fromisoformat(checkin_date), first)
+        end = min(date.fromisoformat(checkout_date) - timedelta(days=1), last)
+        if start > end:
+            continue
+        for n in range(_night_index(start), _night_index(end) + 1):
+            bits[n >> 3] |= 1 << (n & 7)
+    return bytes(bits)
+
+
+UNIT_NIGHTS_CHUNK = 200
+
+
+def _rebuild_unit_nights(tx, unit_years, today):
+    for room_id, year in unit_years:
+        stays = [(s['checkin_date'], s['checkout_date']) for s in tx.execute('''
+            SELECT b.checkin_date,
+                   CASE WHEN b.checked_out = 1 AND b.checkout_date > ? THEN MAX(?, b.checkin_date)
+                        ELSE b.checkout_date END AS checkout_date
+            FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+            WHERE bt.room_id = ? AND b.cancelled = 0 AND b.checkout_date > ? AND b.checkin_date <= ?
+        ''', (today, today, room_id, f'{year}-01-01', f'{year}-12-31'))]
+        tx.execute('''
+            INSERT INTO unit_nights (room_id, year, bits) VALUES (?, ?, ?)
+            ON CONFLICT(room_id, year) DO UPDATE SET bits = excluded.bits
+        ''', (room_id, year, _year_bits(year, stays)))
+
+
+def refresh_unit_nights(db):
+    # Drain the dirty queue; returns the number of unit-years rebuilt. Like
+    # refresh_rollups, each UNIT_NIGHTS_CHUNK unit-years get their own short
+    # write transaction and the queue is cleared once all of them are done.
+    rows = db.execute('SELECT id, room_id, start_date, end_date FROM unit_nights_dirty ORDER BY id').fetchall()
+    if not rows:
+        return 0
+    unit_years = set()
+    for r in rows:
+        if r['start_date'] < r['end_date']:
+            last_night = date.fromisoformat(r['end_date']) - timedelta(days=1)
+            for year in range(int(r['start_date'][:4]), last_night.year + 1):
+                unit_years.add((r['room_id'], year))
+    unit_years = sorted(unit_years)
+    today = date.today().isoformat()
+    for i in range(0, len(unit_years), UNIT_NIGHTS_CHUNK):
+        chunk = unit_years[i:i + UNIT_NIGHTS_CHUNK]
+        run_immediate(db, lambda tx: _rebuild_unit_nights(tx, chunk, today))
+    last_id = rows[-1]['id']
+    run_immediate(db, lambda tx: tx.execute('DELETE FROM unit_nights_dirty WHERE id <= ?', (last_id,)))
+    return len(unit_years)
+
+
+CALENDAR_MAX_DAYS = 366
+
+
+def occupancy_grid(db, start, days, type_id=None):
+    # Units x nights grid: each row carries one True/False per night from start
+    refresh_unit_nights(db)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    where, params = '', []
+    if type_id is not None:
+        where, params = 'WHERE u.type_id = ?', [type_id]
+    units = db.execute(f'''
+        SELECT u.room_id, u.room_no, u.floor, u.maintenance, u.type_id, r.name AS type_name
+        FROM room_units u LEFT JOIN rooms r ON r.id = u.type_id
+        {where}
+        ORDER BY u.type_id, IFNULL(u.room_no, ''), u.room_id
+    ''', params).fetchall()
+    # Only the bitmaps of the units shown: with a type filter, walk that type's
+    # units and look up each one's years by primary key
+    bitmap_sql = 'SELECT n.room_id, n.year, n.bits FROM unit_nights n'
+    if type_id is not None:
+        bitmap_sql += ' JOIN room_units u ON u.room_id = n.room_id WHERE u.type_id = ? AND'
+    else:
+        bitmap_sql += ' WHERE'
+    bitmaps = {}
+    for r in db.execute(bitmap_sql + ' n.year BETWEEN ? AND ?', params + [dates[0].year, dates[-1].year]):
+        bitmaps[(r['room_id'], r['year'])] = r['bits']
+    # Precompute (year, byte, mask) per column so each cell is one lookup
+    columns = [(d.year, _night_index(d) >> 3, 1 << (_night_index(d) & 7)) for d in dates]
+    rows = []
+    for u in units:
+        nights = []
+        for year, byte, mask in columns:
+            bits = bitmaps.get((u['room_id'], year))
+            nights.append(bool(bits and bits[byte] & mask))
+        rows.append({'room_id': u['room_id'], 'room_no': u['room_no'], 'floor': u['floor'],
+                     'type_id': u['type_id'], 'type_name': u['type_name'],
+                     'maintenance': bool(u['maintenance']), 'nights': nights})
+    return {'start': dates[0].isoformat(), 'days': days, 'dates': [d.isoformat() for d in dates], 'units': rows}
+
+
+def _calendar_args():
+    start = _date_arg('start') or date.today()
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= CALENDAR_MAX_DAYS:
+        abort(400, f'days must be between 1 and {CALENDAR_MAX_DAYS}')
+    return start, days, request.args.get('type_id', type=int)
+
+
+@app.route('/admin/calendar')
+@admin_required
+def admin_calendar():
+    start, days, type_id = _calendar_args()
+    grid = occupancy_grid(get_db(), start, days, type_id)
+    return render_template('admin_calendar.html', title='Room Calendar', grid=grid,
+                           types=catalog.room_types(), type_id=type_id)
+
+
+@app.route('/admin/calendar.json')
+@admin_required
+def admin_calendar_json():
+    start, days, type_id = _calendar_args()
+    grid = occupancy_grid(get_db(), start, days, type_id)
+    # Nights as a compact '0'/'1' string per unit
+    for unit in grid['units']:
+        unit['nights'] = ''.join('1' if n else '0' for n in unit['nights'])
+    return jsonify(grid)
+
+
+### Search ###
+
+# Guests and users share one FTS5 index so the desk can look anybody up by
+# name, email, NID or phone. Rowids are derived from the source key (guests
+# even, users odd) so triggers can replace a person's entry directly. Phones are
+# indexed as typed and as digits (see _phone_terms_sql).
+
+SEARCH_LIMIT = 50
+# bm25 weights in column order: kind, ref_id, name, email, nid, phone, address
+SEARCH_WEIGHTS = (0, 0, 10.0, 5.0, 8.0, 5.0, 1.0)
+
+
+def _digits_sql(expr):
+    for ch in (' ', '-', '+', '(', ')', '.', '/'):
+        expr = f"REPLACE({expr}, '{ch}', '')"
+    return expr
+
+
+def _phone_terms_sql(expr):
+    # The phone as typed, its digits, and its last ten digits so a local number
+    # finds one stored with a country code
+    digits = _digits_sql(expr)
+    return f"IFNULL({expr} || ' ' || {digits} || ' ' || substr({digits}, -10), '')"
+
+
+def init_search_schema(db):
+    db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS people_search USING fts5(
+            kind UNINDEXED, ref_id UNINDEXED, name, email, nid, phone, address,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    guest_row = f'''
+        INSERT INTO people_search (rowid, kind, ref_id, name, email, nid, phone, address)
+        SELECT NEW.guest_id * 2, 'guest', NEW.guest_id, NEW.name, NEW.email, NEW.NID,
+               {_phone_terms_sql('NEW.phone')}, NEW.address;
+    '''
+    user_row = f'''
+        DELETE FROM people_search WHERE rowid = {{user_id}} * 2 + 1;
+        INSERT INTO people_search (rowid, kind, ref_id, name, email, nid, phone, address)
+        SELECT u.id * 2 + 1, 'user', u.id, u.username || ' ' || IFNULL(u.user_name, ''), u.email, NULL,
+               (SELECT group_concat({_phone_terms_sql('p')}, ' ') FROM (
+                   SELECT u.phone AS p WHERE u.phone IS NOT NULL
+                   UNION SELECT phone FROM user_phones WHERE user_id = u.id)),
+               NULL
+        FROM users u WHERE u.id = {{user_id}};
+    '''
+    triggers = {
+        'trg_search_guests_ins': ('AFTER INSERT ON guests', guest_row),
+        'trg_search_guests_upd': ('AFTER UPDATE ON guests',
+                                  'DELETE FROM people_search WHERE rowid = OLD.guest_id * 2;' + guest_row),
+        'trg_search_guests_del': ('AFTER DELETE ON guests', 'DELETE FROM people_search WHERE rowid = OLD.guest_id * 2;'),
+        'trg_search_users_ins': ('AFTER INSERT ON users', user_row.format(user_id='NEW.id')),
+        'trg_search_users_upd': ('AFTER UPDATE OF username, user_name, email, phone ON users',
+                                 user_row.format(user_id='NEW.id')),
+        'trg_search_users_del': ('AFTER DELETE ON users', 'DELETE FROM people_search WHERE rowid = OLD.id * 2 + 1;'),
+        'trg_search_user_phones_ins': ('AFTER INSERT ON user_phones', user_row.format(user_id='NEW.user_id')),
+        'trg_search_user_phones_upd': ('AFTER UPDATE ON user_phones',
+                                       user_row.format(user_id='OLD.user_id') + user_row.format(user_id='NEW.user_id')),
+        'trg_search_user_phones_del': ('AFTER DELETE ON user_phones', user_row.format(user_id='OLD.user_id')),
+    }
+    for name, (event, body) in triggers.items():
+        db.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+
+
+def rebuild_search_index(db):
+    # Repopulate people_search from guests and users (used to backfill)
+    db.execute('DELETE FROM people_search')
+    db.execute(f'''
+        INSERT INTO people_search (rowid, kind, ref_id, name, email, nid, phone, address)
+        SELECT guest_id * 2, 'guest', guest_id, name, email, NID,
+               {_phone_terms_sql('phone')}, address
+        FROM guests
+    ''')
+    db.execute(f'''
+        INSERT INTO people_search (rowid, kind, ref_id, name, email, nid, phone, address)
+        SELECT u.id * 2 + 1, 'user', u.id, u.username || ' ' || IFNULL(u.user_name, ''), u.email, NULL,
+               (SELECT group_concat({_phone_terms_sql('p')}, ' ') FROM (
+                   SELECT u.phone AS p WHERE u.phone IS NOT NULL
+                   UNION SELECT phone FROM user_phones WHERE user_id = u.id)),
+               NULL
+        FROM users u
+    ''')
+
+
+def search_match_query(text):
+    # Every word must match, each as a prefix: 'jo smi' -> "jo"* AND "smi"*
+    terms = re.findall(r'\w+', text or '')
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def search_people(db, text, kind=None, limit=SEARCH_LIMIT):
+    match = search_match_query(text)
+    if not match:
+        return []
+    # Rank inside the FTS query, then show the phone as stored in the source row
+    # rather than the indexed copy with the digits-only variant appended
+    params = [match]
+    kind_filter = ''
+    if kind:
+        kind_filter = 'AND kind = ?'
+        params.append(kind)
+    params.append(limit)
+    rows = db.execute(f'''
+        SELECT s.kind, s.ref_id, s.name, s.email, s.nid, s.address, s.score,
+               CASE s.kind WHEN 'guest' THEN g.phone ELSE u.phone END AS phone
+        FROM (
+            SELECT rowid, kind, ref_id, name, email, nid, address,
+                   bm25(people_search, {', '.join(str(w) for w in SEARCH_WEIGHTS)}) AS score
+            FROM people_search WHERE people_search MATCH ? {kind_filter}
+            ORDER BY score LIMIT ?
+        ) s
+        LEFT JOIN guests g ON s.kind = 'guest' AND g.guest_id = s.ref_id
+        LEFT JOIN users u ON s.kind = 'user' AND u.id = s.ref_id
+        ORDER BY s.score
+    ''', params)
+    return [dict(r) for r in rows]
+
+
+def _search_args():
+    kind = request.args.get('kind') or None
+    if kind not in (None, 'guest', 'user'):
+        abort(400, 'kind must be guest or user')
+    limit = min(request.args.get('limit', SEARCH_LIMIT, type=int), 200)
+    return request.args.get('q', '').strip(), kind, max(limit, 1)
+
+
+@app.route('/admin/search')
+@admin_required
+def admin_search():
+    q, kind, limit = _search_args()
+    results = search_people(get_db(), q, kind, limit)
+    return render_template('admin_search.html', title='Search', q=q, kind=kind, results=results)
+
+
+@app.route('/admin/search.json')
+@admin_required
+def admin_search_json():
+    q, kind, limit = _search_args()
+    return jsonify({'q': q, 'results': search_people(get_db(), q, kind, limit)})
+
+
+### Exports ###
+
+# Streaming exports for finance and channel syncs. Rows are read in
+# fetchmany() batches and written to the response as they arrive, so memory
+# use is one batch regardless of table size. Rows are ordered by primary key,
+# which lets a nightly sync ask only for rows after the last key it saw.
+EXPORT_BATCH_SIZE = 1000
+
+# dataset -> (select, primary key column, date column or None)
+EXPORTS = {
+    'bookings': ('''
+        SELECT booking_id, room_id, user_id, guest_id, checkin_date, checkout_date,
+               checked_in, checked_out, reserved, cancelled, no_show, overstay, created_at
+        FROM bookings
+    ''', 'booking_id', 'created_at'),
+    'invoices': ('''
+        SELECT invoice_no, booking_id, issue_date, room_charge, service_charge, tax, total_amount
+        FROM invoices
+    ''', 'invoice_no', 'issue_date'),
+    'guests': ('''
+        SELECT guest_id, invoice_no, name, address, email, NID, phone
+        FROM guests
+    ''', 'guest_id', None),
+    'services': ('''
+        SELECT service_id, booking_id, service_name, description, unit_price
+        FROM services
+    ''', 'service_id', None),
+}
+
+
+def export_query(dataset, since=None, date_from=None, date_to=None):
+    select, key, date_col = EXPORTS[dataset]
+    where, params = [], []
+    if since is not None:
+        where.append(f'{key} > ?')
+        params.append(since)
+    if (date_from or date_to) and not date_col:
+        raise ValueError(f'{dataset} cannot be filtered by date')
+    if date_from:
+        where.append(f'{date_col} >= ?')
+        params.append(date_from.isoformat())
+    if date_to:
+        # Inclusive end date; also matches timestamps later on that day
+        where.append(f'{date_col} < ?')
+        params.append(date.fromordinal(date_to.toordinal() + 1).isoformat())
+    sql = select
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    return sql + f' ORDER BY {key}', params
+
+
+def iter_export(db, sql, params, fmt, batch_size=EXPORT_BATCH_SIZE):
+    cur = db.execute(sql, params)
+    columns = [d[0] for d in cur.description]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        if fmt == 'csv':
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buf.write(json.dumps(dict(zip(columns, row)), separators=(',', ':')))
+                buf.write('\n')
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be a YYYY-MM-DD date')
+
+
+@app.route('/admin/export/<dataset>.<fmt>')
+@admin_required
+def admin_export(dataset, fmt):
+    if dataset not in EXPORTS or fmt not in ('csv', 'jsonl'):
+        abort(404)
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            abort(400, 'since must be an integer key')
+    try:
+        sql, params = export_query(dataset, since, _date_arg('from'), _date_arg('to'))
+    except ValueError as e:
+        abort(400, str(e))
+    db = get_db()
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(iter_export(db, sql, params, fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'})
+
+
+### Bulk import ###
+
+# Bulk loading for setting up a property: rows are validated one at a time as
+# the file streams in, and valid rows are written with executemany() in
+# chunks, one IMMEDIATE transaction per chunk, instead of a commit per row.
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ERRORS = 1000
+
+
+def _text(value):
+    value = '' if value is None else str(value).strip()
+    return value or None
+
+
+def _int(value):
+    value = _text(value)
+    return None if value is None else int(value)
+
+
+def _float(value):
+    value = _text(value)
+    return None if value is None else float(value)
+
+
+def _flag(value):
+    value = _text(value)
+    if value is None:
+        return None
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes', 'on', 'y'):
+        return 1
+    if lowered in ('0', 'false', 'no', 'off', 'n'):
+        return 0
+    raise ValueError(f'expected a yes/no value, got {value!r}')
+
+
+def _iso_date(value):
+    value = _text(value)
+    return None if value is None else date.fromisoformat(value).isoformat()
+
+
+# dataset -> (table, [(column, converter, required, default), ...])
+IMPORTS = {
+    'room_units': ('room_units', [
+        ('type_id', _int, True, None),
+        ('room_no', _text, False, None),
+        ('floor', _int, False, None),
+        ('occupied', _flag, False, 0),
+        ('available', _flag, False, 1),
+        ('maintenance', _flag, False, 0),
+    ]),
+    'employees': ('employees', [
+        ('name', _text, True, None),
+        ('phone', _text, False, None),
+        ('position', _text, False, None),
+        ('hire_date', _iso_date, False, None),
+        ('salary', _float, False, None),
+    ]),
+    'guests': ('guests', [
+        ('invoice_no', _int, False, None),
+        ('name', _text, False, None),
+        ('address', _text, False, None),
+        ('email', _text, False, None),
+        ('NID', _text, False, None),
+        ('phone', _text, False, None),
+    ]),
+}
+
+
+class ImportReport:
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.rows = 0
+        self.inserted = 0
+        self.chunks = 0
+        self.error_count = 0
+        self.errors = []
+        self.elapsed_ms = 0.0
+        self.tx = None
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def iter_import_records(stream, fmt):
+    # Yields (line_number, dict) from a text stream of CSV (with a header row) or
+    # JSON Lines. Text that isn't UTF-8 ends the file with one error record.
+    line_no = 0
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                line_no = reader.line_num
+                yield line_no, record
+        else:
+            for line_no, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+                    continue
+                yield line_no, record if isinstance(record, dict) else ValueError('expected a JSON object')
+    except UnicodeDecodeError:
+        yield line_no + 1, ValueError('file is not UTF-8 text; rows from here on were not read')
+
+
+def _validate_record(columns, record, lookups):
+    values = []
+    for column, convert, required, default in columns:
+        raw = record.get(column)
+        try:
+            value = convert(raw)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'{column}: {e}')
+        if value is None:
+            if required:
+                raise ValueError(f'{column} is required')
+            value = default
+        if column in lookups and value is not None and value not in lookups[column]:
+            raise ValueError(f'{column} {value} does not exist')
+        values.append(value)
+    return values
+
+
+def bulk_import(db, dataset, records, chunk_size=IMPORT_CHUNK_SIZE):
+    table, columns = IMPORTS[dataset]
+    report = ImportReport(dataset)
+    stats = TransactionStats()
+    started = time.perf_counter()
+    # Room types are checked in memory; the catalog is small
+    lookups = {}
+    if dataset == 'room_units':
+        lookups['type_id'] = {r['id'] for r in catalog.room_types()}
+    names = [c[0] for c in columns]
+    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+    def flush(batch):
+        run_immediate(db, lambda tx: tx.executemany(sql, batch), stats=stats)
+        report.inserted += len(batch)
+        report.chunks += 1
+
+    batch = []
+    for line, record in records:
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.add_error(line, str(record))
+            continue
+        try:
+            batch.append(_validate_record(columns, record, lookups))
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    if dataset == 'room_units' and report.inserted:
+        catalog.invalidate()
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    report.tx = stats.snapshot()
+    return report
+
+
+def import_format(filename, fmt=None):
+    if fmt in ('csv', 'jsonl'):
+        return fmt
+    return 'jsonl' if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+@app.route('/admin/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import():
+    report = None
+    if request.method == 'POST':
+        dataset = request.form.get('dataset')
+        upload = request.files.get('file')
+        if dataset not in IMPORTS or not upload or not upload.filename:
+            flash('Choose a dataset and a CSV or JSONL file', 'danger')
+            return redirect(url_for('admin_import'))
+        chunk_size = request.form.get('chunk_size', type=int) or IMPORT_CHUNK_SIZE
+        fmt = import_format(upload.filename, request.form.get('format'))
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+        db = get_db()
+        report = bulk_import(db, dataset, iter_import_records(stream, fmt), max(1, chunk_size))
+        flash(f'Imported {report.inserted} {dataset} rows ({report.error_count} rejected)',
+              'success' if not report.error_count else 'warning')
+    return render_template('admin_import.html', title='Bulk Import', datasets=list(IMPORTS),
+                           report=report, chunk_size=IMPORT_CHUNK_SIZE)
+
+
+@app.cli.command('import-data')
+@click.argument('dataset', type=click.Choice(list(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None)
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True)
+def import_data_command(dataset, path, fmt, chunk_size):
+    """Bulk-load room_units, employees or guests from a CSV or JSONL file."""
+    fmt = import_format(path, fmt)
+    with open(path, encoding='utf-8-sig', newline='' if fmt == 'csv' else None) as stream:
+        report = bulk_import(get_db(), dataset, iter_import_records(stream, fmt), max(1, chunk_size))
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'{report.inserted} of {report.rows} rows imported in {report.chunks} chunks '
+               f'({report.elapsed_ms} ms, {report.error_count} rejected)')
+
+
+@app.cli.command('generate-data')
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--units', default=60, show_default=True, help='Room units; about 3300 rows per unit over 10 years')
+@click.option('--room-types', default=3, show_default=True)
+@click.option('--years', default=2, show_default=True, help='Years of history before today')
+@click.option('--guests', type=int, default=None, help='Guest rows (default 20 per unit per year)')
+@click.option('--employees', type=int, default=None, help='Employees (default one per 4 units)')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--occupancy', default=0.7, show_default=True)
+@click.option('--today', default=None, help='Date the data is generated around (YYYY-MM-DD)')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows per load transaction')
+@click.option('--refresh/--no-refresh', default=False, help='Drain the analytics and calendar queues after loading')
+@click.option('--force', is_flag=True, help='Overwrite an existing file')
+def generate_data_command(path, units, room_types, years, guests, employees, seed, occupancy, today, batch_size,
+                          refresh, force):
+    """Generate a seeded synthetic database for scale testing."""
+    import datagen
+    if os.path.abspath(path) == os.path.abspath(DB_PATH):
+        raise click.UsageError('Refusing to overwrite the application database')
+    if os.path.exists(path) and not force:
+        raise click.UsageError(f'{path} exists; pass --force to overwrite it')
+    counts = datagen.generate(path, room_types=room_types, units=units, years=years, guests=guests, seed=seed,
+                              occupancy=occupancy, today=date.fromisoformat(today) if today else None,
+                              employees=employees, batch_size=batch_size, refresh=refresh,
+                              progress=click.echo)
+    for table in datagen.TABLES:
+        click.echo(f'{table:<12}{counts[table]:>12}')
+    click.echo(f"{counts['rows']} rows in {counts['seconds']} s (load {counts['load_seconds']} s)")
+    conn = sqlite3.connect(path)
+    problems = datagen.validate(conn)
+    conn.close()
+    for problem in problems:
+        click.echo(f'INVALID: {problem}', err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo('No double-bookings; every invoice matches its booking')
+
+
+### Application setup ###
+
+# Schema migrations and seeding run once per deploy, not once per worker:
+# create_app() is called by the entry points (wsgi.py, asgi.py, `python app.py`)
+# and, with gunicorn's preload_app, runs in the master before it forks. A file
+# lock makes concurrent starts queue behind whichever gets there first; once
+# the schema is current, setup is read-only. Set HOTEL_SETUP=0 when a deploy
+# step has already run `flask --app app setup-db`.
+SETUP_LOCK_PATH = DB_PATH + '.setup.lock'
+
+
+@contextmanager
+def setup_lock(path=SETUP_LOCK_PATH):
+    with open(path, 'a+') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
 def setup_db():
-    # Initialize database and seed defaults. Not using
-    # @app.before_first_request for compatibility with
-    # older Flask versions/environments. Use an application
-    # context so `g` and `get_db()` work during init.
-    with app.app_context():
+    # Initialize database and seed defaults. Use an application context so
+    # `g` and `get_db()` work during init.
+    with setup_lock(), app.app_context():
         init_db()
         create_first_admin()
         create_default_rooms()
 
 
-# Run setup immediately so the DB exists whether the app is
-# started directly or imported by a WSGI server.
-setup_db()
+def warm_up():
+    # Load read-mostly state once, before workers fork, so each worker starts
+    # with it already in (copy-on-write) memory: the room catalog, each room
+    # type's availability calendar and the compiled templates. Connections are
+    # closed afterwards; the pool reopens them per process.
+    today = date.today().isoformat()
+    with app.app_context():
+        db = get_db()
+        for room in catalog.room_types():
+            availability.calendar(db, room['id'], today)
+        catalog.unit_counts()
+        for name in app.jinja_env.list_templates():
+            if name.endswith('.html'):
+                app.jinja_env.get_template(name)
+    db_pool.close_all()
+
+
+def create_app(setup=None, warm=True):
+    if setup is None:
+        setup = os.environ.get('HOTEL_SETUP', '1') != '0'
+    if setup:
+        setup_db()
+    if warm:
+        warm_up()
+    booking_queue.replay()
+    return app
+
+
+@app.cli.command('setup-db')
+def setup_db_command():
+    """Apply pending migrations and seed defaults (run once per deploy)."""
+    with app.app_context():
+        before = schema_version(get_db())
+    setup_db()
+    with app.app_context():
+        after = schema_version(get_db())
+    click.echo(f'Schema at version {after}' + (f' (was {before})' if before != after else ', nothing to do'))
 
 
 @app.teardown_appcontext
@@ -916,20 +3874,240 @@ def teardown_db(exception):
     close_db(exception)
 
 
-def admin_required(fn):
+### Public page cache ###
+
+# Rendered HTML of the public pages, keyed on path and catalog version, with a
+# strong ETag so browsers and CDNs can revalidate with a 304 instead of
+# re-downloading. Requests carrying per-user state (a logged-in admin or
+# pending flash messages) are rendered normally and never cached.
+PAGE_CACHE_MAX_AGE = 60
+
+
+class PageCache:
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] > time.monotonic():
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, body):
+        entry = {
+            'body': body,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': datetime.now(timezone.utc).replace(microsecond=0),
+            'expires': time.monotonic() + self.ttl,
+        }
+        with self._lock:
+            # Older catalog versions can never be requested again
+            for old in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[old]
+            self._entries[key] = entry
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+page_cache = PageCache()
+
+
+def cached_page(fn):
     def wrapper(*args, **kwargs):
-        if not session.get('admin_id'):
-            flash('Admin login required', 'danger')
-            return redirect(url_for('admin_login'))
-        return fn(*args, **kwargs)
+        if request.method != 'GET' or session.get('admin_id') or session.get('_flashes'):
+            return fn(*args, **kwargs)
+        key = (request.path, catalog.version)
+        entry = page_cache.get(key)
+        if entry is None:
+            rv = app.make_response(fn(*args, **kwargs))
+            if rv.status_code != 200:
+                return rv
+            entry = page_cache.put(key, rv.get_data())
+        resp = Response(entry['body'], mimetype='text/html')
+        resp.set_etag(entry['etag'])
+        resp.last_modified = entry['last_modified']
+        resp.cache_control.public = True
+        resp.cache_control.max_age = PAGE_CACHE_MAX_AGE
+        resp.vary.add('Cookie')
+        return resp.make_conditional(request)
     wrapper.__name__ = fn.__name__
     return wrapper
 
+
+@app.template_filter('room_image_file')
+def room_image_file(image):
+    # rooms.image holds either an absolute URL or a path ending in static/images/<file>;
+    # returns the file's path under static/, or None for a remote image
+    if image and image.startswith(('http://', 'https://', '//')):
+        return None
+    return 'images/' + (os.path.basename(image) if image else 'abc.jpg')
+
+
+@app.template_filter('room_image_url')
+def room_image_url(image):
+    filename = room_image_file(image)
+    return url_for('static', filename=filename) if filename else image
+
+
+### Static assets ###
+
+# `flask build-assets` writes static/dist/: a content-hashed copy of every
+# static file, gzip/brotli variants of text assets and resized WebP/AVIF
+# variants of photos, plus manifest.json. When the manifest exists,
+# url_for('static', ...) points at the hashed copy, which is served with a
+# one-year immutable Cache-Control; without a build nothing changes.
+STATIC_DIST = 'dist'
+ASSET_MAX_AGE = 31536000
+ASSET_COMPRESS_EXTS = ('.css', '.js', '.svg', '.ttf', '.otf')
+ASSET_IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+ASSET_IMAGE_WIDTHS = (480, 960, 1440)
+_HASHED_ASSET = re.compile(r'\.[0-9a-f]{10}(\.|$)')
+
+
+def load_asset_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, STATIC_DIST, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('files', {})
+    manifest.setdefault('images', {})
+    return manifest
+
+
+asset_manifest = load_asset_manifest(app.static_folder)
+
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == 'static':
+        hashed = asset_manifest['files'].get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+
+
+@app.template_global()
+def image_srcset(filename, fmt):
+    variants = asset_manifest['images'].get(filename, {}).get(fmt)
+    if not variants:
+        return ''
+    return ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in variants)
+
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    directory = os.path.join(app.static_folder, STATIC_DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for enc, ext in (('br', '.br'), ('gzip', '.gz')):
+        candidate = safe_join(directory, filename + ext)
+        if enc in request.accept_encodings and candidate and os.path.isfile(candidate):
+            served, encoding = filename + ext, enc
+            break
+    immutable = bool(_HASHED_ASSET.search(filename))
+    resp = send_from_directory(directory, served, mimetype=mimetype,
+                               max_age=ASSET_MAX_AGE if immutable else None)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    if immutable:
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+    return resp
+
+
+def _write_asset(dist, rel, data):
+    path = os.path.join(dist, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _image_variants(dist, src, stem, digest, widths):
+    # Returns {fmt: [(width, dist_relative_path), ...]}; empty without Pillow
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return {}
+    formats = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+    variants = {}
+    with Image.open(src) as img:
+        img = img.convert('RGB')
+        sizes = sorted({w for w in widths if w < img.width} | {img.width})
+        for fmt in formats:
+            for width in sizes:
+                height = round(img.height * width / img.width)
+                resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+                rel = f'{stem}.{digest}.{width}w.{fmt}'
+                buf = io.BytesIO()
+                resized.save(buf, fmt.upper(), quality=60 if fmt == 'avif' else 80)
+                _write_asset(dist, rel, buf.getvalue())
+                variants.setdefault(fmt, []).append((width, f'{STATIC_DIST}/{rel}'))
+    return variants
+
+
+def build_assets(static_folder, widths=ASSET_IMAGE_WIDTHS):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    dist = os.path.join(static_folder, STATIC_DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {'files': {}, 'images': {}}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            if name.lower().endswith('.md'):
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_folder).replace(os.sep, '/')
+            with open(src, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            stem, ext = os.path.splitext(rel)
+            hashed = f'{stem}.{digest}{ext}'
+            # Unhashed copies keep relative url() references inside CSS working
+            for out in (rel, hashed):
+                _write_asset(dist, out, data)
+                if ext.lower() in ASSET_COMPRESS_EXTS:
+                    _write_asset(dist, out + '.gz', gzip.compress(data, 9, mtime=0))
+                    if brotli is not None:
+                        _write_asset(dist, out + '.br', brotli.compress(data))
+            manifest['files'][rel] = f'{STATIC_DIST}/{hashed}'
+            if ext.lower() in ASSET_IMAGE_EXTS:
+                variants = _image_variants(dist, src, stem, digest, widths)
+                if variants:
+                    manifest['images'][rel] = variants
+    _write_asset(dist, 'manifest.json', json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint, precompress and resize static assets into static/dist."""
+    global asset_manifest
+    asset_manifest = build_assets(app.static_folder)
+    images = sum(len(v) for variants in asset_manifest['images'].values() for v in variants.values())
+    click.echo(f"{len(asset_manifest['files'])} assets fingerprinted, {images} image variants written")
+
+
 @app.route('/')
+@cached_page
 def index():
     return render_template('index.html', title='Home')
 
 @app.route('/about')
+@cached_page
 def about():
     return render_template('about.html', title='About')
 
@@ -948,49 +4126,160 @@ def contact():
     return render_template('contact.html', title='Contact')
 
 @app.route('/rooms')
+@cached_page
 def rooms():
-    db = get_db()
-    rooms = db.execute('SELECT id, name, description, price, image FROM rooms').fetchall()
-    return render_template('rooms.html', title='Our Rooms', rooms=rooms)
+    return render_template('rooms.html', title='Our Rooms', rooms=catalog.room_types(),
+                           unit_counts=catalog.unit_counts())
 
 @app.route('/booking/<int:room_id>', methods=['GET', 'POST'])
 def booking(room_id):
-    db = get_db()
-    room = db.execute('SELECT id, name, description, price, image FROM rooms WHERE id = ?', (room_id,)).fetchone()
+    room = catalog.room_type(room_id)
     if not room:
         flash('Room not found', 'danger')
         return redirect(url_for('rooms'))
 
     if request.method == 'POST':
+        db = get_db()
         check_in = request.form.get('check_in_date')
         check_out = request.form.get('check_out_date')
         # If your app supports logged-in users, set `user_id` in session; otherwise leave NULL
         user_id = session.get('user_id') if session.get('user_id') else None
         guest_id = None
 
-        from datetime import datetime
-        created_at = datetime.utcnow().isoformat()
-
-        db.execute(
-            'INSERT INTO bookings (checkin_date, checkout_date, room_id, user_id, guest_id, reserved, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (check_in, check_out, room_id, user_id, guest_id, 1, created_at)
-        )
-        db.commit()
+        try:
+            if booking_queue.enabled:
+                # Reject what we can without the write lock, then queue the rest
+                check_in, check_out = parse_stay(check_in, check_out)
+                if not availability.has_capacity(db, room_id, check_in, check_out):
+                    raise RoomUnavailable('No rooms of this type are free for the selected dates')
+                token = booking_queue.submit(check_in, check_out, room_id, user_id, guest_id)
+                return redirect(url_for('booking_status', token=token))
+            create_booking(db, check_in, check_out, room_id, user_id, guest_id, 1)
+        except BookingError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('booking', room_id=room_id))
         flash(f'Your booking for {room["name"]} has been received!', 'success')
         return redirect(url_for('index'))
 
     return render_template('booking.html', title='Book a Room', room=room, room_id=room_id)
 
 
+@app.route('/booking/status/<token>')
+def booking_status(token):
+    result = booking_queue.status(get_db(), token)
+    room = catalog.room_type(result['room_id']) if result.get('room_id') else None
+    return render_template('booking_status.html', title='Booking Status', result=result, room=room)
+
+
+@app.route('/booking/status/<token>.json')
+def booking_status_json(token):
+    result = booking_queue.status(get_db(), token)
+    code = {'unknown': 404, 'pending': 202, 'delayed': 202}.get(result['status'], 200)
+    return jsonify(result), code
+
+
+### Login throttling ###
+
+# Token buckets per client IP and per username, checked before any password
+# hashing: each login attempt takes a token from both, and an empty bucket
+# turns the attempt away with 429 and Retry-After. Buckets refill at
+# LOGIN_*_RATE attempts per minute up to LOGIN_*_BURST. They live in each
+# worker process, so a deployment's effective limit is per worker. Only the
+# LOGIN_MAX_KEYS most recently seen keys are kept.
+LOGIN_IP_RATE = float(os.environ.get('HOTEL_LOGIN_IP_RATE', 20))
+LOGIN_IP_BURST = int(os.environ.get('HOTEL_LOGIN_IP_BURST', 10))
+LOGIN_USER_RATE = float(os.environ.get('HOTEL_LOGIN_USER_RATE', 6))
+LOGIN_USER_BURST = int(os.environ.get('HOTEL_LOGIN_USER_BURST', 5))
+LOGIN_MAX_KEYS = 10000
+
+
+class TokenBuckets:
+    def __init__(self, per_minute, burst, max_keys=LOGIN_MAX_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = collections.OrderedDict()
+
+    def take(self, key, now=None):
+        # Returns 0 when a token was taken, else the seconds until one is available
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            elif self.rate > 0:
+                wait = (1 - tokens) / self.rate
+            else:
+                wait = float('inf')
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+login_ip_buckets = TokenBuckets(LOGIN_IP_RATE, LOGIN_IP_BURST)
+login_user_buckets = TokenBuckets(LOGIN_USER_RATE, LOGIN_USER_BURST)
+_dummy_hash = None
+
+
+def login_throttle(ip, username):
+    # Seconds the caller must wait, or 0 to go ahead; takes a token from both buckets
+    wait = max(login_ip_buckets.take(ip or '-'), login_user_buckets.take((username or '').strip().lower()))
+    if wait:
+        metrics.timer('login_throttled', 0.0)
+    return wait
+
+
+def check_login(db, username, password):
+    # The admin user row for valid credentials, else None. Unknown usernames
+    # still cost one hash so response times don't reveal which names exist.
+    # Raises HashPoolBusy when too many checks are already running.
+    global _dummy_hash
+    user = db.execute('SELECT id, username, password FROM users WHERE username = ? AND is_admin = 1',
+                      (username,)).fetchone()
+    if user is None:
+        if _dummy_hash is None:
+            _dummy_hash = generate_password_hash(secrets.token_hex(16), PASSWORD_METHOD)
+        verify_password(_dummy_hash, password, wait=HASH_WAIT)
+        return None
+    if not verify_password(user['password'], password, wait=HASH_WAIT):
+        return None
+    if needs_rehash(user['password']):
+        try:
+            pw_hash = hash_password(password, wait=0)
+        except HashPoolBusy:
+            pass  # upgraded on a later login
+        else:
+            db.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                       (pw_hash, user['id'], user['password']))
+            db.commit()
+    return user
+
+
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
-        db = get_db()
-        cur = db.execute('SELECT * FROM users WHERE username = ? AND is_admin = 1', (username,))
-        user = cur.fetchone()
-        if user and check_password_hash(user['password'], password):
+        wait = login_throttle(request.remote_addr, username)
+        if wait:
+            retry_after = int(min(wait, 3600)) + 1
+            flash(f'Too many login attempts. Try again in {retry_after} seconds.', 'danger')
+            return render_template('admin_login.html', title='Admin Login'), 429, {'Retry-After': str(retry_after)}
+        try:
+            user = check_login(get_db(), username, password or '')
+        except HashPoolBusy:
+            flash('The server is busy. Please try again in a moment.', 'danger')
+            return render_template('admin_login.html', title='Admin Login'), 503, {'Retry-After': '1'}
+        if user:
+            rotate_session()
             session['admin_id'] = user['id']
             session['admin_username'] = user['username']
             flash('Logged in as admin', 'success')
@@ -1003,32 +4292,202 @@ def admin_login():
 def admin_logout():
     session.pop('admin_id', None)
     session.pop('admin_username', None)
+    rotate_session()
     flash('Logged out', 'success')
     return redirect(url_for('index'))
 
 
+USERS_LIST = ListView(
+    'users',
+    '''SELECT id, username, user_name, created_at, email, phone,
+              admin_id, manager_id, managing_floor, receptionist_id, admin_type, is_admin
+       FROM users''',
+    key=[('id', 'id')],
+    sorts={'username': ('username', 'username')},
+    filters={'admin_type': ('Admin Type', 'admin_type = ?')},
+)
+
+
 @app.route('/admin')
 @admin_required
 def admin_panel():
     db = get_db()
-    users = db.execute('''SELECT id, username, user_name, created_at, email, phone,
-                                 admin_id, manager_id, managing_floor, receptionist_id, admin_type, is_admin
-                          FROM users''').fetchall()
-    return render_template('admin_panel.html', title='Admin Panel', users=users)
+    users = USERS_LIST.page(db, request.args)
+    return render_template('admin_panel.html', title='Admin Panel', users=users, page=users)
+
+
+BOOKING_STATUS_FILTERS = {
+    'reserved': 'b.reserved = 1',
+    'checked_in': 'b.checked_in = 1',
+    'checked_out': 'b.checked_out = 1',
+    'cancelled': 'b.cancelled = 1',
+    'no_show': 'b.no_show = 1',
+    'overstay': 'b.overstay = 1',
+}
+
+
+def booking_list_page(db, args):
+    # Keyset page of bookings filtered by status, room type and check-in range
+    # (shared by the admin list and the JSON API). Raises ValueError for a
+    # from/to that isn't a YYYY-MM-DD date.
+    where, params = [], []
+    status = args.get('status') or None
+    if status in BOOKING_STATUS_FILTERS:
+        where.append(BOOKING_STATUS_FILTERS[status])
+    type_id = args.get('type_id', type=int)
+    if type_id:
+        where.append('b.room_id = ?')
+        params.append(type_id)
+    for name, op in (('from', '>='), ('to', '<=')):
+        value = args.get(name)
+        if value:
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError(f'{name} must be a YYYY-MM-DD date')
+            where.append(f'b.checkin_date {op} ?')
+            params.append(value)
+    per_page = page_size(args.get('per_page'))
+    return keyset_page(db, '''
+        SELECT b.booking_id, b.room_id, r.name as room_name, b.user_id, b.guest_id,
+               b.checkin_date, b.checkout_date, b.checked_in, b.checked_out, b.reserved, b.cancelled, b.no_show, b.overstay, b.created_at
+        FROM bookings b
+        JOIN rooms r ON r.id = b.room_id
+    ''', [('b.created_at', 'created_at'), ('b.booking_id', 'booking_id')], where, params,
+        after=args.get('after'), before=args.get('before'), per_page=per_page)
 
 
 @app.route('/admin/bookings')
 @admin_required
 def admin_bookings():
     db = get_db()
-    bookings = db.execute('''
-        SELECT b.booking_id, b.room_id, r.name as room_name, b.user_id, b.guest_id,
-               b.checkin_date, b.checkout_date, b.checked_in, b.checked_out, b.reserved, b.cancelled, b.created_at
-        FROM bookings b
-        JOIN rooms r ON r.id = b.room_id
-        ORDER BY b.created_at DESC
-    ''').fetchall()
-    return render_template('admin_bookings.html', title='Bookings', bookings=bookings)
+    try:
+        page = booking_list_page(db, request.args)
+    except ValueError as e:
+        abort(400, str(e))
+    status = request.args.get('status') or None
+    type_id = request.args.get('type_id', type=int)
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    filters = {k: v for k, v in (('status', status), ('type_id', type_id), ('from', date_from),
+                                 ('to', date_to), ('per_page', request.args.get('per_page'))) if v}
+    types = sorted(catalog.room_types(), key=lambda t: t['name'])
+    return render_template('admin_bookings.html', title='Bookings', bookings=page, page=page,
+                           filters=filters, types=types, statuses=list(BOOKING_STATUS_FILTERS))
+
+
+@app.route('/admin/cache/stats')
+@admin_required
+def admin_cache_stats():
+    return jsonify({'catalog': catalog.stats(), 'pages': page_cache.stats()})
+
+
+@app.route('/admin/db/pool_stats')
+@admin_required
+def admin_db_pool_stats():
+    return jsonify(db_pool.stats())
+
+
+@app.route('/admin/bookings/tx_stats')
+@admin_required
+def admin_booking_tx_stats():
+    return jsonify(dict(booking_tx_stats.snapshot(), queue=booking_queue.stats()))
+
+
+@app.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    return render_template('admin_metrics.html', title='Metrics', metrics=metrics.snapshot(),
+                           pool=db_pool.stats(), enabled=METRICS_ENABLED, slow_ms=METRICS_SLOW_QUERY_MS)
+
+
+@app.route('/admin/metrics.json')
+@admin_required
+def admin_metrics_json():
+    return jsonify(dict(metrics.snapshot(), pool=db_pool.stats()))
+
+
+@app.route('/admin/metrics/reset', methods=['POST'])
+@admin_required
+def admin_metrics_reset():
+    metrics.reset()
+    flash('Metrics reset', 'success')
+    return redirect(url_for('admin_metrics'))
+
+
+def _prom_sample(name, labels, value):
+    if not labels:
+        return f'{name} {value}'
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ') for v in labels.values())
+    return name + '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}' + f' {value}'
+
+
+def _route_labels(route):
+    return {'endpoint': route['endpoint'], 'method': route['method']}
+
+
+def prometheus_text(snapshot):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(_prom_sample(name, labels, value) for labels, value in samples)
+
+    name = 'hotel_http_request_duration_seconds'
+    lines.append(f'# HELP {name} Request latency by endpoint')
+    lines.append(f'# TYPE {name} histogram')
+    for r in snapshot['routes']:
+        labels = _route_labels(r)
+        cumulative = 0
+        for upper, count in zip(METRICS_BUCKETS + ('+Inf',), r['buckets']):
+            cumulative += count
+            lines.append(_prom_sample(f'{name}_bucket', dict(labels, le=upper), cumulative))
+        lines.append(_prom_sample(f'{name}_sum', labels, f'{r["time"]:.6f}'))
+        lines.append(_prom_sample(f'{name}_count', labels, r['count']))
+
+    metric('hotel_http_request_db_seconds_total', 'counter', 'Time spent in SQLite per endpoint',
+           [(_route_labels(r), round(r['db_time'], 6)) for r in snapshot['routes']])
+    metric('hotel_http_request_queries_total', 'counter', 'SQL statements run per endpoint',
+           [(_route_labels(r), r['queries_total']) for r in snapshot['routes']])
+    metric('hotel_http_request_render_seconds_total', 'counter', 'Template rendering time per endpoint',
+           [(_route_labels(r), round(r['render_time'], 6)) for r in snapshot['routes']])
+    metric('hotel_http_request_errors_total', 'counter', 'Responses with a 5xx status',
+           [(_route_labels(r), r['errors']) for r in snapshot['routes']])
+    top = snapshot['statements'][:50]
+    metric('hotel_db_statement_seconds_total', 'counter', 'Time per SQL statement (top 50 by total time)',
+           [({'statement': s['sql'][:160]}, round(s['total_ms'] / 1000, 6)) for s in top])
+    metric('hotel_db_statement_calls_total', 'counter', 'Executions per SQL statement (top 50 by total time)',
+           [({'statement': s['sql'][:160]}, s['calls']) for s in top])
+    metric('hotel_db_statement_rows_total', 'counter', 'Rows returned or changed per SQL statement (top 50)',
+           [({'statement': s['sql'][:160]}, s['rows']) for s in top])
+    metric('hotel_password_seconds_total', 'counter', 'Time spent hashing and verifying passwords',
+           [({'op': name}, round(t['total_ms'] / 1000, 6)) for name, t in snapshot['timers'].items()])
+    metric('hotel_password_operations_total', 'counter', 'Password hash and verify calls',
+           [({'op': name}, t['count']) for name, t in snapshot['timers'].items()])
+    metric('hotel_slow_queries_logged', 'gauge', 'Entries in the slow query log', [({}, len(snapshot['slow_queries']))])
+
+    pool = db_pool.stats()
+    metric('hotel_db_pool_connections', 'gauge', 'SQLite pool connections by state',
+           [({'state': state}, pool[state]) for state in ('open', 'idle', 'in_use')])
+    metric('hotel_db_pool_waits_total', 'counter', 'Checkouts that had to wait for a connection', [({}, pool['waits'])])
+    tx = booking_tx_stats.snapshot()
+    metric('hotel_booking_transactions_total', 'counter', 'Booking transactions by outcome',
+           [({'outcome': k}, tx[k]) for k in ('committed', 'rolled_back', 'failures')])
+    metric('hotel_booking_transaction_retries_total', 'counter', 'Busy retries of booking transactions',
+           [({}, tx['retries'])])
+    metric('hotel_booking_queue_depth', 'gauge', 'Queued booking requests not yet committed',
+           [({}, booking_queue.stats()['queued'])])
+    caches = {'catalog': catalog.stats(), 'pages': page_cache.stats()}
+    metric('hotel_cache_hits_total', 'counter', 'Cache hits', [({'cache': k}, v['hits']) for k, v in caches.items()])
+    metric('hotel_cache_misses_total', 'counter', 'Cache misses', [({'cache': k}, v['misses']) for k, v in caches.items()])
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/admin/metrics.prom')
+@admin_required
+def admin_metrics_prometheus():
+    return Response(prometheus_text(metrics.snapshot()), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/admin/bookings/<int:booking_id>/checkin', methods=['POST'])
@@ -1058,6 +4517,84 @@ def admin_booking_cancel(booking_id):
     return redirect(url_for('admin_bookings'))
 
 
+### Night audit ###
+
+# End-of-day pass over the whole hotel in one transaction. The audit date is the
+# business day being opened, so an audit on D closes everything up to D - 1:
+# bookings due in before D that never checked in become no-shows (cancelled),
+# room_units' occupied/available flags are re-derived from who is in-house, and
+# guests still in with a checkout date before D are flagged as overstays. Guests
+# due in or out on D itself are left alone; they are settled by the audit on D + 1.
+# This is the one-day lag of an audit run after midnight with the default date.
+# No-shows are only looked for among arrivals of the last
+# NIGHT_AUDIT_LOOKBACK_DAYS, which covers a few missed nights without cancelling
+# years of older, never-audited history on the first run.
+NIGHT_AUDIT_LOOKBACK_DAYS = int(os.environ.get('HOTEL_NIGHT_AUDIT_LOOKBACK', 7))
+
+_IN_HOUSE = '''EXISTS (
+    SELECT 1 FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+    WHERE bt.room_id = room_units.room_id AND b.checked_in = 1 AND b.checked_out = 0 AND b.cancelled = 0
+)'''
+
+
+def run_night_audit(db, audit_date=None):
+    audit_date = audit_date or date.today().isoformat()
+    window_start = (date.fromisoformat(audit_date) - timedelta(days=NIGHT_AUDIT_LOOKBACK_DAYS)).isoformat()
+    started = time.perf_counter()
+
+    def audit(tx):
+        counts = {'audit_date': audit_date}
+        counts['no_shows'] = tx.execute('''
+            UPDATE bookings SET no_show = 1, cancelled = 1, reserved = 0
+            WHERE checkin_date < ? AND checkin_date >= ? AND checked_in = 0 AND cancelled = 0
+        ''', (audit_date, window_start)).rowcount
+        counts['released'] = tx.execute(f'''
+            UPDATE room_units SET occupied = 0, available = 1
+            WHERE occupied = 1 AND NOT {_IN_HOUSE}
+        ''').rowcount
+        counts['occupied'] = tx.execute(f'''
+            UPDATE room_units SET occupied = 1, available = 0
+            WHERE (occupied = 0 OR available = 1) AND {_IN_HOUSE}
+        ''').rowcount
+        counts['overstays'] = tx.execute('''
+            UPDATE bookings SET overstay = 1
+            WHERE checkout_date < ? AND checked_in = 1 AND checked_out = 0 AND cancelled = 0 AND overstay = 0
+        ''', (audit_date,)).rowcount
+        counts['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        tx.execute('''
+            INSERT INTO night_audits (audit_date, run_at, no_shows, released, occupied, overstays, duration_ms)
+            VALUES (:audit_date, :run_at, :no_shows, :released, :occupied, :overstays, :duration_ms)
+        ''', dict(counts, run_at=datetime.now().isoformat(timespec='seconds')))
+        return counts
+
+    return run_immediate(db, audit)
+
+
+@app.route('/admin/night_audit', methods=['POST'])
+@admin_required
+def admin_night_audit():
+    audit_date = request.form.get('audit_date') or date.today().isoformat()
+    try:
+        audit_date = date.fromisoformat(audit_date).isoformat()
+    except ValueError:
+        flash('Invalid audit date', 'danger')
+        return redirect(url_for('admin_bookings'))
+    result = run_night_audit(get_db(), audit_date)
+    flash('Night audit for {audit_date}: {no_shows} no-shows, {released} rooms released, {occupied} rooms occupied, '
+          '{overstays} overstays ({duration_ms} ms)'.format(**result), 'success')
+    return redirect(url_for('admin_bookings'))
+
+
+@app.cli.command('night-audit')
+@click.option('--date', 'audit_date', default=None, help='Audit date; closes every day before it (YYYY-MM-DD, default today)')
+def night_audit_command(audit_date):
+    """Close the days before the audit date: no-shows, room flags and overstays."""
+    audit_date = date.fromisoformat(audit_date).isoformat() if audit_date else None
+    result = run_night_audit(get_db(), audit_date)
+    click.echo('{audit_date}: no_shows={no_shows} released={released} occupied={occupied} '
+               'overstays={overstays} in {duration_ms} ms'.format(**result))
+
+
 @app.route('/admin/users/create', methods=['GET', 'POST'])
 @admin_required
 def create_user():
@@ -1075,7 +4612,7 @@ def create_user():
         is_admin = 1 if request.form.get('is_admin') == 'on' else 0
         db = get_db()
         try:
-            pw_hash = generate_password_hash(password)
+            pw_hash = hash_password(password)
             from datetime import datetime
             created_at = datetime.utcnow().isoformat()
             db.execute('INSERT INTO users (username, password, user_name, email, phone, is_admin, created_at, admin_id, manager_id, managing_floor, receptionist_id, admin_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
@@ -1112,13 +4649,15 @@ def edit_user(user_id):
         is_admin = 1 if request.form.get('is_admin') == 'on' else 0
         try:
             if password:
-                pw_hash = generate_password_hash(password)
+                pw_hash = hash_password(password)
                 db.execute('UPDATE users SET username = ?, password = ?, user_name = ?, email = ?, phone = ?, is_admin = ?, admin_id = ?, manager_id = ?, managing_floor = ?, receptionist_id = ?, admin_type = ? WHERE id = ?',
                            (username, pw_hash, user_name, email, phone, is_admin, admin_id, manager_id, managing_floor, receptionist_id, admin_type, user_id))
             else:
                 db.execute('UPDATE users SET username = ?, user_name = ?, email = ?, phone = ?, is_admin = ?, admin_id = ?, manager_id = ?, managing_floor = ?, receptionist_id = ?, admin_type = ? WHERE id = ?',
                            (username, user_name, email, phone, is_admin, admin_id, manager_id, managing_floor, receptionist_id, admin_type, user_id))
             db.commit()
+            if session_store is not None:
+                session_store.forget_principal(user_id)
             flash('User updated', 'success')
             return redirect(url_for('admin_panel'))
         except sqlite3.IntegrityError:
@@ -1137,9 +4676,325 @@ def delete_user(user_id):
         return redirect(url_for('admin_panel'))
     db.execute('DELETE FROM users WHERE id = ?', (user_id,))
     db.commit()
+    if session_store is not None:
+        session_store.revoke_user(user_id)
     flash('User deleted', 'success')
     return redirect(url_for('admin_panel'))
 
 
+@app.route('/admin/users/<int:user_id>/sign_out', methods=['POST'])
+@admin_required
+def sign_out_user(user_id):
+    if session_store is None:
+        flash('Sessions are stored in cookies and cannot be revoked', 'danger')
+        return redirect(url_for('admin_panel'))
+    session_store.revoke_user(user_id)
+    if session.get('admin_id') == user_id:
+        session.clear()
+        flash('Signed out everywhere', 'success')
+        return redirect(url_for('admin_login'))
+    flash('User signed out of all sessions', 'success')
+    return redirect(url_for('admin_panel'))
+
+
+### JSON API (v1) ###
+
+# Versioned JSON endpoints under /api/v1 for channel managers and kiosks,
+# over the same helpers the admin pages use. Callers authenticate with an
+# admin session or an "Authorization: Bearer <key>" header carrying one of
+# HOTEL_API_KEYS (comma-separated). Errors are {"error": ...} with a 4xx
+# status. GET responses carry a strong ETag over the body and answer
+# If-None-Match with 304, so a sync that polls unchanged data gets an empty
+# reply.
+#
+# POST /api/v1/batch applies up to API_BATCH_MAX operations in one IMMEDIATE
+# transaction: either all of them commit or, on the first failure, none do
+# and the response names the failing operation by index. Booking creation
+# inside a batch joins the transaction through run_immediate's savepoint.
+API_KEYS = {key.strip() for key in os.environ.get('HOTEL_API_KEYS', '').split(',') if key.strip()}
+API_BATCH_MAX = int(os.environ.get('HOTEL_API_BATCH_MAX', 1000))
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def handle_api_error(e):
+    body = {'error': str(e)}
+    if getattr(e, 'index', None) is not None:
+        body['index'] = e.index
+    return jsonify(body), e.status
+
+
+def api_required(fn):
+    def wrapper(*args, **kwargs):
+        auth = request.headers.get('Authorization', '')
+        token = auth[7:].strip() if auth.lower().startswith('bearer ') else None
+        if token:
+            if not any(secrets.compare_digest(token, key) for key in API_KEYS):
+                raise ApiError('Invalid API key', 401)
+        elif current_admin() is None:
+            raise ApiError('Authentication required', 401)
+        return fn(*args, **kwargs)
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+def api_response(data, status=200):
+    # JSON response; GETs get an ETag and can be answered with 304
+    resp = jsonify(data)
+    resp.status_code = status
+    if request.method == 'GET':
+        resp.set_etag(hashlib.sha256(resp.get_data()).hexdigest()[:32])
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp.make_conditional(request)
+    return resp
+
+
+def api_payload(allow_list=False):
+    # The request's JSON object (or, with allow_list, a list of them)
+    data = request.get_json(silent=True)
+    if allow_list and isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        raise ApiError('Expected a JSON object' + (' or list' if allow_list else ''))
+    return data
+
+
+def _field(item, name, kind=None, required=True):
+    value = item.get(name)
+    if value is None:
+        if required:
+            raise ApiError(f'Missing field: {name}')
+        return None
+    if kind is int and (isinstance(value, bool) or not isinstance(value, int)):
+        raise ApiError(f'{name} must be an integer')
+    if kind is float and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise ApiError(f'{name} must be a number')
+    if kind is str and not isinstance(value, str):
+        raise ApiError(f'{name} must be a string')
+    return value
+
+
+def api_booking(db, booking_id):
+    row = db.execute('''
+        SELECT b.booking_id, b.room_id, r.name AS room_name, b.user_id, b.guest_id, b.checkin_date, b.checkout_date,
+               b.checked_in, b.checked_out, b.reserved, b.cancelled, b.no_show, b.overstay, b.created_at,
+               (SELECT group_concat(room_id) FROM belong_to WHERE booking_id = b.booking_id) AS units,
+               (SELECT MAX(invoice_no) FROM invoices WHERE booking_id = b.booking_id) AS invoice_no
+        FROM bookings b LEFT JOIN rooms r ON r.id = b.room_id
+        WHERE b.booking_id = ?
+    ''', (booking_id,)).fetchone()
+    if row is None:
+        raise ApiError('Booking not found', 404)
+    booking = _api_booking_fields(row)
+    booking['units'] = [int(u) for u in row['units'].split(',')] if row['units'] else []
+    booking['invoice_no'] = row['invoice_no']
+    return booking
+
+
+def _api_booking_fields(row):
+    booking = {k: row[k] for k in ('booking_id', 'room_id', 'room_name', 'user_id', 'guest_id', 'checkin_date',
+                                   'checkout_date', 'created_at')}
+    for flag in ('checked_in', 'checked_out', 'reserved', 'cancelled', 'no_show', 'overstay'):
+        booking[flag] = bool(row[flag])
+    return booking
+
+
+def set_room_rate(db, type_id, price, commit=True):
+    cur = db.execute('UPDATE rooms SET price = ? WHERE id = ?', (price, type_id))
+    if commit:
+        db.commit()
+        catalog.invalidate()
+    return cur.rowcount
+
+
+# Write operations, shared by the single-item routes and /api/v1/batch. Each
+# takes (db, item) and leaves committing to the caller.
+
+def _op_create_booking(db, item):
+    room_id = _field(item, 'room_id', int)
+    if db.execute('SELECT 1 FROM rooms WHERE id = ?', (room_id,)).fetchone() is None:
+        raise ApiError(f'Room type {room_id} not found', 404)
+    booking_id = create_booking(db, _field(item, 'checkin_date', str), _field(item, 'checkout_date', str),
+                                room_id, _field(item, 'user_id', int, False), _field(item, 'guest_id', int, False), 1)
+    return {'booking_id': booking_id}
+
+
+def _booking_op(helper):
+    def op(db, item):
+        booking_id = _field(item, 'booking_id', int)
+        if not helper(db, booking_id, commit=False):
+            raise ApiError(f'Booking {booking_id} not found', 404)
+        return {'booking_id': booking_id}
+    return op
+
+
+def _op_assign_room(db, item):
+    booking_id, room_id = _field(item, 'booking_id', int), _field(item, 'room_id', int)
+    add_belong_to(db, booking_id, room_id, commit=False)
+    return {'booking_id': booking_id, 'room_id': room_id}
+
+
+def _op_create_invoice(db, item):
+    booking_id = _field(item, 'booking_id', int)
+    amounts = [_field(item, name, float, False) for name in ('room_charge', 'total_amount', 'tax', 'service_charge')]
+    issue_date = _field(item, 'issue_date', str, False) or date.today().isoformat()
+    # One invoice per booking, as generate_invoices() does; a retried request
+    # must not bill the stay twice
+    existing = invoice_for_booking(db, booking_id)
+    if existing:
+        raise ApiError(f'Booking {booking_id} already has invoice {existing}', 409)
+    if not any(a is not None for a in amounts):
+        # No amounts given: bill the booking from its stay and services
+        charges = compute_invoice(db, booking_id)
+        if not charges:
+            raise ApiError(f'Booking {booking_id} not found or cancelled', 404)
+        amounts = [charges[k] for k in ('room_charge', 'total_amount', 'tax', 'service_charge')]
+    invoice_no = create_invoice(db, *amounts, issue_date, booking_id, commit=False)
+    return {'invoice_no': invoice_no, 'booking_id': booking_id, 'total_amount': amounts[1]}
+
+
+def _op_set_rate(db, item):
+    type_id, price = _field(item, 'room_id', int), _field(item, 'price', float)
+    if price < 0:
+        raise ApiError('price must not be negative')
+    if not set_room_rate(db, type_id, price, commit=False):
+        raise ApiError(f'Room type {type_id} not found', 404)
+    return {'room_id': type_id, 'price': price}
+
+
+API_OPERATIONS = {
+    'create_booking': _op_create_booking,
+    'checkin': _booking_op(mark_checked_in),
+    'checkout': _booking_op(mark_checked_out),
+    'cancel': _booking_op(cancel_booking),
+    'assign_room': _op_assign_room,
+    'create_invoice': _op_create_invoice,
+    'set_rate': _op_set_rate,
+}
+
+
+def apply_operations(db, items):
+    # Run every operation in one transaction; returns their results in order
+    def apply(tx):
+        results = []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict) or item.get('op') not in API_OPERATIONS:
+                    raise ApiError(f"Unknown op; expected one of: {', '.join(API_OPERATIONS)}")
+                results.append(API_OPERATIONS[item['op']](tx, item))
+            except BookingError as e:
+                e = ApiError(str(e), 409)
+                e.index = index
+                raise e
+            except ApiError as e:
+                e.index = index
+                raise
+        return results
+    results = run_immediate(db, apply)
+    if any(item['op'] == 'set_rate' for item in items):
+        catalog.invalidate()
+    return results
+
+
+def api_write(op, item):
+    # A single operation, with the same validation and errors as in a batch
+    if not isinstance(item, dict):
+        raise ApiError('Expected a JSON object')
+    try:
+        return apply_operations(get_db(), [dict(item, op=op)])[0]
+    except ApiError as e:
+        e.index = None
+        raise
+
+
+@app.route('/api/v1/rooms')
+@api_required
+def api_rooms():
+    counts = catalog.unit_counts()
+    rooms = [dict(room, units=counts.get(room['id'], {}).get('total', 0),
+                  in_service=counts.get(room['id'], {}).get('in_service', 0)) for room in catalog.room_types()]
+    return api_response({'rooms': rooms})
+
+
+@app.route('/api/v1/rooms/<int:type_id>/rate', methods=['PUT'])
+@api_required
+def api_set_rate(type_id):
+    return api_response(api_write('set_rate', dict(api_payload(), room_id=type_id)))
+
+
+@app.route('/api/v1/availability')
+@api_required
+def api_availability():
+    try:
+        checkin_date, checkout_date = parse_stay(request.args.get('checkin_date'), request.args.get('checkout_date'))
+    except BookingError as e:
+        raise ApiError(str(e))
+    db = get_db()
+    return api_response({'checkin_date': checkin_date, 'checkout_date': checkout_date, 'rooms': [
+        {'room_id': room['id'], 'available': availability.has_capacity(db, room['id'], checkin_date, checkout_date)}
+        for room in catalog.room_types()]})
+
+
+@app.route('/api/v1/bookings')
+@api_required
+def api_bookings():
+    try:
+        page = booking_list_page(get_db(), request.args)
+    except ValueError as e:
+        raise ApiError(str(e))
+    return api_response({'bookings': [_api_booking_fields(row) for row in page],
+                         'next': page.next_cursor, 'prev': page.prev_cursor})
+
+
+@app.route('/api/v1/bookings', methods=['POST'])
+@api_required
+def api_create_booking():
+    result = api_write('create_booking', api_payload())
+    return api_response(api_booking(get_db(), result['booking_id']), 201)
+
+
+@app.route('/api/v1/bookings/<int:booking_id>')
+@api_required
+def api_get_booking(booking_id):
+    return api_response(api_booking(get_db(), booking_id))
+
+
+@app.route('/api/v1/bookings/<int:booking_id>/<any(checkin, checkout, cancel):action>', methods=['POST'])
+@api_required
+def api_booking_action(booking_id, action):
+    api_write(action, {'booking_id': booking_id})
+    return api_response(api_booking(get_db(), booking_id))
+
+
+@app.route('/api/v1/bookings/<int:booking_id>/rooms', methods=['POST'])
+@api_required
+def api_assign_room(booking_id):
+    api_write('assign_room', dict(api_payload(), booking_id=booking_id))
+    return api_response(api_booking(get_db(), booking_id))
+
+
+@app.route('/api/v1/invoices', methods=['POST'])
+@api_required
+def api_create_invoice():
+    return api_response(api_write('create_invoice', api_payload()), 201)
+
+
+@app.route('/api/v1/batch', methods=['POST'])
+@api_required
+def api_batch():
+    data = api_payload(allow_list=True)
+    items = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise ApiError('Expected a non-empty list of operations')
+    if len(items) > API_BATCH_MAX:
+        raise ApiError(f'At most {API_BATCH_MAX} operations per batch', 413)
+    return api_response({'results': apply_operations(get_db(), items)})
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
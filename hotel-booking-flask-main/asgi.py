@@ -0,0 +1,22 @@
+# ASGI entry point for serving under an event-loop server, e.g.
+#
+#     pip install a2wsgi uvicorn
+#     HOTEL_HASH_PROCESSES=2 uvicorn asgi:application --host 0.0.0.0 --port 8000
+#
+# The server's event loop owns the sockets, so thousands of idle or slow
+# keep-alive clients cost no threads. Requests are handed to a bounded thread
+# pool that is the same size as the SQLite connection pool, so a request never
+# waits for a connection once it is running. Password hashing goes to the
+# process pool configured by HOTEL_HASH_PROCESSES.
+import os
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    raise SystemExit('ASGI serving needs a2wsgi: pip install a2wsgi uvicorn')
+
+from app import create_app, DB_POOL_SIZE
+
+ASGI_THREADS = int(os.environ.get('HOTEL_ASGI_THREADS', DB_POOL_SIZE))
+
+application = WSGIMiddleware(create_app(), workers=ASGI_THREADS)
@@ -0,0 +1,308 @@
+# Load tests and micro-benchmarks for the booking and admin hot paths.
+#
+#     python bench.py                                  # in-process, Flask test client
+#     python bench.py --url http://127.0.0.1:8000      # against a running server
+#     python bench.py --save-baseline bench_baseline.json
+#     python bench.py --baseline bench_baseline.json   # exit 1 on regression
+#
+# In-process runs generate a fresh database with datagen (same --seed, same
+# data) in a temporary directory, so results are comparable between runs. Each
+# scenario runs --concurrency virtual users for --duration seconds and reports
+# throughput and p50/p95/p99 latency. Against --url, the server's own database
+# is used and admin pages log in with --admin-user/--admin-password.
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+
+SCENARIOS = ('browse', 'booking_burst', 'admin_lists', 'login_storm', 'micro')
+ADMIN_LIST_PAGES = ('/admin', '/admin/bookings', '/admin/employees', '/admin/room_units', '/admin/services',
+                    '/admin/invoices', '/admin/user_phones', '/admin/hired_as', '/admin/belong_to',
+                    '/admin/guests')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, statuses):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'errors': sum(count for status, count in statuses.items() if status >= 500),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+### Clients ###
+
+class TestClientUser:
+    # One virtual user on the in-process Flask test client
+    def __init__(self, hotel, admin=False):
+        self.client = hotel.app.test_client()
+        if admin:
+            with self.client.session_transaction() as s:
+                s['admin_id'] = 1
+                s['admin_username'] = 'admin'
+
+    def request(self, method, path, data=None):
+        return self.client.open(path, method=method, data=data).status_code
+
+
+class HttpUser:
+    # One virtual user holding a keep-alive connection to a real server
+    def __init__(self, url, admin=False, username='admin', password='admin'):
+        parts = urllib.parse.urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.cookie = None
+        if admin:
+            self.request('POST', '/admin/login', {'username': username, 'password': password})
+
+    def request(self, method, path, data=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            return 599
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+
+### Scenarios ###
+
+def _stay(rng, max_ahead=120):
+    checkin = date.today() + timedelta(days=rng.randint(1, max_ahead))
+    return checkin.isoformat(), (checkin + timedelta(days=rng.randint(1, 5))).isoformat()
+
+
+def browse_step(user, rng, room_types):
+    path = rng.choice(('/', '/rooms', '/about', f'/booking/{rng.randint(1, room_types)}'))
+    return user.request('GET', path)
+
+
+def booking_step(user, rng, room_types):
+    checkin, checkout = _stay(rng)
+    return user.request('POST', f'/booking/{rng.randint(1, room_types)}',
+                        {'check_in_date': checkin, 'check_out_date': checkout})
+
+
+def admin_step(user, rng, room_types):
+    path = rng.choice(ADMIN_LIST_PAGES)
+    if rng.random() < 0.3 and path not in ('/admin', '/admin/bookings'):
+        path += '?dir=asc'
+    return user.request('GET', path)
+
+
+def login_step(user, rng, room_types, username='admin', password='admin'):
+    attempt = password if rng.random() < 0.5 else 'wrong-password'
+    return user.request('POST', '/admin/login', {'username': username, 'password': attempt})
+
+
+def run_load(name, make_user, step, concurrency, duration, room_types, seed):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        user = make_user()
+        mine, codes = [], {}
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            status = step(user, rng, room_types)
+            mine.append(time.perf_counter() - started)
+            codes[status] = codes.get(status, 0) + 1
+        with lock:
+            latencies.extend(mine)
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=virtual_user, args=(i,), name=f'bench-{name}-{i}') for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+def run_micro(hotel, duration, room_types, seed):
+    # Single-threaded timings of the functions behind the hot pages
+    rng = random.Random(seed)
+    results = {}
+
+    def bench(name, fn):
+        latencies = []
+        stop_at = time.perf_counter() + duration
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies, sum(latencies), {200: len(latencies)})
+
+    def checkout_checkin():
+        hotel.db_pool.checkin(hotel.db_pool.checkout())
+
+    with hotel.app.test_request_context('/admin/bookings'):
+        db = hotel.get_db()
+        bench('db_pool_checkout', checkout_checkin)
+        bench('has_capacity', lambda: hotel.availability.has_capacity(db, rng.randint(1, room_types), *_stay(rng)))
+        bench('bookings_first_page', lambda: hotel.keyset_page(
+            db, 'SELECT booking_id, created_at FROM bookings', [('created_at', 'created_at'), ('booking_id', 'booking_id')],
+            descending=True))
+        bench('guests_list_page', lambda: hotel.GUESTS_LIST.page(db, {}))
+
+        def book():
+            try:
+                hotel.create_booking(db, *_stay(rng, max_ahead=700), rng.randint(1, room_types))
+            except hotel.BookingError:
+                pass
+        bench('create_booking', book)
+    return results
+
+
+### Baselines ###
+
+def compare(results, baseline, tolerance):
+    # A scenario regresses when p95 latency rises or throughput falls by more than tolerance
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not result.get('requests') or not base.get('requests'):
+            continue
+        if base['p95_ms'] and result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if base['rps'] and result['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']} req/s vs baseline {base['rps']} req/s")
+    return regressions
+
+
+def print_table(results, baseline=None):
+    header = f"{'scenario':<24}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'5xx':>6}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        line = (f"{name:<24}{r['requests']:>10}{r['rps']:>10}{r['p50_ms'] or '-':>10}{r['p95_ms'] or '-':>10}"
+                f"{r['p99_ms'] or '-':>10}{r['errors']:>6}")
+        base = (baseline or {}).get(name)
+        if base and base.get('p95_ms') and r['p95_ms']:
+            line += f"   p95 {100 * (r['p95_ms'] / base['p95_ms'] - 1):+.0f}%"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load tests and micro-benchmarks for the hotel app')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process test client')
+    parser.add_argument('--db', help='copy this database instead of generating one (in-process only)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'comma-separated: {", ".join(SCENARIOS)}')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--room-types', type=int, default=3)
+    parser.add_argument('--units', type=int, default=60)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--save-baseline', help='write results as the baseline to compare future runs with')
+    parser.add_argument('--baseline', help='compare with this baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.20, help='allowed fractional regression (default 0.20)')
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    workdir = None
+    hotel = None
+    if not args.url:
+        workdir = tempfile.mkdtemp(prefix='hotel-bench-')
+        db_path = os.path.join(workdir, 'hotel.db')
+        os.environ['HOTEL_DB_PATH'] = db_path
+        os.environ.setdefault('HOTEL_SLOW_QUERY_MS', '1000')
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+        else:
+            import datagen
+            counts = datagen.generate(db_path, room_types=args.room_types, units=args.units, years=args.years,
+                                      seed=args.seed, admin_password=args.admin_password)
+            print(f"Generated {counts['bookings']} bookings, {counts['guests']} guests in {counts['seconds']} s")
+        import app as hotel
+        hotel.create_app()
+    elif 'micro' in scenarios:
+        scenarios.remove('micro')
+        print('Skipping micro benchmarks: they only run in-process')
+
+    def make_user(admin=False):
+        if args.url:
+            return lambda: HttpUser(args.url, admin, args.admin_user, args.admin_password)
+        return lambda: TestClientUser(hotel, admin)
+
+    steps = {
+        'browse': (make_user(), browse_step),
+        'booking_burst': (make_user(), booking_step),
+        'admin_lists': (make_user(admin=True), admin_step),
+        'login_storm': (make_user(), lambda user, rng, types: login_step(user, rng, types, args.admin_user,
+                                                                         args.admin_password)),
+    }
+    results = {}
+    try:
+        for name in scenarios:
+            if name == 'micro':
+                for micro_name, result in run_micro(hotel, min(args.duration, 2.0), args.room_types, args.seed).items():
+                    results[f'micro.{micro_name}'] = result
+                continue
+            factory, step = steps[name]
+            results[name] = run_load(name, factory, step, args.concurrency, args.duration, args.room_types, args.seed)
+    finally:
+        if workdir:
+            hotel.db_pool.close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+    print_table(results, baseline)
+    report = {'settings': {k: v for k, v in vars(args).items() if k not in ('json', 'save_baseline', 'baseline')},
+              'results': results}
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as fh:
+                json.dump(report, fh, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+# Synthetic data for hotel.db-shaped databases, for benchmarks and scale tests.
+#
+#     from datagen import generate
+#     generate('/tmp/bench.db', room_types=3, units=60, years=2, seed=1)
+#
+#     flask --app app generate-data /tmp/big.db --units 3000 --years 10   # ~10M rows
+#
+# The same arguments (including --today) always produce the same rows,
+# password hashes included; only schema_migrations timestamps differ. All
+# eleven tables are filled: staff users with their phones, employees with their
+# role history, room types and units, bookings, unit assignments, services,
+# invoices and guests. Stays are laid out unit by unit with gaps between them,
+# so no unit is ever double-booked; every past, non-cancelled booking gets an
+# invoice computed the same way the billing code computes it.
+#
+# Loading runs with journaling and fsync off, triggers and secondary indexes
+# dropped, and a commit every BATCH_SIZE rows. Afterwards the indexes and
+# triggers are recreated and the state the triggers would have maintained is
+# rebuilt: the search index, availability versions and the analytics and
+# unit-night queues (drained right away with refresh=True).
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+ROOM_TYPES = [
+    ('Deluxe Room', 'Spacious room with a king-size bed and city view.', 150.0),
+    ('Executive Suite', 'Luxury suite with separate living area and panoramic views.', 250.0),
+    ('Family Room', 'Perfect for families with two queen beds and extra space.', 200.0),
+    ('Standard Room', 'Comfortable room with a queen-size bed.', 100.0),
+    ('Twin Room', 'Two single beds, ideal for friends or colleagues.', 120.0),
+    ('Presidential Suite', 'Top-floor suite with private terrace.', 600.0),
+]
+SERVICES = [('Breakfast', 12.0), ('Airport transfer', 35.0), ('Laundry', 8.0), ('Spa', 60.0), ('Minibar', 15.0)]
+POSITIONS = [('Receptionist', 28000), ('Housekeeping', 18000), ('Manager', 65000), ('Chef', 40000),
+             ('Porter', 16000), ('Security', 20000), ('Maintenance', 22000)]
+FIRST_NAMES = ['Amina', 'Rahim', 'Karim', 'Sadia', 'Nusrat', 'Tanvir', 'Farhan', 'Maya', 'John', 'Emma',
+               'Liam', 'Olivia', 'Noah', 'Ava', 'Arjun', 'Priya', 'Wei', 'Mei', 'Omar', 'Layla']
+LAST_NAMES = ['Rahman', 'Hossain', 'Ahmed', 'Chowdhury', 'Islam', 'Smith', 'Johnson', 'Brown', 'Khan',
+              'Das', 'Roy', 'Chen', 'Wang', 'Garcia', 'Martin', 'Lee', 'Ali', 'Sarkar', 'Miah', 'Bose']
+CITIES = ['Dhaka', 'Chittagong', 'Sylhet', 'Khulna', 'Rajshahi', 'London', 'Kolkata', 'Singapore']
+
+BATCH_SIZE = 50000
+LOAD_PRAGMAS = ('PRAGMA journal_mode = OFF', 'PRAGMA synchronous = OFF', 'PRAGMA temp_store = MEMORY',
+                'PRAGMA cache_size = -262144')
+PASSWORD_ITERATIONS = 600000
+DESK_BOOKING_RATE = 0.3
+
+INSERTS = {
+    'users': 'INSERT INTO users (id, username, password, user_name, email, phone, is_admin, created_at, admin_id, '
+             'manager_id, managing_floor, receptionist_id, admin_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'user_phones': 'INSERT INTO user_phones (user_id, phone) VALUES (?, ?)',
+    'employees': 'INSERT INTO employees (employee_id, name, phone, position, hire_date, salary) VALUES (?, ?, ?, ?, ?, ?)',
+    'hired_as': 'INSERT INTO hired_as (employee_id, role, start_date, end_date) VALUES (?, ?, ?, ?)',
+    'rooms': 'INSERT INTO rooms (id, name, description, price, image) VALUES (?, ?, ?, ?, NULL)',
+    'room_units': 'INSERT INTO room_units (room_id, type_id, room_no, floor) VALUES (?, ?, ?, ?)',
+    'bookings': 'INSERT INTO bookings (booking_id, checkin_date, checkout_date, room_id, user_id, guest_id, '
+                'checked_in, checked_out, reserved, cancelled, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'belong_to': 'INSERT INTO belong_to (booking_id, room_id) VALUES (?, ?)',
+    'services': 'INSERT INTO services (service_name, description, unit_price, booking_id) VALUES (?, ?, ?, ?)',
+    'invoices': 'INSERT INTO invoices (invoice_no, room_charge, total_amount, tax, service_charge, issue_date, '
+                'booking_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+    'guests': 'INSERT INTO guests (guest_id, invoice_no, name, address, email, NID, phone) VALUES (?, ?, ?, ?, ?, ?, ?)',
+}
+TABLES = tuple(INSERTS)
+
+
+class Loader:
+    # Buffers rows per table and writes every table's buffer in one transaction
+    # once batch_size rows are pending, so related rows land together.
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = {table: [] for table in TABLES}
+        self.count = 0
+        self.rows = 0
+
+    def add(self, table, row):
+        self.pending[table].append(row)
+        self.count += 1
+        if self.count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.count:
+            return
+        with self.conn:
+            for table in TABLES:
+                rows = self.pending[table]
+                if rows:
+                    self.conn.executemany(INSERTS[table], rows)
+                    rows.clear()
+        self.rows += self.count
+        self.count = 0
+
+
+def password_hash(password, seed):
+    # Werkzeug's pbkdf2 format with a salt derived from the seed, so the output
+    # file is reproducible; check_password_hash accepts it as usual
+    salt = hashlib.sha256(f'{seed}:{password}'.encode()).hexdigest()[:16]
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PASSWORD_ITERATIONS).hex()
+    return f'pbkdf2:sha256:{PASSWORD_ITERATIONS}${salt}${digest}'
+
+
+def _person(rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return first, last, f'+8801{rng.randint(300000000, 999999999)}'
+
+
+def _suspend_triggers(conn):
+    # Drop triggers and secondary indexes for the load; returns their SQL
+    deferred = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                            "AND sql IS NOT NULL AND name NOT LIKE 'sqlite_%'").fetchall()
+    with conn:
+        for kind, name, _ in deferred:
+            conn.execute(f'DROP {kind.upper()} IF EXISTS {name}')
+    return deferred
+
+
+def _restore_triggers(conn, deferred):
+    with conn:
+        for kind in ('index', 'trigger'):
+            for row_kind, _, sql in deferred:
+                if row_kind == kind:
+                    conn.execute(sql)
+
+
+def _rebuild_derived(hotel, conn, refresh):
+    # What the suspended triggers would have done, in bulk
+    with conn:
+        conn.execute('''
+            INSERT INTO availability_versions (type_id, version) SELECT id, 1 FROM rooms WHERE true
+            ON CONFLICT(type_id) DO UPDATE SET version = version + 1
+        ''')
+        conn.execute('''
+            INSERT INTO analytics_dirty (type_id, start_date, end_date)
+            SELECT room_id, MIN(checkin_date), MAX(checkout_date) FROM bookings GROUP BY room_id
+        ''')
+        conn.execute('''
+            INSERT INTO unit_nights_dirty (room_id, start_date, end_date)
+            SELECT bt.room_id, MIN(b.checkin_date), MAX(b.checkout_date)
+            FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+            GROUP BY bt.room_id
+        ''')
+        hotel.rebuild_search_index(conn)
+    if refresh:
+        hotel.refresh_rollups(conn)
+        hotel.refresh_unit_nights(conn)
+
+
+def validate(conn):
+    # Consistency checks over a generated (or any) database; returns a list of problems
+    import app as hotel
+
+    problems = []
+    overlaps = conn.execute('''
+        SELECT COUNT(*) FROM (
+            SELECT b.checkin_date,
+                   MAX(b.checkout_date) OVER (PARTITION BY bt.room_id ORDER BY b.checkin_date, b.booking_id
+                                              ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS prev_checkout
+            FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+            WHERE b.cancelled = 0
+        ) WHERE prev_checkout > checkin_date
+    ''').fetchone()[0]
+    if overlaps:
+        problems.append(f'{overlaps} double-booked unit nights')
+    wrong_type = conn.execute('''
+        SELECT COUNT(*) FROM belong_to bt
+        JOIN bookings b ON b.booking_id = bt.booking_id
+        JOIN room_units u ON u.room_id = bt.room_id
+        WHERE u.type_id IS NOT b.room_id
+    ''').fetchone()[0]
+    if wrong_type:
+        problems.append(f'{wrong_type} unit assignments of the wrong room type')
+    charges = hotel._INVOICE_CHARGES.format(where='b.booking_id IN (SELECT booking_id FROM invoices)')
+    mismatched = conn.execute(f'''
+        SELECT COUNT(*) FROM invoices i
+        LEFT JOIN ({charges}) c ON c.booking_id = i.booking_id
+        WHERE c.booking_id IS NULL OR ABS(i.room_charge - c.room_charge) > 0.005
+           OR ABS(i.service_charge - c.service_charge) > 0.005 OR ABS(i.tax - c.tax) > 0.005
+           OR ABS(i.total_amount - ROUND(c.room_charge + c.service_charge + c.tax, 2)) > 0.005
+    ''', {'tax_rate': hotel.INVOICE_TAX_RATE, 'tax_services': hotel.INVOICE_TAX_SERVICES}).fetchone()[0]
+    if mismatched:
+        problems.append(f'{mismatched} invoices that do not match their bookings')
+    return problems
+
+
+def generate(path, room_types=3, units=60, years=2, guests=None, seed=1, occupancy=0.7,
+             cancel_rate=0.05, today=None, admin_password='admin', staff_password='staff',
+             employees=None, batch_size=BATCH_SIZE, refresh=False, progress=None):
+    # Build a fresh database at `path`; returns row counts per table plus seconds
+    import app as hotel
+
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today.replace(year=today.year - years)
+    horizon = today + timedelta(days=180)
+    tax_rate, tax_services = hotel.INVOICE_TAX_RATE, hotel.INVOICE_TAX_SERVICES
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    hotel.migrate(conn)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    deferred = _suspend_triggers(conn)
+    loader = Loader(conn, batch_size)
+
+    # Staff: employees with a role history, and a login for each manager and receptionist
+    employee_count = employees or max(10, units // 4)
+    staff_hash = password_hash(staff_password, seed)
+    loader.add('users', (1, 'admin', password_hash(admin_password, seed), 'Administrator', 'admin@example.com', '',
+                         1, datetime.combine(start, datetime.min.time()).isoformat(), 1, None, None, None, 'super'))
+    desk_users = []
+    user_id = 1
+    floors = (units - 1) // 20 + 1
+    for employee_id in range(1, employee_count + 1):
+        first, last, phone = _person(rng)
+        position, salary = POSITIONS[rng.randrange(len(POSITIONS))]
+        hired = start - timedelta(days=rng.randint(0, 5 * 365))
+        roles = [role for role, _ in rng.sample(POSITIONS, rng.randint(0, 2)) if role != position] + [position]
+        spans = sorted(rng.sample(range(1, max(2, (today - hired).days)), len(roles) - 1)) if len(roles) > 1 else []
+        role_start = hired
+        for role, days in zip(roles, spans + [None]):
+            role_end = hired + timedelta(days=days) if days is not None else None
+            loader.add('hired_as', (employee_id, role, role_start.isoformat(),
+                                    role_end.isoformat() if role_end else None))
+            role_start = role_end
+        loader.add('employees', (employee_id, f'{first} {last}', phone, position, hired.isoformat(),
+                                 round(salary * rng.uniform(0.9, 1.3), -2)))
+        if position in ('Manager', 'Receptionist'):
+            user_id += 1
+            manager = position == 'Manager'
+            loader.add('users', (user_id, f'{first.lower()}.{last.lower()}{employee_id}', staff_hash, f'{first} {last}',
+                                 f'{first.lower()}.{last.lower()}{employee_id}@hotel.example', phone, 1,
+                                 datetime.combine(hired, datetime.min.time()).isoformat(), None,
+                                 employee_id if manager else None, rng.randint(1, floors) if manager else None,
+                                 None if manager else employee_id, position.lower()))
+            loader.add('user_phones', (user_id, phone))
+            if rng.random() < 0.4:
+                loader.add('user_phones', (user_id, _person(rng)[2]))
+            if not manager:
+                desk_users.append(user_id)
+
+    # Room types and units
+    types = [ROOM_TYPES[i % len(ROOM_TYPES)] for i in range(room_types)]
+    prices = {}
+    for i, (name, desc, price) in enumerate(types):
+        prices[i + 1] = price
+        loader.add('rooms', (i + 1, name if i < len(ROOM_TYPES) else f'{name} {i + 1}', desc, price))
+    unit_types = {}
+    for unit_id in range(1, units + 1):
+        type_id = (unit_id - 1) % room_types + 1
+        floor = (unit_id - 1) // 20 + 1
+        unit_types[unit_id] = type_id
+        loader.add('room_units', (unit_id, type_id, f'{floor}{(unit_id - 1) % 20 + 1:02d}', floor))
+
+    # Stays, unit by unit: a gap, then a stay, until the horizon
+    mean_stay = 3.0
+    mean_gap = mean_stay * (1 - occupancy) / occupancy
+    guest_count = guests or max(units * years * 20, 100)
+    booking_id = invoice_no = 0
+    for unit_id in range(1, units + 1):
+        type_id = unit_types[unit_id]
+        day = start + timedelta(days=rng.randint(0, 3))
+        while True:
+            day += timedelta(days=int(rng.expovariate(1 / mean_gap)) if mean_gap > 0 else 0)
+            nights = max(1, min(14, int(rng.expovariate(1 / mean_stay)) + 1))
+            checkout = day + timedelta(days=nights)
+            if checkout > horizon:
+                break
+            booking_id += 1
+            cancelled = rng.random() < cancel_rate
+            past = checkout <= today
+            in_house = day <= today < checkout and not cancelled
+            created_at = datetime.combine(day - timedelta(days=rng.randint(1, 60)), datetime.min.time()) \
+                + timedelta(seconds=rng.randint(0, 86399))
+            desk_user = rng.choice(desk_users) if desk_users and rng.random() < DESK_BOOKING_RATE else None
+            loader.add('bookings', (booking_id, day.isoformat(), checkout.isoformat(), type_id, desk_user,
+                                    rng.randint(1, guest_count), int(past or in_house) if not cancelled else 0,
+                                    int(past and not cancelled), int(not cancelled), int(cancelled),
+                                    created_at.isoformat()))
+            if not cancelled:
+                loader.add('belong_to', (booking_id, unit_id))
+                extras = [SERVICES[rng.randrange(len(SERVICES))] for _ in range(rng.choice((0, 0, 1, 2)))]
+                for name, price in extras:
+                    loader.add('services', (name, None, price, booking_id))
+                if past:
+                    invoice_no += 1
+                    room_charge = round(nights * prices[type_id], 2)
+                    service_charge = round(sum(price for _, price in extras), 2)
+                    tax = round((room_charge + (service_charge if tax_services else 0)) * tax_rate, 2)
+                    loader.add('invoices', (invoice_no, room_charge, round(room_charge + service_charge + tax, 2),
+                                            tax, service_charge, checkout.isoformat(), booking_id))
+            day = checkout
+        if progress and unit_id % 100 == 0:
+            progress(f'{unit_id}/{units} units, {loader.rows + loader.count} rows')
+
+    for guest_id in range(1, guest_count + 1):
+        first, last, phone = _person(rng)
+        loader.add('guests', (guest_id, None, f'{first} {last}', f'{rng.randint(1, 200)} {rng.choice(CITIES)} Road',
+                              f'{first.lower()}.{last.lower()}{guest_id}@example.com',
+                              str(rng.randint(10 ** 9, 10 ** 10 - 1)), phone))
+    loader.flush()
+    loaded = time.perf_counter()
+    if progress:
+        progress(f'Loaded {loader.rows} rows in {loaded - started:.1f} s; rebuilding indexes and triggers')
+
+    _restore_triggers(conn, deferred)
+    _rebuild_derived(hotel, conn, refresh)
+    conn.execute('PRAGMA journal_mode = WAL')
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in TABLES}
+    conn.close()
+    counts['rows'] = sum(counts.values())
+    counts['load_seconds'] = round(loaded - started, 2)
+    counts['seconds'] = round(time.perf_counter() - started, 2)
+    return counts
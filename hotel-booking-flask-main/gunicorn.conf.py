@@ -0,0 +1,16 @@
+# gunicorn settings for wsgi.py; override with GUNICORN_CMD_ARGS or flags.
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('HOTEL_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('HOTEL_THREADS', 4))
+
+# Import the app (and run setup, warm-up and the booking spool replay) once in
+# the master, then fork. Nothing started there may hold a thread or connection:
+# each worker starts its own booking writer on first use.
+preload_app = True
+
+# Let in-flight requests and queued bookings finish on restart
+graceful_timeout = 30
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+# app reads its configuration at import time, so point it at a scratch
+# database before anything imports it
+os.environ['HOTEL_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='hotel-tests-'), 'hotel.db')
+os.environ['HOTEL_API_KEYS'] = 'test-key'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hotel  # noqa: E402
+
+API_HEADERS = {'Authorization': 'Bearer test-key'}
+
+
+def day(offset):
+    # ISO date `offset` days from today
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture(scope='session')
+def app():
+    return hotel.create_app(warm=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    # Signed in as the default admin that setup creates
+    with client.session_transaction() as s:
+        s['admin_id'] = 1
+        s['admin_username'] = 'admin'
+    return client
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        yield hotel.get_db()
+
+
+@pytest.fixture
+def other_db():
+    # A connection of its own, standing in for another worker process
+    conn = sqlite3.connect(hotel.DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def make_room(db):
+    # A new room type with its own units, so tests don't share inventory.
+    # Returns (type_id, [unit ids]).
+    def make(units=1, price=100.0, name='Test Room'):
+        type_id = db.execute('INSERT INTO rooms (name, description, price, image) VALUES (?, ?, ?, ?)',
+                             (name, 'For tests', price, '')).lastrowid
+        unit_ids = [db.execute('INSERT INTO room_units (type_id, room_no) VALUES (?, ?)',
+                               (type_id, f'{type_id}-{n}')).lastrowid for n in range(units)]
+        db.commit()
+        hotel.catalog.invalidate()
+        return type_id, unit_ids
+    return make
@@ -0,0 +1,57 @@
+import app as hotel
+from conftest import day
+
+
+def revenue(db, type_id, start, end):
+    report = hotel.analytics_report(db, start, end, type_id)
+    (row,) = report['by_type']
+    return row
+
+
+def test_report_counts_nights_sold_and_rates(db, make_room):
+    type_id, _ = make_room(units=2, price=80.0)
+    hotel.create_booking(db, day(240), day(243), type_id)
+    hotel.create_booking(db, day(241), day(242), type_id)
+    row = revenue(db, type_id, day(240), day(243))
+    # 4 nights sold out of 2 units x 4 days
+    assert (row['rooms_sold'], row['room_revenue'], row['arrivals']) == (4, 320.0, 2)
+    assert (row['occupancy'], row['adr'], row['revpar']) == (0.5, 80.0, 40.0)
+
+
+def test_rate_change_requeues_the_type_and_reprices_uninvoiced_nights(db, make_room):
+    type_id, _ = make_room(units=2, price=100.0)
+    invoiced = hotel.create_booking(db, day(250), day(252), type_id)
+    hotel.create_booking(db, day(251), day(253), type_id)
+    hotel.generate_invoices(db, booking_id=invoiced)
+    assert revenue(db, type_id, day(250), day(253))['room_revenue'] == 400.0
+    hotel.set_room_rate(db, type_id, 150.0)
+    queued = db.execute('SELECT start_date, end_date FROM analytics_dirty WHERE type_id = ?', (type_id,)).fetchall()
+    assert [tuple(r) for r in queued] == [(day(250), day(253))]
+    # The invoiced stay keeps its billed charge; the other moves to the new rate
+    assert revenue(db, type_id, day(250), day(253))['room_revenue'] == 500.0
+
+
+def test_unchanged_rate_queues_nothing(db, make_room):
+    type_id, _ = make_room(units=1, price=90.0)
+    hotel.create_booking(db, day(255), day(256), type_id)
+    hotel.refresh_rollups(db)
+    hotel.set_room_rate(db, type_id, 90.0)
+    assert db.execute('SELECT COUNT(*) FROM analytics_dirty WHERE type_id = ?', (type_id,)).fetchone()[0] == 0
+
+
+def test_long_ranges_are_rebuilt_in_chunks(db, make_room, monkeypatch):
+    monkeypatch.setattr(hotel, 'ROLLUP_CHUNK_DAYS', 3)
+    type_id, _ = make_room(units=1, price=10.0)
+    hotel.refresh_rollups(db)
+    hotel.create_booking(db, day(260), day(267), type_id)
+    assert hotel.refresh_rollups(db) == 3
+    row = revenue(db, type_id, day(260), day(266))
+    assert (row['rooms_sold'], row['room_revenue']) == (7, 70.0)
+
+
+def test_cancellation_drops_the_nights(db, make_room):
+    type_id, _ = make_room(units=1, price=60.0)
+    booking_id = hotel.create_booking(db, day(270), day(272), type_id)
+    assert revenue(db, type_id, day(270), day(271))['rooms_sold'] == 2
+    hotel.cancel_booking(db, booking_id)
+    assert revenue(db, type_id, day(270), day(271))['rooms_sold'] == 0
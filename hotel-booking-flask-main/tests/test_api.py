@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import API_HEADERS, day
+
+
+def test_requests_need_a_key_or_an_admin_session(app, admin_client):
+    anonymous = app.test_client()
+    assert anonymous.get('/api/v1/rooms').status_code == 401
+    assert anonymous.get('/api/v1/rooms', headers={'Authorization': 'Bearer nope'}).status_code == 401
+    assert admin_client.get('/api/v1/rooms').status_code == 200
+
+
+def test_unchanged_reads_revalidate_with_304(client, make_room):
+    type_id, _ = make_room(units=2, name='Etag Suite')
+    resp = client.get('/api/v1/rooms', headers=API_HEADERS)
+    assert {'id': type_id, 'units': 2, 'in_service': 2}.items() <= next(
+        r for r in resp.get_json()['rooms'] if r['id'] == type_id).items()
+    again = client.get('/api/v1/rooms', headers=dict(API_HEADERS, **{'If-None-Match': resp.headers['ETag']}))
+    assert again.status_code == 304
+
+
+def test_booking_for_an_unknown_room_type_is_a_404(client, db):
+    resp = client.post('/api/v1/bookings', headers=API_HEADERS,
+                       json={'room_id': 99999, 'checkin_date': day(330), 'checkout_date': day(331)})
+    assert resp.status_code == 404
+    assert resp.get_json() == {'error': 'Room type 99999 not found'}
+    assert db.execute('SELECT COUNT(*) FROM bookings WHERE room_id = 99999').fetchone()[0] == 0
+
+
+def test_booking_lifecycle(client, make_room):
+    type_id, _ = make_room(units=1)
+    resp = client.post('/api/v1/bookings', headers=API_HEADERS,
+                       json={'room_id': type_id, 'checkin_date': day(332), 'checkout_date': day(334)})
+    assert resp.status_code == 201
+    booking_id = resp.get_json()['booking_id']
+    assert client.post(f'/api/v1/bookings/{booking_id}/checkin', headers=API_HEADERS).get_json()['checked_in']
+    assert client.post(f'/api/v1/bookings/{booking_id}/cancel', headers=API_HEADERS).get_json()['cancelled']
+    assert client.post('/api/v1/bookings/99999/checkout', headers=API_HEADERS).status_code == 404
+
+
+def test_set_rate(client, make_room):
+    type_id, _ = make_room(units=1)
+    resp = client.put(f'/api/v1/rooms/{type_id}/rate', headers=API_HEADERS, json={'price': 140.5})
+    assert resp.get_json() == {'room_id': type_id, 'price': 140.5}
+    assert client.put(f'/api/v1/rooms/{type_id}/rate', headers=API_HEADERS, json={'price': -1}).status_code == 400
+    assert client.put('/api/v1/rooms/99999/rate', headers=API_HEADERS, json={'price': 1}).status_code == 404
+
+
+@pytest.mark.parametrize('method, path', [
+    ('put', '/api/v1/rooms/1/rate'),
+    ('post', '/api/v1/bookings/1/rooms'),
+    ('post', '/api/v1/bookings'),
+    ('post', '/api/v1/invoices'),
+])
+@pytest.mark.parametrize('body', [[{'price': 1}], 'text', None])
+def test_single_item_endpoints_need_a_json_object(client, method, path, body):
+    resp = getattr(client, method)(path, headers=API_HEADERS, json=body)
+    assert resp.status_code == 400
+    assert resp.get_json() == {'error': 'Expected a JSON object'}
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from conftest import API_HEADERS, day
+
+
+def test_failed_batch_leaves_no_stale_calendar(client, other_db, make_room):
+    # The second create_booking loads the type's calendar with the first one's
+    # uncommitted rows; the rollback hands that version number back, and
+    # another worker's booking then brings the counter to the same value
+    type_id, (unit,) = make_room(units=1)
+    resp = client.post('/api/v1/batch', headers=API_HEADERS, json=[
+        {'op': 'create_booking', 'room_id': type_id, 'checkin_date': day(10), 'checkout_date': day(12)},
+        {'op': 'create_booking', 'room_id': type_id, 'checkin_date': day(20), 'checkout_date': day(22)},
+        {'op': 'checkin', 'booking_id': 99999},
+    ])
+    assert resp.status_code == 404
+    assert resp.get_json()['index'] == 2
+
+    with other_db:
+        cur = other_db.execute('''
+            INSERT INTO bookings (checkin_date, checkout_date, room_id, reserved, created_at) VALUES (?, ?, ?, 1, ?)
+        ''', (day(20), day(22), type_id, datetime.utcnow().isoformat()))
+        other_db.execute('INSERT INTO belong_to (booking_id, room_id) VALUES (?, ?)', (cur.lastrowid, unit))
+
+    resp = client.post('/api/v1/bookings', headers=API_HEADERS,
+                       json={'room_id': type_id, 'checkin_date': day(20), 'checkout_date': day(22)})
+    assert resp.status_code == 409
+    clashes = other_db.execute('''
+        SELECT COUNT(*) FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+        WHERE bt.room_id = ? AND b.cancelled = 0 AND b.checkin_date < ? AND b.checkout_date > ?
+    ''', (unit, day(22), day(20))).fetchone()[0]
+    assert clashes == 1
+
+
+def test_second_invoice_for_a_booking_is_rejected(client, make_room):
+    type_id, _ = make_room(units=1)
+    resp = client.post('/api/v1/bookings', headers=API_HEADERS,
+                       json={'room_id': type_id, 'checkin_date': day(-3), 'checkout_date': day(-1)})
+    assert resp.status_code == 201
+    booking_id = resp.get_json()['booking_id']
+
+    resp = client.post('/api/v1/invoices', headers=API_HEADERS, json={'booking_id': booking_id})
+    assert resp.status_code == 201
+    resp = client.post('/api/v1/invoices', headers=API_HEADERS, json={'booking_id': booking_id})
+    assert resp.status_code == 409
+    assert 'already has invoice' in resp.get_json()['error']
+
+
+def test_unknown_room_type_fails_the_whole_batch(client, db, make_room):
+    type_id, _ = make_room(units=1)
+    resp = client.post('/api/v1/batch', headers=API_HEADERS, json={'operations': [
+        {'op': 'create_booking', 'room_id': type_id, 'checkin_date': day(320), 'checkout_date': day(321)},
+        {'op': 'create_booking', 'room_id': 99999, 'checkin_date': day(320), 'checkout_date': day(321)},
+    ]})
+    assert resp.status_code == 404
+    assert resp.get_json() == {'error': 'Room type 99999 not found', 'index': 1}
+    assert db.execute('SELECT COUNT(*) FROM bookings WHERE room_id IN (?, 99999)', (type_id,)).fetchone()[0] == 0
+
+
+def test_batch_results_come_back_in_order(client, make_room):
+    type_id, (unit,) = make_room(units=1)
+    resp = client.post('/api/v1/batch', headers=API_HEADERS, json=[
+        {'op': 'create_booking', 'room_id': type_id, 'checkin_date': day(322), 'checkout_date': day(323)},
+        {'op': 'set_rate', 'room_id': type_id, 'price': 120},
+    ])
+    assert resp.status_code == 200
+    booking, rate = resp.get_json()['results']
+    assert rate == {'room_id': type_id, 'price': 120}
+    detail = client.get(f'/api/v1/bookings/{booking["booking_id"]}', headers=API_HEADERS).get_json()
+    assert (detail['room_id'], detail['units']) == (type_id, [unit])
+
+
+def test_batch_needs_a_list_of_operations(client):
+    assert client.post('/api/v1/batch', headers=API_HEADERS, json={'operations': []}).status_code == 400
+    resp = client.post('/api/v1/batch', headers=API_HEADERS, json=[{'op': 'explode'}])
+    assert resp.status_code == 400 and resp.get_json()['index'] == 0
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import pytest
+
+import app as hotel
+
+
+def asgi_get(application, path):
+    # One GET through the ASGI app; returns (status, body)
+    async def call():
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                 'root_path': '', 'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 1),
+                 'server': ('localhost', 80)}
+        await application(scope, receive, send)
+        start = next(m for m in messages if m['type'] == 'http.response.start')
+        return start['status'], b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return asyncio.run(call())
+
+
+def test_asgi_entry_point_serves_the_app(app, make_room):
+    pytest.importorskip('a2wsgi')
+    import asgi
+    make_room(units=1, name='Async Annex')
+    status, body = asgi_get(asgi.application, '/rooms')
+    assert status == 200
+    assert b'Async Annex' in body
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    # A one-slot hash pool whose slot is held until the test ends
+    pool = hotel.HashPool(processes=0, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    holder = threading.Thread(target=pool.run, args=(hold,))
+    holder.start()
+    started.wait(5)
+    monkeypatch.setattr(hotel, 'hash_pool', pool)
+    yield pool
+    release.set()
+    holder.join()
+
+
+def test_full_hash_pool_turns_work_away(busy_pool):
+    with pytest.raises(hotel.HashPoolBusy):
+        busy_pool.run(len, 'x', wait=0)
+
+
+def test_login_during_a_hash_flood_is_a_503(client, busy_pool, monkeypatch):
+    monkeypatch.setattr(hotel, 'HASH_WAIT', 0)
+    resp = client.post('/admin/login', data={'username': 'flood-test', 'password': 'x'},
+                       environ_base={'REMOTE_ADDR': '10.18.0.1'})
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == '1'
+
+
+def test_inline_pool_hashes_in_the_calling_thread():
+    pool = hotel.HashPool(processes=0, max_pending=1)
+    assert pool.run(threading.get_ident) == threading.get_ident()
+    assert pool._executor is None
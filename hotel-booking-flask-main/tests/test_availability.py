@@ -0,0 +1,63 @@
+import pytest
+
+import app as hotel
+from conftest import day
+
+
+def book(client, type_id, checkin, checkout):
+    return client.post(f'/booking/{type_id}', data={'check_in_date': checkin, 'check_out_date': checkout})
+
+
+def bookings_for(db, type_id):
+    return db.execute('SELECT checkin_date, checkout_date FROM bookings WHERE room_id = ? ORDER BY checkin_date',
+                      (type_id,)).fetchall()
+
+
+def test_overlapping_stay_is_refused_once_the_type_is_full(client, db, make_room):
+    type_id, _ = make_room(units=1)
+    assert book(client, type_id, day(30), day(33)).headers['Location'].endswith('/')
+    resp = book(client, type_id, day(32), day(34))
+    assert resp.headers['Location'].endswith(f'/booking/{type_id}')
+    assert [tuple(r) for r in bookings_for(db, type_id)] == [(day(30), day(33))]
+
+
+def test_back_to_back_stays_share_a_unit(client, db, make_room):
+    type_id, (unit,) = make_room(units=1)
+    book(client, type_id, day(30), day(33))
+    book(client, type_id, day(33), day(35))
+    assert len(bookings_for(db, type_id)) == 2
+    units = db.execute('''
+        SELECT bt.room_id FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id WHERE b.room_id = ?
+    ''', (type_id,)).fetchall()
+    assert [r['room_id'] for r in units] == [unit, unit]
+
+
+def test_each_booking_gets_a_free_unit(db, make_room):
+    type_id, units = make_room(units=2)
+    hotel.create_booking(db, day(40), day(42), type_id)
+    assert len(hotel.find_available_units(db, type_id, day(41), day(43))) == 1
+    hotel.create_booking(db, day(41), day(43), type_id)
+    assert hotel.find_available_units(db, type_id, day(41), day(42)) == []
+    assert hotel.find_available_units(db, type_id, day(42), day(44)) == [units[0]]
+
+
+def test_cancelled_stays_free_their_nights(db, make_room):
+    type_id, _ = make_room(units=1)
+    booking_id = hotel.create_booking(db, day(50), day(52), type_id)
+    assert hotel.find_available_units(db, type_id, day(50), day(51)) == []
+    hotel.cancel_booking(db, booking_id)
+    assert len(hotel.find_available_units(db, type_id, day(50), day(51))) == 1
+
+
+@pytest.mark.parametrize('checkin, checkout', [
+    ('2030-01-05', '2030-01-05'), ('2030-01-05', '2030-01-01'), ('tomorrow', '2030-01-06'), (None, '2030-01-06'),
+])
+def test_invalid_stays_are_rejected(checkin, checkout):
+    with pytest.raises(hotel.BookingError):
+        hotel.parse_stay(checkin, checkout)
+
+
+def test_peak_overlap_counts_departures_before_arrivals():
+    stays = [('2030-01-01', '2030-01-03'), ('2030-01-03', '2030-01-05'), ('2030-01-02', '2030-01-04')]
+    assert hotel._max_overlap(stays, '2030-01-01', '2030-01-06') == 2
+    assert hotel._max_overlap(stays, '2030-01-05', '2030-01-06') == 0
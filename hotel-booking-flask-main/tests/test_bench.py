@@ -0,0 +1,36 @@
+import bench
+import app as hotel
+
+
+def test_summary_reports_percentiles_and_server_errors():
+    latencies = [n / 1000 for n in range(100, 0, -1)]  # 1..100 ms, unsorted
+    summary = bench.summarize(latencies, 2.0, {200: 97, 503: 2, 404: 1})
+    assert (summary['requests'], summary['rps']) == (100, 50.0)
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms']) == (51.0, 95.0, 99.0)
+    assert summary['errors'] == 2
+    assert bench.percentile([], 0.5) is None
+
+
+def test_regressions_are_judged_against_the_tolerance():
+    baseline = {'browse': {'requests': 10, 'rps': 100.0, 'p95_ms': 10.0},
+                'admin_lists': {'requests': 10, 'rps': 100.0, 'p95_ms': 10.0}}
+    results = {'browse': {'requests': 10, 'rps': 90.0, 'p95_ms': 11.5},
+               'admin_lists': {'requests': 10, 'rps': 70.0, 'p95_ms': 13.0},
+               'micro.new': {'requests': 10, 'rps': 1.0, 'p95_ms': 99.0}}
+    regressions = bench.compare(results, baseline, 0.20)
+    assert len(regressions) == 2
+    assert all(r.startswith('admin_lists:') for r in regressions)
+
+
+def test_load_scenarios_run_against_the_test_client(app):
+    for step, admin in ((bench.browse_step, False), (bench.admin_step, True), (bench.booking_step, False)):
+        result = bench.run_load('t', lambda: bench.TestClientUser(hotel, admin), step, 2, 0.2, 1, seed=3)
+        assert result['requests'] > 0
+        assert result['errors'] == 0, result['statuses']
+
+
+def test_micro_benchmarks_cover_the_hot_functions(app):
+    results = bench.run_micro(hotel, 0.02, 1, seed=3)
+    assert set(results) == {'db_pool_checkout', 'has_capacity', 'bookings_first_page', 'guests_list_page',
+                            'create_booking'}
+    assert all(r['requests'] > 0 for r in results.values())
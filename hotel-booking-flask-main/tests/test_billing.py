@@ -0,0 +1,69 @@
+import pytest
+
+import app as hotel
+from conftest import day
+
+
+@pytest.fixture
+def stay(db, make_room):
+    # Two nights at 100 with two services; returns (booking_id, unit ids)
+    type_id, units = make_room(units=2, price=100.0)
+    booking_id = hotel.create_booking(db, day(-2), day(0), type_id)
+    db.executemany('INSERT INTO services (service_name, unit_price, booking_id) VALUES (?, ?, ?)',
+                   [('Breakfast', 12.0, booking_id), ('Laundry', 8.0, booking_id)])
+    db.commit()
+    return booking_id, units
+
+
+def invoices_of(db, booking_id):
+    return db.execute('SELECT * FROM invoices WHERE booking_id = ?', (booking_id,)).fetchall()
+
+
+def test_charges_come_from_nights_rate_services_and_tax(db, stay):
+    booking_id, _ = stay
+    assert hotel.compute_invoice(db, booking_id) == {
+        'booking_id': booking_id, 'room_charge': 200.0, 'service_charge': 20.0, 'tax': 22.0, 'total_amount': 242.0}
+
+
+def test_every_assigned_unit_is_charged(db, stay):
+    booking_id, units = stay
+    assigned = db.execute('SELECT room_id FROM belong_to WHERE booking_id = ?', (booking_id,)).fetchone()[0]
+    db.execute('INSERT INTO belong_to (booking_id, room_id) VALUES (?, ?)',
+               (booking_id, next(u for u in units if u != assigned)))
+    db.commit()
+    assert hotel.compute_invoice(db, booking_id)['room_charge'] == 400.0
+
+
+def test_day_of_checkouts_is_billed_once_and_cancellations_skipped(db, stay, make_room):
+    booking_id, _ = stay
+    type_id, _ = make_room(units=1)
+    cancelled = hotel.create_booking(db, day(-1), day(0), type_id)
+    hotel.cancel_booking(db, cancelled)
+    assert hotel.generate_invoices(db, checkout_date=day(0)) >= 1
+    assert hotel.generate_invoices(db, checkout_date=day(0)) == 0
+    (invoice,) = invoices_of(db, booking_id)
+    assert (invoice['total_amount'], invoice['issue_date']) == (242.0, day(0))
+    assert invoices_of(db, cancelled) == []
+
+
+def test_admin_form_bills_a_booking_only_once(admin_client, db, stay):
+    booking_id, _ = stay
+    admin_client.post('/admin/invoices/create', data={'booking_id': booking_id})
+    (invoice,) = invoices_of(db, booking_id)
+    assert invoice['total_amount'] == 242.0
+    resp = admin_client.post('/admin/invoices/create', data={'booking_id': booking_id, 'total_amount': '5'},
+                             follow_redirects=True)
+    assert f'Booking {booking_id} already has invoice {invoice["invoice_no"]}' in resp.get_data(as_text=True)
+    assert len(invoices_of(db, booking_id)) == 1
+
+
+def test_invoice_cannot_be_moved_onto_a_billed_booking(admin_client, db, stay):
+    booking_id, _ = stay
+    hotel.generate_invoices(db, booking_id=booking_id)
+    other = hotel.create_invoice(db, 1, 1, 0, 0, day(0), None)
+    admin_client.post(f'/admin/invoices/{other}/edit', data={'booking_id': booking_id, 'total_amount': '1'})
+    assert db.execute('SELECT booking_id FROM invoices WHERE invoice_no = ?', (other,)).fetchone()[0] is None
+    # Re-saving an invoice on its own booking is fine
+    (own,) = invoices_of(db, booking_id)
+    admin_client.post(f'/admin/invoices/{own["invoice_no"]}/edit', data={'booking_id': booking_id, 'total_amount': '9'})
+    assert invoices_of(db, booking_id)[0]['total_amount'] == 9
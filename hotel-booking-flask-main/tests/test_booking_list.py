@@ -0,0 +1,78 @@
+import base64
+import json
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as hotel
+from conftest import API_HEADERS, day
+
+
+@pytest.fixture
+def booked_type(db, make_room):
+    # A room type with five bookings, the second and fourth cancelled; returns
+    # (type_id, booking ids newest first)
+    type_id, _ = make_room(units=5)
+    ids = [hotel.create_booking(db, day(100 + n), day(101 + n), type_id) for n in range(5)]
+    for booking_id in ids[1::2]:
+        hotel.cancel_booking(db, booking_id)
+    return type_id, ids[::-1]
+
+
+def walk(db, args):
+    # Follow next cursors from the first page; returns each page's booking ids
+    pages, after = [], None
+    while True:
+        page = hotel.booking_list_page(db, MultiDict(dict(args, after=after) if after else args))
+        pages.append([row['booking_id'] for row in page])
+        after = page.next_cursor
+        if not after:
+            return pages
+
+
+def test_pages_cover_every_booking_once_in_order(db, booked_type):
+    type_id, ids = booked_type
+    pages = walk(db, {'type_id': type_id, 'per_page': 2})
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+
+def test_previous_cursor_returns_the_same_page(db, booked_type):
+    type_id, ids = booked_type
+    first = hotel.booking_list_page(db, MultiDict({'type_id': type_id, 'per_page': 2}))
+    second = hotel.booking_list_page(db, MultiDict({'type_id': type_id, 'per_page': 2, 'after': first.next_cursor}))
+    back = hotel.booking_list_page(db, MultiDict({'type_id': type_id, 'per_page': 2, 'before': second.prev_cursor}))
+    assert [r['booking_id'] for r in back] == ids[0:2]
+
+
+def test_status_and_date_filters(db, booked_type):
+    type_id, ids = booked_type
+    assert walk(db, {'type_id': type_id, 'status': 'cancelled'}) == [[ids[1], ids[3]]]
+    assert walk(db, {'type_id': type_id, 'from': day(102), 'to': day(103)}) == [[ids[1], ids[2]]]
+
+
+@pytest.mark.parametrize('args', [{}, {'type_id': 1}])
+@pytest.mark.parametrize('status', ['cancelled', 'no_show', 'overstay'])
+def test_sparse_status_filters_seek_an_index(db, status, args):
+    captured = []
+    db.set_trace_callback(captured.append)
+    try:
+        hotel.booking_list_page(db, MultiDict(dict(args, status=status)))
+    finally:
+        db.set_trace_callback(None)
+    sql = next(s for s in captured if 'FROM bookings b' in s)
+    plan = ' '.join(r[3] for r in db.execute('EXPLAIN QUERY PLAN ' + sql))
+    assert f'idx_bookings_{status}_' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_invalid_dates_are_a_bad_request(admin_client, client):
+    assert admin_client.get('/admin/bookings?from=2024-13-01').status_code == 400
+    assert admin_client.get('/admin/bookings?to=soon').status_code == 400
+    resp = client.get('/api/v1/bookings?from=yesterday', headers=API_HEADERS)
+    assert resp.status_code == 400
+    assert resp.get_json() == {'error': 'from must be a YYYY-MM-DD date'}
+
+
+def test_crafted_cursor_is_ignored(admin_client, booked_type):
+    cursor = base64.urlsafe_b64encode(json.dumps([{'x': 1}, [2]]).encode()).decode()
+    assert admin_client.get(f'/admin/bookings?after={cursor}').status_code == 200
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import app as hotel
+from conftest import day
+
+
+def payload(type_id, checkin, checkout):
+    return json.dumps({'checkin_date': checkin, 'checkout_date': checkout, 'room_id': type_id,
+                       'user_id': None, 'guest_id': None, 'submitted_at': '2026-01-01T00:00:00'})
+
+
+def token_at(seconds_ago, rest='abc'):
+    return f'{int(time.time()) - seconds_ago:x}-{rest}'
+
+
+def outcome(db, token):
+    row = db.execute('SELECT status, booking_id FROM booking_requests WHERE token = ?', (token,)).fetchone()
+    return tuple(row) if row else None
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / 'spool.db')
+
+
+def writer_threads():
+    return [t for t in threading.enumerate() if t.name == 'booking-writer']
+
+
+def test_replay_commits_the_spool_without_a_thread_or_open_handles(db, make_room, spool_path):
+    type_id, _ = make_room(units=1)
+    previous_run = hotel.BookingQueue(hotel.db_pool, mode='durable', spool_path=spool_path)
+    spool = previous_run._spool()
+    spool.executemany('INSERT INTO spool (token, payload) VALUES (?, ?)',
+                      [('replay-ok', payload(type_id, day(300), day(302))),
+                       ('replay-full', payload(type_id, day(301), day(303)))])
+    spool.commit()
+    threads = writer_threads()
+    queue = hotel.BookingQueue(hotel.db_pool, mode='durable', spool_path=spool_path)
+    assert queue.replay() == 2
+    assert outcome(db, 'replay-ok')[0] == 'confirmed'
+    assert outcome(db, 'replay-full') == ('rejected', None)
+    assert spool.execute('SELECT COUNT(*) FROM spool').fetchone()[0] == 0
+    # Safe to fork after: no writer, no spool connection, no pooled connections
+    assert queue._writer is None and queue._spool_conn is None
+    assert writer_threads() == threads
+    assert hotel.db_pool.stats()['idle'] == 0
+
+
+def test_create_app_does_not_start_a_writer(app):
+    assert hotel.create_app(setup=False, warm=False) is app
+    assert hotel.booking_queue._writer is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_each_forked_worker_starts_its_own_writer(db, make_room, spool_path):
+    type_id, _ = make_room(units=1)
+    queue = hotel.BookingQueue(hotel.db_pool, mode='durable', spool_path=spool_path)
+    queue.replay()  # what the gunicorn master does before forking
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # worker
+        code = 1
+        try:
+            os.close(read_end)
+            token = queue.submit(day(305), day(306), type_id)
+            if queue.drain() and queue._writer is not None and queue._pid == os.getpid():
+                os.write(write_end, token.encode())
+                code = 0
+        finally:
+            os._exit(code)
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        token = pipe.read()
+    assert os.waitpid(pid, 0)[1] == 0
+    assert queue._writer is None  # the master never started one
+    assert outcome(db, token)[0] == 'confirmed'
+
+
+def test_status_is_answered_by_any_worker(db, make_room, spool_path):
+    type_id, _ = make_room(units=1)
+    worker = hotel.BookingQueue(hotel.db_pool, mode='queued')
+    token = worker.submit(day(310), day(311), type_id)
+    assert worker.drain()
+    other = hotel.BookingQueue(hotel.db_pool, mode='queued')
+    assert other.status(db, token)['status'] == 'confirmed'
+    # Queued somewhere else and not decided yet
+    assert other.status(db, token_at(5))['status'] == 'pending'
+    assert other.status(db, token_at(other.pending_window + 5))['status'] == 'unknown'
+    assert other.status(db, 'not-a-token')['status'] == 'unknown'
+
+
+def test_request_stuck_in_the_spool_is_delayed_not_pending_forever(db, spool_path):
+    queue = hotel.BookingQueue(hotel.db_pool, mode='durable', spool_path=spool_path)
+    stuck = token_at(queue.pending_window + 5)
+    spool = queue._spool()
+    spool.execute('INSERT INTO spool (token, payload) VALUES (?, ?)', (stuck, payload(1, day(0), day(1))))
+    spool.commit()
+    assert queue.status(db, stuck)['status'] == 'delayed'
+    recent = token_at(1)
+    spool.execute('UPDATE spool SET token = ? WHERE token = ?', (recent, stuck))
+    spool.commit()
+    assert queue.status(db, recent)['status'] == 'pending'
+
+
+def test_status_json_is_202_until_decided(client):
+    assert client.get(f'/booking/status/{token_at(1)}.json').status_code == 202
+    resp = client.get(f'/booking/status/{token_at(hotel.BOOKING_PENDING_WINDOW + 5)}.json')
+    assert resp.status_code == 404
+    assert resp.get_json()['status'] == 'unknown'
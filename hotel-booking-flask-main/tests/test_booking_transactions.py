@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+
+import pytest
+
+import app as hotel
+from conftest import day
+
+
+@pytest.fixture
+def impatient_db():
+    # No busy timeout, so a held write lock surfaces as "database is locked" at once
+    conn = sqlite3.connect(hotel.DB_PATH, timeout=0)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def test_busy_lock_is_retried_until_it_is_released(impatient_db, other_db):
+    stats = hotel.TransactionStats()
+    other_db.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.05, other_db.commit).start()
+    result = hotel.run_immediate(impatient_db, lambda tx: tx.execute('SELECT 1').fetchone()[0], stats=stats,
+                                 max_attempts=50)
+    assert result == 1
+    snap = stats.snapshot()
+    assert snap['committed'] == 1 and snap['retries'] >= 1 and snap['lock_wait_total_ms'] > 0
+
+
+def test_gives_up_after_max_attempts(impatient_db, other_db):
+    stats = hotel.TransactionStats()
+    other_db.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            hotel.run_immediate(impatient_db, lambda tx: None, stats=stats, max_attempts=2)
+    finally:
+        other_db.rollback()
+    assert stats.snapshot()['failures'] == 1
+
+
+def test_failed_work_is_rolled_back(db, make_room):
+    type_id, _ = make_room(units=1)
+    stats = hotel.TransactionStats()
+
+    def write_then_fail(tx):
+        hotel._reserve_booking(tx, day(60), day(61), type_id, None, None, 1)
+        raise hotel.RoomUnavailable('changed my mind')
+
+    with pytest.raises(hotel.RoomUnavailable):
+        hotel.run_immediate(db, write_then_fail, stats=stats)
+    assert stats.snapshot()['rolled_back'] == 1
+    assert db.execute('SELECT COUNT(*) FROM bookings WHERE room_id = ?', (type_id,)).fetchone()[0] == 0
+
+
+def test_concurrent_requests_for_the_last_unit_book_it_once(make_room):
+    type_id, _ = make_room(units=1)
+    outcomes = []
+
+    def attempt():
+        conn = hotel.db_pool.checkout()
+        try:
+            hotel.create_booking(conn, day(70), day(72), type_id)
+            outcomes.append('booked')
+        except hotel.RoomUnavailable:
+            outcomes.append('full')
+        finally:
+            hotel.db_pool.checkin(conn)
+
+    threads = [threading.Thread(target=attempt) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(outcomes) == ['booked'] + ['full'] * 5
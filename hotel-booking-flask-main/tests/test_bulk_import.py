@@ -0,0 +1,60 @@
+import io
+
+import app as hotel
+
+
+def records(text, fmt):
+    return hotel.iter_import_records(io.StringIO(text), fmt)
+
+
+def test_valid_rows_are_written_in_chunks_and_bad_rows_reported(db, make_room):
+    type_id, _ = make_room(units=0)
+    csv_text = ('type_id,room_no,floor,maintenance\n'
+                f'{type_id},101,1,no\n'
+                f'{type_id},102,1,\n'
+                '99999,103,1,no\n'
+                f'{type_id},104,first,no\n'
+                f'{type_id},105,1,yes\n')
+    report = hotel.bulk_import(db, 'room_units', records(csv_text, 'csv'), chunk_size=2)
+    assert (report.rows, report.inserted, report.chunks) == (5, 3, 2)
+    assert report.errors == [(4, 'type_id 99999 does not exist'), (5, "floor: invalid literal for int() with base 10: 'first'")]
+    rows = db.execute('SELECT room_no, maintenance, available FROM room_units WHERE type_id = ? ORDER BY room_no',
+                      (type_id,)).fetchall()
+    assert [tuple(r) for r in rows] == [('101', 0, 1), ('102', 0, 1), ('105', 1, 1)]
+    assert hotel.catalog.unit_counts()[type_id]['total'] == 3
+
+
+def test_jsonl_lines_are_parsed_independently(db):
+    text = '{"name": "Imported guest", "phone": "555"}\n\nnot json\n[1, 2]\n{"email": "a@b.c"}\n'
+    report = hotel.bulk_import(db, 'guests', records(text, 'jsonl'))
+    assert report.inserted == 2
+    assert [line for line, _ in report.errors] == [3, 4]
+    assert report.errors[1][1] == 'expected a JSON object'
+
+
+def test_required_columns_and_dates_are_checked(db):
+    text = 'name,hire_date,salary\n,2020-01-01,1\nAda,2020-02-30,1\nGrace,2020-02-28,12.5\n'
+    report = hotel.bulk_import(db, 'employees', records(text, 'csv'))
+    assert report.inserted == 1
+    assert report.errors[0] == (2, 'name is required')
+    assert report.errors[1][0] == 3 and report.errors[1][1].startswith('hire_date:')
+
+
+def test_upload_of_non_utf8_text_is_reported_not_a_500(admin_client):
+    data = {'dataset': 'guests', 'file': (io.BytesIO('name\nJos\xe9\n'.encode('latin-1')), 'guests.csv')}
+    resp = admin_client.post('/admin/import', data=data, content_type='multipart/form-data')
+    assert resp.status_code == 200
+    assert b'not UTF-8' in resp.data
+
+
+def test_upload_imports_a_csv(admin_client, db):
+    data = {'dataset': 'guests', 'file': (io.BytesIO(b'\xef\xbb\xbfname,email\nUpload guest,u@example.com\n'), 'g.csv')}
+    resp = admin_client.post('/admin/import', data=data, content_type='multipart/form-data')
+    assert b'Imported 1 guests rows (0 rejected)' in resp.data
+    assert db.execute("SELECT email FROM guests WHERE name = 'Upload guest'").fetchone()[0] == 'u@example.com'
+
+
+def test_format_follows_the_file_name_unless_given():
+    assert hotel.import_format('x.JSONL') == 'jsonl'
+    assert hotel.import_format('x.txt') == 'csv'
+    assert hotel.import_format('x.csv', 'jsonl') == 'jsonl'
@@ -0,0 +1,54 @@
+from datetime import date
+
+import app as hotel
+from conftest import day
+
+
+def unit_row(grid, room_id):
+    return next(u for u in grid['units'] if u['room_id'] == room_id)
+
+
+def test_grid_marks_the_nights_each_unit_is_held(db, make_room):
+    type_id, units = make_room(units=2)
+    booking_id = hotel.create_booking(db, day(280), day(283), type_id)
+    unit = db.execute('SELECT room_id FROM belong_to WHERE booking_id = ?', (booking_id,)).fetchone()[0]
+    grid = hotel.occupancy_grid(db, date.fromisoformat(day(279)), 5, type_id)
+    assert [u['room_id'] for u in grid['units']] == units
+    assert unit_row(grid, unit)['nights'] == [False, True, True, True, False]
+    assert not any(unit_row(grid, next(u for u in units if u != unit))['nights'])
+
+
+def test_cancelling_frees_the_nights(db, make_room):
+    type_id, _ = make_room(units=1)
+    booking_id = hotel.create_booking(db, day(285), day(287), type_id)
+    hotel.cancel_booking(db, booking_id)
+    grid = hotel.occupancy_grid(db, date.fromisoformat(day(285)), 2, type_id)
+    assert grid['units'][0]['nights'] == [False, False]
+
+
+def test_type_filter_loads_only_that_types_bitmaps(db, make_room):
+    type_id, (unit,) = make_room(units=1)
+    other_type, _ = make_room(units=1)
+    hotel.create_booking(db, day(288), day(289), type_id)
+    hotel.create_booking(db, day(288), day(289), other_type)
+    hotel.refresh_unit_nights(db)
+    captured = []
+    db.set_trace_callback(captured.append)
+    try:
+        grid = hotel.occupancy_grid(db, date.fromisoformat(day(288)), 1, type_id)
+    finally:
+        db.set_trace_callback(None)
+    assert [u['room_id'] for u in grid['units']] == [unit]
+    sql = next(s for s in captured if 'FROM unit_nights n' in s)
+    plan = ' '.join(r[3] for r in db.execute('EXPLAIN QUERY PLAN ' + sql))
+    assert 'idx_room_units_type' in plan and 'SCAN n' not in plan
+
+
+def test_calendar_json_packs_nights_and_checks_the_span(admin_client, db, make_room):
+    type_id, _ = make_room(units=1)
+    hotel.create_booking(db, day(290), day(291), type_id)
+    grid = admin_client.get(f'/admin/calendar.json?type_id={type_id}&start={day(289)}&days=3').get_json()
+    assert grid['dates'] == [day(289), day(290), day(291)]
+    assert grid['units'][0]['nights'] == '010'
+    assert admin_client.get(f'/admin/calendar.json?days={hotel.CALENDAR_MAX_DAYS + 1}').status_code == 400
+    assert admin_client.get(f'/admin/calendar?type_id={type_id}').status_code == 200
@@ -0,0 +1,45 @@
+import app as hotel
+
+
+def test_repeat_reads_are_served_from_memory(db):
+    cache = hotel.CatalogCache(ttl=60)
+    first = cache.room_types()
+    assert cache.room_types() is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(db, make_room):
+    cache = hotel.CatalogCache(ttl=0)
+    before = cache.room_types()
+    type_id, _ = make_room(units=0, name='Arrived later')
+    assert type_id not in [r['id'] for r in before]
+    assert cache.room_type(type_id)['name'] == 'Arrived later'
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_value_loaded_across_an_invalidation_is_not_kept(db, monkeypatch):
+    cache = hotel.CatalogCache(ttl=60)
+    real_get_db = hotel.get_db
+
+    def get_db_then_invalidate():
+        cache.invalidate()  # a write lands while the loader runs
+        return real_get_db()
+
+    monkeypatch.setattr(hotel, 'get_db', get_db_then_invalidate)
+    cache.room_types()
+    assert cache.stats()['entries'] == 0
+
+
+def test_unit_writes_invalidate_the_shared_catalog(admin_client, db, make_room):
+    type_id, _ = make_room(units=1)
+    assert hotel.catalog.unit_counts()[type_id] == {'total': 1, 'in_service': 1}
+    admin_client.post('/admin/room_units/create', data={'type_id': type_id, 'room_no': 'X9', 'maintenance': 'on'})
+    assert hotel.catalog.unit_counts()[type_id] == {'total': 2, 'in_service': 1}
+
+
+def test_public_booking_page_uses_the_catalog(client, make_room):
+    type_id, _ = make_room(units=1, name='Cached Suite')
+    hits = hotel.catalog.hits
+    assert b'Cached Suite' in client.get(f'/booking/{type_id}').data
+    assert client.get('/booking/99999').status_code == 302
+    assert hotel.catalog.hits > hits
@@ -0,0 +1,46 @@
+import pytest
+
+import app as hotel
+
+
+@pytest.fixture
+def pool():
+    pool = hotel.ConnectionPool(hotel.DB_PATH, size=1, timeout=0.05)
+    yield pool
+    pool.close_all()
+
+
+def test_connections_are_reused_and_tuned(pool):
+    conn = pool.checkout()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    pool.checkin(conn)
+    assert pool.checkout() is conn
+    assert pool.stats()['created'] == 1
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(pool):
+    conn = pool.checkout()
+    with pytest.raises(hotel.PoolTimeout):
+        pool.checkout()
+    pool.checkin(conn)
+    assert pool.checkout() is conn
+    assert pool.stats()['waits'] == 1
+
+
+def test_checkin_rolls_back_an_unfinished_transaction(pool, make_room):
+    type_id, _ = make_room(units=0)
+    conn = pool.checkout()
+    conn.execute('UPDATE rooms SET price = 1 WHERE id = ?', (type_id,))
+    assert conn.in_transaction
+    pool.checkin(conn)
+    assert not conn.in_transaction
+    assert conn.execute('SELECT price FROM rooms WHERE id = ?', (type_id,)).fetchone()[0] == 100.0
+
+
+def test_requests_share_pooled_connections(client):
+    client.get('/booking/1')
+    created = hotel.db_pool.stats()['created']
+    for _ in range(5):
+        assert client.get('/booking/1').status_code == 200
+    assert hotel.db_pool.stats()['created'] == created
@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from werkzeug.security import check_password_hash
+
+import datagen
+
+TODAY = date(2026, 1, 1)
+
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall() for table in datagen.TABLES}
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('datagen') / 'hotel.db')
+    counts = datagen.generate(path, room_types=2, units=4, years=1, seed=5, today=TODAY, refresh=True)
+    return path, counts
+
+
+def test_same_arguments_give_the_same_rows(generated, tmp_path):
+    path, counts = generated
+    again = str(tmp_path / 'again.db')
+    datagen.generate(again, room_types=2, units=4, years=1, seed=5, today=TODAY)
+    assert dump(again) == dump(path)
+    other_seed = str(tmp_path / 'other.db')
+    datagen.generate(other_seed, room_types=2, units=4, years=1, seed=6, today=TODAY)
+    assert dump(other_seed)['bookings'] != dump(path)['bookings']
+
+
+def test_counts_match_the_tables(generated):
+    path, counts = generated
+    assert {table: len(rows) for table, rows in dump(path).items()} == {t: counts[t] for t in datagen.TABLES}
+    assert counts['bookings'] > 0 and counts['rooms'] == 2 and counts['room_units'] == 4
+
+
+def test_generated_data_is_consistent(generated):
+    path, _ = generated
+    conn = sqlite3.connect(path)
+    try:
+        assert datagen.validate(conn) == []
+        # Triggers and their derived state are back after the load
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0] > 0
+        assert conn.execute('SELECT COUNT(*) FROM analytics_dirty').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM daily_room_stats').fetchone()[0] > 0
+        admin_hash = conn.execute("SELECT password FROM users WHERE username = 'admin'").fetchone()[0]
+    finally:
+        conn.close()
+    assert check_password_hash(admin_hash, 'admin')
+
+
+def test_validate_reports_a_double_booking(generated, tmp_path):
+    path, _ = generated
+    conn = sqlite3.connect(path)
+    copy = sqlite3.connect(str(tmp_path / 'copy.db'))
+    conn.backup(copy)
+    conn.close()
+    booking_id, unit = copy.execute('''
+        SELECT bt.booking_id, bt.room_id FROM belong_to bt JOIN bookings b ON b.booking_id = bt.booking_id
+        WHERE b.cancelled = 0 ORDER BY bt.booking_id LIMIT 1
+    ''').fetchone()
+    room_id, checkin, checkout = copy.execute('SELECT room_id, checkin_date, checkout_date FROM bookings '
+                                              'WHERE booking_id = ?', (booking_id,)).fetchone()
+    clash = copy.execute('INSERT INTO bookings (room_id, checkin_date, checkout_date, cancelled) VALUES (?, ?, ?, 0)',
+                         (room_id, checkin, checkout)).lastrowid
+    copy.execute('INSERT INTO belong_to (booking_id, room_id) VALUES (?, ?)', (clash, unit))
+    copy.commit()
+    assert datagen.validate(copy) == ['1 double-booked unit nights']
+    copy.close()
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+from datetime import date
+
+import app as hotel
+from conftest import day
+
+
+def test_csv_export_streams_bookings_after_a_key(admin_client, db, make_room):
+    type_id, _ = make_room(units=2)
+    first = hotel.create_booking(db, day(110), day(112), type_id)
+    second = hotel.create_booking(db, day(111), day(113), type_id)
+    resp = admin_client.get(f'/admin/export/bookings.csv?since={first - 1}')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=bookings.csv'
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [int(r['booking_id']) for r in rows[:2]] == [first, second]
+    assert rows[0]['checkin_date'] == day(110)
+
+
+def test_jsonl_export_has_one_object_per_line(admin_client, db):
+    db.execute("INSERT INTO services (service_name, unit_price) VALUES ('Export test', 9.5)")
+    db.commit()
+    resp = admin_client.get('/admin/export/services.jsonl')
+    lines = resp.get_data(as_text=True).splitlines()
+    assert resp.mimetype == 'application/x-ndjson'
+    assert {'service_name': 'Export test', 'unit_price': 9.5}.items() <= json.loads(lines[-1]).items()
+
+
+def test_iter_export_yields_in_batches(db):
+    db.executemany('INSERT INTO guests (name) VALUES (?)', [(f'Batch guest {n}',) for n in range(5)])
+    db.commit()
+    sql, params = hotel.export_query('guests')
+    chunks = list(hotel.iter_export(db, sql, params, 'jsonl', batch_size=2))
+    total = db.execute('SELECT COUNT(*) FROM guests').fetchone()[0]
+    assert len(chunks) == (total + 1) // 2
+    assert sum(chunk.count('\n') for chunk in chunks) == total
+
+
+def test_date_range_is_inclusive_of_timestamps_on_the_end_date():
+    sql, params = hotel.export_query('bookings', date_from=date(2030, 1, 1), date_to=date(2030, 1, 31))
+    assert 'created_at >= ?' in sql and 'created_at < ?' in sql
+    assert params == ['2030-01-01', '2030-02-01']
+
+
+def test_bad_requests(admin_client):
+    assert admin_client.get('/admin/export/users.csv').status_code == 404
+    assert admin_client.get('/admin/export/bookings.xml').status_code == 404
+    assert admin_client.get('/admin/export/bookings.csv?since=abc').status_code == 400
+    assert admin_client.get('/admin/export/bookings.csv?from=2030-02-30').status_code == 400
+    assert admin_client.get('/admin/export/guests.csv?from=2030-01-01').status_code == 400
+
+
+def test_exports_need_an_admin(client):
+    resp = client.get('/admin/export/bookings.csv')
+    assert resp.status_code == 302
+    assert '/admin/login' in resp.headers['Location']
@@ -0,0 +1,58 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as hotel
+
+
+@pytest.fixture
+def units(db, make_room):
+    # A type with four units numbered out of order, two with no room number
+    type_id, unit_ids = make_room(units=4)
+    for unit_id, room_no in zip(unit_ids, ['B2', None, 'A1', None]):
+        db.execute('UPDATE room_units SET room_no = ? WHERE room_id = ?', (room_no, unit_id))
+    db.commit()
+    return type_id, unit_ids
+
+
+def walk(db, view, args):
+    pages, after = [], None
+    while True:
+        page = view.page(db, MultiDict(dict(args, after=after) if after else args))
+        pages.append(page)
+        after = page.next_cursor
+        if not after:
+            return pages
+
+
+def test_sorted_pages_include_null_keys_exactly_once(db, units):
+    type_id, (b2, none1, a1, none2) = units
+    pages = walk(db, hotel.ROOM_UNITS_LIST, {'type_id': type_id, 'sort': 'room_no', 'per_page': 3})
+    assert [[r['room_id'] for r in p] for p in pages] == [[none1, none2, a1], [b2]]
+    pages = walk(db, hotel.ROOM_UNITS_LIST, {'type_id': type_id, 'sort': 'room_no', 'dir': 'desc', 'per_page': 3})
+    assert [r['room_id'] for p in pages for r in p] == [b2, a1, none2, none1]
+
+
+def test_unknown_sort_and_direction_fall_back_to_defaults(db, units):
+    type_id, unit_ids = units
+    page = hotel.ROOM_UNITS_LIST.page(db, MultiDict({'type_id': type_id, 'sort': 'password', 'dir': 'sideways'}))
+    assert (page.sort, page.dir) == (hotel.ROOM_UNITS_LIST.default_sort, hotel.ROOM_UNITS_LIST.default_dir)
+    assert sorted(r['room_id'] for r in page) == unit_ids
+
+
+def test_pager_links_carry_filters_and_sort(db, units):
+    type_id, _ = units
+    page = hotel.ROOM_UNITS_LIST.page(db, MultiDict({'type_id': str(type_id), 'sort': 'room_no', 'per_page': '1'}))
+    assert page.args == {'type_id': str(type_id), 'sort': 'room_no', 'per_page': 1}
+
+
+def test_record_estimate_only_on_unfiltered_lists(db, units):
+    type_id, _ = units
+    assert hotel.ROOM_UNITS_LIST.page(db, MultiDict()).total >= 4
+    assert hotel.ROOM_UNITS_LIST.page(db, MultiDict({'type_id': type_id})).total is None
+
+
+@pytest.mark.parametrize('path', ['/admin', '/admin/employees', '/admin/room_units', '/admin/services',
+                                  '/admin/invoices', '/admin/user_phones', '/admin/hired_as', '/admin/belong_to',
+                                  '/admin/guests'])
+def test_admin_list_pages_render(admin_client, path):
+    assert admin_client.get(path + '?per_page=1').status_code == 200
@@ -0,0 +1,68 @@
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import app as hotel
+
+
+@pytest.fixture
+def admin_user(db):
+    # An admin whose password was hashed under an old, cheaper method
+    def make(username, password='s3cret', method='pbkdf2:sha256:1000'):
+        user_id = db.execute('INSERT INTO users (username, password, is_admin) VALUES (?, ?, 1)',
+                             (username, generate_password_hash(password, method))).lastrowid
+        db.commit()
+        return user_id
+    return make
+
+
+def stored_hash(db, user_id):
+    return db.execute('SELECT password FROM users WHERE id = ?', (user_id,)).fetchone()[0]
+
+
+def login(client, username, password, ip='10.23.0.1'):
+    return client.post('/admin/login', data={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_buckets_allow_a_burst_then_refill_at_the_rate():
+    buckets = hotel.TokenBuckets(per_minute=6, burst=2)
+    assert buckets.take('k', now=0) == buckets.take('k', now=0) == 0
+    assert buckets.take('k', now=0) == pytest.approx(10.0)
+    assert buckets.take('k', now=5) == pytest.approx(5.0)
+    assert buckets.take('k', now=10) == 0
+
+
+def test_buckets_forget_the_oldest_keys():
+    buckets = hotel.TokenBuckets(per_minute=6, burst=1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, now=0)
+    assert buckets.take('a', now=0) == 0  # evicted, so a fresh bucket
+
+
+def test_login_upgrades_an_old_hash(client, db, admin_user):
+    user_id = admin_user('rehash-admin')
+    old = stored_hash(db, user_id)
+    resp = login(client, 'rehash-admin', 's3cret')
+    assert resp.status_code == 302
+    new = stored_hash(db, user_id)
+    assert new != old and not hotel.needs_rehash(new)
+    assert check_password_hash(new, 's3cret')
+
+
+def test_failed_login_keeps_the_hash(client, db, admin_user):
+    user_id = admin_user('keep-admin')
+    old = stored_hash(db, user_id)
+    resp = login(client, 'keep-admin', 'wrong')
+    assert resp.status_code == 200 and b'Invalid credentials' in resp.data
+    assert stored_hash(db, user_id) == old
+
+
+def test_repeated_guesses_for_one_user_are_throttled(client, admin_user):
+    admin_user('throttle-admin')
+    statuses = [login(client, 'throttle-admin', 'wrong', ip=f'10.23.1.{n}').status_code
+                for n in range(hotel.LOGIN_USER_BURST + 1)]
+    assert statuses[:-1] == [200] * hotel.LOGIN_USER_BURST
+    assert statuses[-1] == 429
+    # Throttled before the password is even looked at
+    resp = login(client, 'throttle-admin', 's3cret', ip='10.23.1.99')
+    assert resp.status_code == 429 and int(resp.headers['Retry-After']) >= 1
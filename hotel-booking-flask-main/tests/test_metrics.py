@@ -0,0 +1,62 @@
+import pytest
+
+import app as hotel
+
+
+@pytest.fixture
+def fresh_metrics():
+    hotel.metrics.reset()
+    yield hotel.metrics
+    hotel.metrics.reset()
+
+
+def route(snapshot, endpoint):
+    return next(r for r in snapshot['routes'] if r['endpoint'] == endpoint)
+
+
+def test_requests_are_timed_with_their_queries_and_rendering(admin_client, fresh_metrics):
+    admin_client.get('/admin/bookings')
+    admin_client.get('/admin/bookings')
+    r = route(fresh_metrics.snapshot(), 'admin_bookings')
+    assert (r['count'], r['method'], r['errors']) == (2, 'GET', 0)
+    assert r['queries'] >= 1 and r['render_ms'] > 0
+    assert r['p50_ms'] <= r['p95_ms'] <= r['max_ms']
+
+
+def test_statements_are_grouped_by_normalised_sql(db, fresh_metrics):
+    db.execute('SELECT  id FROM rooms\n WHERE id = ?', (1,)).fetchall()
+    db.execute('SELECT id FROM rooms WHERE id = ?', (2,)).fetchall()
+    (stat,) = [s for s in fresh_metrics.snapshot()['statements'] if s['sql'] == 'SELECT id FROM rooms WHERE id = ?']
+    assert (stat['calls'], stat['rows']) == (2, 2)
+
+
+def test_slow_queries_are_logged_with_their_plan(db, fresh_metrics, monkeypatch):
+    monkeypatch.setattr(hotel, 'METRICS_SLOW_QUERY_MS', 0)
+    db.execute('SELECT * FROM bookings WHERE booking_id = ?', (1,)).fetchall()
+    entry = fresh_metrics.snapshot()['slow_queries'][0]
+    assert entry['sql'] == 'SELECT * FROM bookings WHERE booking_id = ?'
+    assert any('USING INTEGER PRIMARY KEY' in step for step in entry['plan'])
+
+
+def test_statement_table_is_bounded(fresh_metrics, monkeypatch):
+    monkeypatch.setattr(hotel, 'METRICS_MAX_STATEMENTS', 2)
+    for n in range(4):
+        fresh_metrics.statement(f'SELECT {n}', 0.001, 1)
+    assert [s['sql'] for s in fresh_metrics.snapshot()['statements']].count('(other)') == 1
+    assert len(fresh_metrics.statements) == 3
+
+
+def test_quantiles_interpolate_within_a_bucket():
+    counts = [0] * (len(hotel.METRICS_BUCKETS) + 1)
+    counts[1] = 4  # all in (0.005, 0.01]
+    assert hotel._quantile(counts, 4, 0.5) == pytest.approx(0.0075)
+    assert hotel._quantile(counts, 0, 0.5) is None
+
+
+def test_prometheus_export(admin_client, fresh_metrics):
+    admin_client.get('/admin/bookings')
+    text = admin_client.get('/admin/metrics.prom').get_data(as_text=True)
+    assert '# TYPE hotel_http_request_duration_seconds histogram' in text
+    assert 'hotel_http_request_duration_seconds_count{endpoint="admin_bookings",method="GET"} 1' in text
+    assert 'hotel_http_request_duration_seconds_bucket{endpoint="admin_bookings",method="GET",le="+Inf"} 1' in text
+    assert hotel._prom_sample('x', {'sql': 'a "b"\nc'}, 1) == 'x{sql="a \\"b\\" c"} 1'
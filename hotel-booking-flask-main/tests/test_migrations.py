@@ -0,0 +1,61 @@
+import pytest
+
+import app as hotel
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    pool = hotel.ConnectionPool(str(tmp_path / 'fresh.db'), size=1)
+    conn = pool.checkout()
+    yield conn
+    pool.checkin(conn)
+    pool.close_all()
+
+
+def index_names(db):
+    return {r['name'] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_empty_database_is_migrated_to_the_latest_version(fresh_db):
+    applied = hotel.migrate(fresh_db)
+    assert applied == [version for version, _, _ in hotel.MIGRATIONS]
+    assert hotel.schema_version(fresh_db) == hotel.MIGRATIONS[-1][0]
+    assert {'idx_bookings_room_stay', 'idx_bookings_created', 'idx_invoices_booking',
+            'idx_bookings_type_created', 'idx_bookings_checkin'} <= index_names(fresh_db)
+
+
+def test_migrating_again_is_a_no_op(fresh_db):
+    hotel.migrate(fresh_db)
+    assert hotel.migrate(fresh_db) == []
+
+
+def test_legacy_database_is_upgraded_in_place(fresh_db):
+    fresh_db.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            password TEXT NOT NULL, email TEXT, phone TEXT, is_admin INTEGER DEFAULT 0);
+        INSERT INTO users (username, password, is_admin) VALUES ('old-admin', 'x', 1);
+        CREATE TABLE bookings (id INTEGER PRIMARY KEY, check_in TEXT, check_out TEXT, room_id INTEGER,
+                               created_at TEXT);
+        INSERT INTO bookings VALUES (7, '2020-01-01', '2020-01-03', 1, NULL);
+    ''')
+    hotel.migrate(fresh_db)
+    columns = {r['name'] for r in fresh_db.execute('PRAGMA table_info(users)')}
+    assert {'user_name', 'created_at', 'admin_type'} <= columns
+    assert fresh_db.execute('SELECT username FROM users').fetchone()['username'] == 'old-admin'
+    booking = fresh_db.execute('SELECT * FROM bookings').fetchone()
+    assert (booking['booking_id'], booking['checkin_date'], booking['created_at']) == (7, '2020-01-01', '')
+
+
+def test_failed_migration_is_rolled_back_and_not_recorded(fresh_db, monkeypatch):
+    hotel.migrate(fresh_db)
+    latest = hotel.MIGRATIONS[-1][0]
+
+    def broken(db):
+        db.execute('CREATE TABLE half_done (x)')
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(hotel, 'MIGRATIONS', hotel.MIGRATIONS + [(latest + 1, 'broken', broken)])
+    with pytest.raises(RuntimeError):
+        hotel.migrate(fresh_db)
+    assert hotel.schema_version(fresh_db) == latest
+    assert fresh_db.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
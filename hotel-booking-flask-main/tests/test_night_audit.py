@@ -0,0 +1,61 @@
+import app as hotel
+from conftest import day
+
+
+def flags(db, booking_id):
+    row = db.execute('SELECT no_show, cancelled, overstay FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
+    return tuple(row)
+
+
+def test_audit_closes_the_days_before_the_audit_date(db, make_room):
+    # The audit on D settles arrivals and departures due up to D - 1; those due
+    # on D are left for the next audit
+    type_id, _ = make_room(units=4)
+    due_before = hotel.create_booking(db, day(199), day(203), type_id)
+    due_on = hotel.create_booking(db, day(200), day(203), type_id)
+    staying = hotel.create_booking(db, day(196), day(199), type_id)
+    leaving = hotel.create_booking(db, day(196), day(200), type_id)
+    for booking_id in (staying, leaving):
+        hotel.mark_checked_in(db, booking_id)
+    hotel.run_night_audit(db, day(200))
+    assert flags(db, due_before) == (1, 1, 0)
+    assert flags(db, due_on) == (0, 0, 0)
+    assert flags(db, staying) == (0, 0, 1)
+    assert flags(db, leaving) == (0, 0, 0)
+    # The next night catches the ones due on D
+    hotel.run_night_audit(db, day(201))
+    assert flags(db, due_on) == (1, 1, 0)
+    assert flags(db, leaving) == (0, 0, 1)
+
+
+def test_arrivals_older_than_the_lookback_are_left_alone(db, make_room):
+    type_id, _ = make_room(units=1)
+    old = hotel.create_booking(db, day(210 - hotel.NIGHT_AUDIT_LOOKBACK_DAYS - 1), day(205), type_id)
+    hotel.run_night_audit(db, day(210))
+    assert flags(db, old) == (0, 0, 0)
+
+
+def test_room_flags_follow_who_is_in_house(db, make_room):
+    type_id, units = make_room(units=2)
+    booking_id = hotel.create_booking(db, day(220), day(222), type_id)
+    unit = db.execute('SELECT room_id FROM belong_to WHERE booking_id = ?', (booking_id,)).fetchone()[0]
+    other = next(u for u in units if u != unit)
+    db.execute('UPDATE room_units SET occupied = 1, available = 0 WHERE room_id = ?', (other,))
+    db.commit()
+    hotel.mark_checked_in(db, booking_id)
+    hotel.run_night_audit(db, day(221))
+    room = {r['room_id']: (r['occupied'], r['available'])
+            for r in db.execute('SELECT room_id, occupied, available FROM room_units WHERE type_id = ?', (type_id,))}
+    assert room == {unit: (1, 0), other: (0, 1)}
+
+
+def test_admin_audit_reports_and_records_the_run(admin_client, db, make_room):
+    type_id, _ = make_room(units=1)
+    booking_id = hotel.create_booking(db, day(230), day(231), type_id)
+    resp = admin_client.post('/admin/night_audit', data={'audit_date': day(231)}, follow_redirects=True)
+    (run,) = db.execute('SELECT * FROM night_audits WHERE audit_date = ?', (day(231),)).fetchall()
+    assert f'Night audit for {day(231)}: {run["no_shows"]} no-shows' in resp.get_data(as_text=True)
+    assert run['no_shows'] >= 1
+    assert flags(db, booking_id) == (1, 1, 0)
+    resp = admin_client.post('/admin/night_audit', data={'audit_date': 'tomorrow'}, follow_redirects=True)
+    assert b'Invalid audit date' in resp.data
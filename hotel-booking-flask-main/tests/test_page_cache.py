@@ -0,0 +1,52 @@
+import app as hotel
+
+
+def test_rooms_page_lists_the_catalog_and_revalidates_with_304(client, make_room):
+    make_room(units=1, name='Harbour View')
+    resp = client.get('/rooms')
+    assert resp.status_code == 200
+    assert b'Harbour View' in resp.data
+    assert resp.headers['Cache-Control'] == 'public, max-age=60'
+    assert 'Cookie' in resp.headers['Vary']
+    again = client.get('/rooms', headers={'If-None-Match': resp.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_catalog_change_produces_a_new_page(client, make_room):
+    etag = client.get('/rooms').headers['ETag']
+    make_room(units=1, name='Garden Loft')
+    resp = client.get('/rooms', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert b'Garden Loft' in resp.data
+    assert resp.headers['ETag'] != etag
+
+
+def test_repeat_views_are_served_from_the_cache(client):
+    client.get('/about')
+    hits = hotel.page_cache.hits
+    client.get('/about')
+    assert hotel.page_cache.hits == hits + 1
+
+
+def test_admin_views_are_not_cached(admin_client):
+    resp = admin_client.get('/rooms')
+    assert resp.status_code == 200
+    assert 'ETag' not in resp.headers
+
+
+def test_only_one_catalog_version_is_kept_per_path():
+    cache = hotel.PageCache(ttl=60)
+    cache.put(('/rooms', 1), b'old')
+    cache.put(('/rooms', 2), b'new')
+    cache.put(('/about', 2), b'about')
+    assert cache.get(('/rooms', 1)) is None
+    assert cache.get(('/rooms', 2))['body'] == b'new'
+    assert cache.stats()['entries'] == 2
+
+
+def test_room_images_resolve_to_local_files_or_stay_remote(app):
+    with app.test_request_context():
+        assert hotel.room_image_file('hotel-booking-flask-main/static/images/abc.jpg') == 'images/abc.jpg'
+        assert hotel.room_image_url('https://cdn.example.com/a.jpg') == 'https://cdn.example.com/a.jpg'
+        assert hotel.room_image_file('') == 'images/abc.jpg'
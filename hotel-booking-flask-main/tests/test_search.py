@@ -0,0 +1,63 @@
+import pytest
+
+import app as hotel
+
+
+@pytest.fixture
+def guest(db):
+    guest_id = db.execute('INSERT INTO guests (name, address, email, NID, phone) VALUES (?, ?, ?, ?, ?)',
+                          ('Zéphyrine Quillfeather', '9 Dock Road', 'zq@example.com', 'NID-77123',
+                           '+1 (555) 010-4477')).lastrowid
+    db.commit()
+    yield guest_id
+    db.execute('DELETE FROM guests WHERE guest_id = ?', (guest_id,))
+    db.commit()
+
+
+def refs(results):
+    return [(r['kind'], r['ref_id']) for r in results]
+
+
+def test_prefixes_of_every_word_must_match(db, guest):
+    assert refs(hotel.search_people(db, 'zeph quill')) == [('guest', guest)]
+    assert hotel.search_people(db, 'zeph nobody') == []
+    assert hotel.search_people(db, '  ') == []
+
+
+def test_phone_matches_as_typed_or_as_local_digits(db, guest):
+    (row,) = hotel.search_people(db, '5550104477')
+    assert row['ref_id'] == guest
+    assert row['phone'] == '+1 (555) 010-4477'  # the stored phone, not the indexed terms
+    assert refs(hotel.search_people(db, '15550104477')) == [('guest', guest)]
+
+
+def test_index_follows_edits_and_deletes(db, guest):
+    db.execute("UPDATE guests SET name = 'Ottoline Quillfeather' WHERE guest_id = ?", (guest,))
+    db.commit()
+    assert hotel.search_people(db, 'zephyrine') == []
+    assert refs(hotel.search_people(db, 'ottoline')) == [('guest', guest)]
+    db.execute('DELETE FROM guests WHERE guest_id = ?', (guest,))
+    db.commit()
+    assert hotel.search_people(db, 'ottoline') == []
+
+
+def test_users_are_found_by_username_and_extra_phones(db):
+    user_id = db.execute("INSERT INTO users (username, password, user_name, email) VALUES ('quillclerk', 'x', 'Desk Clerk', 'c@example.com')").lastrowid
+    db.execute("INSERT INTO user_phones (user_id, phone) VALUES (?, '555-998-1212')", (user_id,))
+    db.commit()
+    assert refs(hotel.search_people(db, 'quillcl')) == [('user', user_id)]
+    assert refs(hotel.search_people(db, '5559981212', kind='user')) == [('user', user_id)]
+    assert hotel.search_people(db, 'quillcl', kind='guest') == []
+
+
+def test_rebuild_matches_the_trigger_maintained_index(db, guest):
+    before = db.execute('SELECT rowid, * FROM people_search ORDER BY rowid').fetchall()
+    hotel.rebuild_search_index(db)
+    db.commit()
+    assert [tuple(r) for r in db.execute('SELECT rowid, * FROM people_search ORDER BY rowid')] == [tuple(r) for r in before]
+
+
+def test_search_json_checks_the_kind(admin_client, guest):
+    resp = admin_client.get('/admin/search.json?q=quillfeather')
+    assert refs(resp.get_json()['results']) == [('guest', guest)]
+    assert admin_client.get('/admin/search.json?q=x&kind=staff').status_code == 400
@@ -0,0 +1,75 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as hotel
+
+pytestmark = pytest.mark.skipif(hotel.session_store is None, reason='cookie sessions configured')
+
+
+def sid_of(client, app):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return cookie.value if cookie else None
+
+
+@pytest.fixture
+def other_worker():
+    # A second store on the same file, standing in for another worker process
+    return hotel.SessionStore(hotel.session_store.path, cache_ttl=0)
+
+
+def test_cookie_carries_only_the_session_id(app, admin_client):
+    admin_client.get('/admin/bookings')
+    sid = sid_of(admin_client, app)
+    assert 'admin' not in sid
+    entry = hotel.session_store.get(sid)
+    assert entry['user_id'] == 1 and entry['data']['admin_username'] == 'admin'
+
+
+def test_principal_is_cached_with_the_session(app, admin_client, other_worker):
+    admin_client.get('/admin/bookings')
+    sid = sid_of(admin_client, app)
+    principal = other_worker.get(sid)['principal']
+    assert (principal['id'], principal['username']) == (1, 'admin')
+
+
+def test_login_issues_a_new_session_id(app, client, db):
+    db.execute('INSERT INTO users (username, password, is_admin) VALUES (?, ?, 1)',
+               ('session-admin', generate_password_hash('pw', hotel.PASSWORD_METHOD)))
+    db.commit()
+    client.get('/admin/login')
+    with client.session_transaction() as s:
+        s['visited'] = True
+    before = sid_of(client, app)
+    client.post('/admin/login', data={'username': 'session-admin', 'password': 'pw'},
+                environ_base={'REMOTE_ADDR': '10.24.0.1'})
+    after = sid_of(client, app)
+    assert after != before
+    assert hotel.session_store.get(before) is None
+    assert hotel.session_store.get(after)['data']['admin_username'] == 'session-admin'
+
+
+def test_signing_a_user_out_reaches_every_worker(app, client, other_db, other_worker):
+    # No `db` fixture here: its app context would carry g.admin across requests
+    user_id = other_db.execute("INSERT INTO users (username, password, is_admin) "
+                               "VALUES ('revoked-admin', 'x', 1)").lastrowid
+    other_db.commit()
+    with client.session_transaction() as s:
+        s['admin_id'] = user_id
+        s['admin_username'] = 'revoked-admin'
+    assert client.get('/admin/bookings').status_code == 200
+    sid = sid_of(client, app)
+    assert other_worker.get(sid) is not None
+    hotel.session_store.revoke_user(user_id)
+    assert other_worker.get(sid) is None
+    assert client.get('/admin/bookings').status_code == 302
+
+
+def test_memory_store_expires_and_evicts():
+    store = hotel.SessionStore(None, lifetime=60, cache_size=2)
+    for sid in ('a', 'b', 'c'):
+        store.save(sid, {'n': sid})
+    assert store.get('a') is None
+    assert store.get('c')['data'] == {'n': 'c'}
+    expired = hotel.SessionStore(None, lifetime=-1)
+    expired.save('x', {'n': 1})
+    assert expired.get('x') is None
@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+
+import app as hotel
+
+
+@pytest.fixture
+def built_static(app, tmp_path, monkeypatch):
+    # A small static folder built into dist/ and installed as the app's manifest
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'site.css').write_text('body { color: red; }\n' * 50)
+    (tmp_path / 'NOTES.md').write_text('not shipped')
+    try:
+        from PIL import Image
+    except ImportError:
+        pass
+    else:
+        (tmp_path / 'images').mkdir()
+        Image.new('RGB', (1000, 500), 'blue').save(tmp_path / 'images' / 'room.jpg')
+    manifest = hotel.build_assets(str(tmp_path), widths=(480,))
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    monkeypatch.setattr(hotel, 'asset_manifest', manifest)
+    return manifest
+
+
+def test_build_fingerprints_and_skips_notes(built_static, tmp_path):
+    hashed = built_static['files']['css/site.css']
+    assert hashed.startswith('dist/css/site.') and hashed.endswith('.css')
+    assert 'NOTES.md' not in built_static['files']
+    assert (tmp_path / (hashed + '.gz')).exists()
+
+
+def test_static_urls_point_at_the_hashed_copy(app, built_static):
+    with app.test_request_context():
+        assert hotel.url_for('static', filename='css/site.css') == '/static/' + built_static['files']['css/site.css']
+        assert hotel.url_for('static', filename='css/other.css') == '/static/css/other.css'
+
+
+def test_hashed_assets_are_immutable_and_precompressed(client, built_static):
+    path = built_static['files']['css/site.css'][len('dist/'):]
+    resp = client.get(f'/static/dist/{path}', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in resp.headers['Cache-Control'] and 'max-age=31536000' in resp.headers['Cache-Control']
+    assert gzip.decompress(resp.data).startswith(b'body { color: red; }')
+    resp.close()
+    plain = client.get('/static/dist/css/site.css')
+    assert 'Content-Encoding' not in plain.headers and 'immutable' not in plain.headers.get('Cache-Control', '')
+    plain.close()
+
+
+def test_photos_get_resized_variants(app, built_static):
+    pytest.importorskip('PIL')
+    variants = built_static['images']['images/room.jpg']
+    assert [width for width, _ in variants['webp']] == [480, 1000]
+    with app.test_request_context():
+        srcset = hotel.image_srcset('images/room.jpg', 'webp')
+    assert srcset.count('w, ') == 1 and srcset.endswith(' 1000w')
+
+
+def test_rooms_page_offers_image_variants(client, monkeypatch):
+    variants = {'webp': [[480, 'dist/images/abc.0123456789.480w.webp']]}
+    monkeypatch.setattr(hotel, 'asset_manifest', {'files': {}, 'images': {'images/abc.jpg': variants}})
+    hotel.catalog.invalidate()  # new page cache key
+    html = client.get('/rooms').get_data(as_text=True)
+    assert 'type="image/webp"' in html
+    assert '/static/dist/images/abc.0123456789.480w.webp 480w' in html
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import app as hotel
+
+
+def test_wsgi_module_exposes_the_configured_app(app):
+    import wsgi
+    assert wsgi.application is wsgi.app is app
+
+
+def test_setup_lock_serialises_concurrent_starts(tmp_path):
+    path = str(tmp_path / 'setup.lock')
+    order = []
+
+    def start(name, hold):
+        with hotel.setup_lock(path):
+            order.append(f'{name} in')
+            time.sleep(hold)
+            order.append(f'{name} out')
+
+    first = threading.Thread(target=start, args=('first', 0.2))
+    first.start()
+    time.sleep(0.05)
+    second = threading.Thread(target=start, args=('second', 0))
+    second.start()
+    first.join()
+    second.join()
+    assert order == ['first in', 'first out', 'second in', 'second out']
+
+
+def test_setup_is_idempotent(db):
+    version = hotel.schema_version(db)
+    rooms = db.execute('SELECT COUNT(*) FROM rooms').fetchone()[0]
+    hotel.setup_db()
+    assert hotel.schema_version(db) == version == hotel.MIGRATIONS[-1][0]
+    assert db.execute('SELECT COUNT(*) FROM rooms').fetchone()[0] == rooms
+
+
+def test_setup_can_be_left_to_the_deploy_step(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(hotel, 'setup_db', lambda: calls.append('setup'))
+    monkeypatch.setenv('HOTEL_SETUP', '0')
+    hotel.create_app(warm=False)
+    monkeypatch.setenv('HOTEL_SETUP', '1')
+    hotel.create_app(warm=False)
+    assert calls == ['setup']
+
+
+def test_warm_up_loads_the_catalog_and_leaves_no_connection_to_inherit(app):
+    hotel.catalog.invalidate()
+    hotel.warm_up()
+    assert hotel.catalog.stats()['entries'] > 0
+    assert hotel.db_pool.stats()['idle'] == 0
@@ -0,0 +1,10 @@
+# Production WSGI entry point:
+#
+#     gunicorn -c gunicorn.conf.py
+#
+# Importing this module runs create_app(): migrations and seeding (under a file
+# lock) and the pre-fork warm-up. With preload_app the master does this once
+# and workers start without touching the schema.
+from app import create_app
+
+application = app = create_app()